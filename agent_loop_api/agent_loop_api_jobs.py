@@ -0,0 +1,89 @@
+"""
+agent_loop_api_jobs.py - 승인 후 처리(도구 실행 + LLM 후속 응답) 진행 상황 관리
+
+승인된 요청의 도구 실행과 최종 LLM 호출은 수십 초가 걸릴 수 있으므로,
+/v1/approve/{id}?background=true 요청은 202로 바로 응답하고 작업은 백그라운드에서 진행합니다.
+클라이언트는 /v1/result/{id}를 폴링하거나 /v1/result/{id}/events(SSE)로 진행 이벤트를 받습니다.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+# 종료 이벤트 (이 이벤트 이후 스트림을 닫음)
+TERMINAL_EVENTS = ("completed", "failed")
+
+
+class ApprovalJob:
+    """요청 하나의 승인 후 처리 진행 이벤트 기록"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.task: Optional[asyncio.Task] = None
+        self.finished_at: Optional[float] = None
+        self._changed = asyncio.Condition()
+
+    async def emit(self, event: str, **data: Any) -> None:
+        """진행 이벤트 기록 후 구독자에게 알림"""
+        self.events.append({"event": event, "timestamp": time.time(), **data})
+        if event in TERMINAL_EVENTS:
+            self.done = True
+            self.finished_at = time.monotonic()
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def stream(self) -> AsyncGenerator[Dict[str, Any], None]:
+        """지금까지의 이벤트를 먼저 보내고, 종료 이벤트까지 새 이벤트를 이어서 전달"""
+        sent = 0
+        while True:
+            while sent < len(self.events):
+                yield self.events[sent]
+                sent += 1
+            if self.done:
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.events) > sent)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"done": self.done, "events": self.events}
+
+
+class ApprovalJobRegistry:
+    """진행 중/최근 완료된 작업 보관소 (완료된 작업은 max_finished개까지만 유지)"""
+
+    def __init__(self, max_finished: int = 1000):
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, ApprovalJob]" = OrderedDict()
+
+    def create(self, request_id: str) -> ApprovalJob:
+        self._prune()
+        job = ApprovalJob(request_id)
+        self._jobs[request_id] = job
+        return job
+
+    def get(self, request_id: str) -> Optional[ApprovalJob]:
+        return self._jobs.get(request_id)
+
+    def running_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.done)
+
+    async def close(self) -> None:
+        """실행 중인 백그라운드 작업 취소 (서버 종료 시)"""
+        tasks = [job.task for job in self._jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _prune(self) -> None:
+        finished = [rid for rid, job in self._jobs.items() if job.done]
+        for request_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[request_id]
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """진행 이벤트를 SSE data 라인으로 변환"""
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
@@ -17,6 +17,7 @@ class ApprovalStatus(str, Enum):
     REJECTED = "rejected"
     COMPLETED = "completed"
     EXPIRED = "expired"
+    FAILED = "failed"
 
 
 class ChatMessage(BaseModel):
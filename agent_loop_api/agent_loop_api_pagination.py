@@ -0,0 +1,25 @@
+"""
+agent_loop_api_pagination.py - 승인 요청 목록(GET /v1/pending) 커서 인코딩
+
+커서는 마지막으로 반환한 행의 (created_at, request_id)를 JSON 배열로 만든 뒤 URL-safe base64로 인코딩한 문자열입니다.
+목록은 (status, created_at, request_id) 인덱스 순서로 읽으므로 이 두 값만으로 다음 페이지 시작 위치가 정해집니다.
+"""
+
+import base64
+import binascii
+import json
+from typing import Tuple
+
+
+def encode_cursor(created_at: str, request_id: str) -> str:
+    """목록의 마지막 행 위치를 다음 페이지 커서 문자열로 변환"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, request_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """커서 문자열을 (created_at, request_id)로 변환 (잘못된 커서면 ValueError)"""
+    try:
+        created_at, request_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (UnicodeError, binascii.Error, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    return str(created_at), str(request_id)
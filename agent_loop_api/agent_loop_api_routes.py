@@ -5,22 +5,32 @@ agent_loop_api_routes.py - API 라우트 정의
 승인 대기, 승인/거절, 결과 조회 등의 로직을 포함합니다.
 """
 
+import asyncio
 import json
 import re
 import sqlite3
-import httpx
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from agent_loop_api_models import (
     ChatRequest, ChatMessage, ChatCompletionResponse,
     PendingApproval, ApprovalResponse, ApprovalStatus, ToolCallInfo
 )
-from agent_loop_api_tools import TOOL_DEFS, TOOL_REGISTRY, DB_PATH
+from agent_loop_api_tools import TOOL_DEFS, TOOL_REGISTRY, DB_PATH, format_tool_names
+from agent_loop_api_sweeper import create_pending_sweeper
+from agent_loop_api_jobs import ApprovalJob, ApprovalJobRegistry, format_sse
+from agent_loop_api_pagination import encode_cursor, decode_cursor
+# 공용 모듈(common/llm_cache.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from llm_cache import create_llm_cache, cache_bypass_requested, cached_llm_call
+from llm_gateway import create_llm_gateway
+from context_window import create_context_window
 
 # 설정 로드
 CONFIG_PATH = (Path(__file__).parent / "agent_loop_config" / "agent_loop_config.json").resolve()
@@ -31,12 +41,33 @@ def load_config():
 
 config = load_config()
 
+# 결정적(temperature 0) LLM 호출 응답 캐시 (설정에서 비활성화하면 None)
+llm_cache = create_llm_cache(config.get("llm_cache"), CONFIG_PATH.parent)
+
+# 공유 LLM 게이트웨이 (연결 풀 + 5xx/연결 끊김 재시도 + 지연 시간/토큰 지표)
+llm_gateway = create_llm_gateway(config)
+
+# LLM에 보낼 대화 이력을 컨텍스트 예산에 맞게 축소 (설정에서 비활성화하면 None)
+context_window = create_context_window(config.get("context_window"))
+
 # 라우터 생성
 router = APIRouter()
 
 # 메모리 내 대기 요청 저장소 (DB와 동기화)
 pending_requests: Dict[str, Dict[str, Any]] = {}
 
+# 승인 대기 시간 초과 요청 만료 + 처리 완료 행 정리 (서버 lifespan에서 시작)
+pending_sweeper = create_pending_sweeper(config.get("approval"), DB_PATH, pending_requests)
+
+# 승인된 도구 실행용 스레드 풀 (도구는 동기 SQLite 함수이므로 이벤트 루프 밖에서 실행)
+tool_executor = ThreadPoolExecutor(
+    max_workers=config["agent"].get("tool_threads", 8),
+    thread_name_prefix="loop-api-tool"
+)
+
+# 승인 후 처리 진행 상황 (background 승인, /v1/result/{id}/events 용)
+approval_jobs = ApprovalJobRegistry(max_finished=config.get("approval", {}).get("max_finished_jobs", 1000))
+
 
 # ============================================================
 # 헬퍼 함수
@@ -47,29 +78,23 @@ def generate_request_id() -> str:
     return f"req_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
 
 
-async def call_llm(messages: List[Dict], tools: Optional[List] = None) -> Dict:
-    """LLM 호출"""
-    async with httpx.AsyncClient(timeout=config["llm"]["timeout"]) as client:
-        url = f"{config['llm']['base_url']}/chat/completions"
-        headers = {"Content-Type": "application/json"}
-        
-        api_key = str(config["llm"].get("api_key", "")).strip()
-        if api_key and api_key.lower() != "not-needed":
-            headers["Authorization"] = f"Bearer {api_key}"
-        
-        payload = {
-            "model": config["llm"]["model"],
-            "messages": messages,
-            "stream": False,
-            "temperature": 0
-        }
-        
-        if tools:
-            payload["tools"] = tools
-        
-        resp = await client.post(url, json=payload, headers=headers)
-        resp.raise_for_status()
-        return resp.json()
+async def call_llm(messages: List[Dict], tools: Optional[List] = None, use_cache: bool = True) -> Dict:
+    """LLM 호출 (use_cache=False면 응답 캐시 우회)"""
+    # 예산을 넘으면 오래된 도구 결과/턴을 줄인 사본을 보냄 (원본 이력은 그대로)
+    if context_window:
+        messages = context_window.fit(messages, tools)
+    payload = {
+        "model": config["llm"]["model"],
+        "messages": messages,
+        "stream": False,
+        "temperature": 0
+    }
+    
+    if tools:
+        payload["tools"] = tools
+    
+    # 같은 대화 이력에 대한 결정적 호출은 캐시된 응답을 재사용 (캐시 미스 시 공유 게이트웨이로 호출)
+    return await cached_llm_call(llm_cache, payload, llm_gateway.chat, use_cache)
 
 
 def save_pending_to_db(request_id: str, tool_calls: List, messages: List, status: str = "pending"):
@@ -78,9 +103,10 @@ def save_pending_to_db(request_id: str, tool_calls: List, messages: List, status
     cursor = conn.cursor()
     cursor.execute(
         """INSERT OR REPLACE INTO pending_requests 
-           (request_id, tool_calls, messages, status, updated_at) 
-           VALUES (?, ?, ?, ?, ?)""",
-        (request_id, json.dumps(tool_calls), json.dumps(messages), status, datetime.now().isoformat())
+           (request_id, tool_calls, messages, status, updated_at, tool_names) 
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (request_id, json.dumps(tool_calls), json.dumps(messages), status, datetime.now().isoformat(),
+         format_tool_names(tool_calls))
     )
     conn.commit()
     conn.close()
@@ -98,6 +124,18 @@ def update_pending_status(request_id: str, status: str, result: str = None):
     conn.close()
 
 
+def claim_pending(request_id: str) -> bool:
+    """pending → approved 전환 (동시에 들어온 승인 중 하나만 성공)"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.execute(
+        "UPDATE pending_requests SET status = ?, updated_at = ? WHERE request_id = ? AND status = ?",
+        (ApprovalStatus.APPROVED.value, datetime.now().isoformat(), request_id, ApprovalStatus.PENDING.value)
+    )
+    conn.commit()
+    conn.close()
+    return cursor.rowcount == 1
+
+
 def get_pending_from_db(request_id: str) -> Optional[Dict]:
     """DB에서 대기 요청 조회"""
     conn = sqlite3.connect(DB_PATH)
@@ -179,7 +217,8 @@ async def root():
             "pending": "GET /v1/pending",
             "approve": "POST /v1/approve/{request_id}",
             "reject": "POST /v1/reject/{request_id}",
-            "result": "GET /v1/result/{request_id}"
+            "result": "GET /v1/result/{request_id}",
+            "events": "GET /v1/result/{request_id}/events"
         }
     }
 
@@ -198,8 +237,26 @@ async def list_models():
     }
 
 
+@router.get("/cache/stats")
+async def get_llm_cache_stats():
+    """LLM 응답 캐시 지표 조회 (적중/실패/만료/우회 건수)"""
+    return llm_cache.get_stats() if llm_cache else {"enabled": False}
+
+
+@router.get("/context/stats")
+async def get_context_window_stats():
+    """컨텍스트 창 관리 지표 조회 (축소 횟수, 생략/제거된 메시지 수, 축소 전후 토큰)"""
+    return context_window.get_stats() if context_window else {"enabled": False}
+
+
+@router.get("/llm/stats")
+async def get_llm_gateway_stats():
+    """LLM 게이트웨이 지표 조회 (지연 시간, 토큰 사용량, 재시도, 연결 풀)"""
+    return llm_gateway.get_stats()
+
+
 @router.post("/v1/chat/completions")
-async def chat_completions(request: ChatRequest):
+async def chat_completions(request: ChatRequest, raw_request: Request):
     """
     채팅 요청 처리
     - 도구 호출이 감지되면 'pending' 상태로 응답
@@ -209,8 +266,8 @@ async def chat_completions(request: ChatRequest):
     messages = [msg.model_dump(exclude_none=True) for msg in request.messages]
     tools = request.tools if request.tools else TOOL_DEFS
     
-    # LLM 호출
-    llm_response = await call_llm(messages, tools)
+    # LLM 호출 (요청 헤더 X-LLM-Cache: bypass 또는 Cache-Control: no-cache면 캐시 우회)
+    llm_response = await call_llm(messages, tools, use_cache=not cache_bypass_requested(raw_request.headers))
     choice = llm_response.get("choices", [{}])[0]
     assistant_msg = choice.get("message", {})
     
@@ -273,45 +330,84 @@ async def chat_completions(request: ChatRequest):
 
 
 @router.get("/v1/pending")
-async def list_pending():
-    """대기 중인 승인 요청 목록"""
+async def list_pending(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    tool: Optional[str] = None,
+    status: ApprovalStatus = ApprovalStatus.PENDING
+):
+    """
+    승인 요청 목록 (오래된 순, 커서 기반 페이지네이션)
+    - limit: 한 페이지 최대 개수
+    - cursor: 이전 응답의 next_cursor (없으면 처음부터)
+    - tool: 해당 도구를 포함한 요청만 조회
+    - status: 조회할 상태 (기본 pending)
+    
+    (status, created_at, request_id) 인덱스를 따라 읽고, 도구 이름은 tool_names 컬럼을 사용하므로
+    행이 많아도 tool_calls JSON을 파싱하지 않습니다.
+    """
+    sql = "SELECT request_id, tool_names, status, created_at FROM pending_requests WHERE status = ?"
+    params: List[Any] = [status.value]
+    if cursor:
+        sql += " AND (created_at, request_id) > (?, ?)"
+        try:
+            params.extend(decode_cursor(cursor))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    if tool:
+        sql += " AND tool_names LIKE ?"
+        params.append(f"%,{tool},%")
+    # 다음 페이지 존재 여부 확인을 위해 하나 더 읽음
+    sql += " ORDER BY created_at, request_id LIMIT ?"
+    params.append(limit + 1)
+    
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT request_id, tool_calls, status, created_at FROM pending_requests WHERE status = 'pending'"
-    )
-    rows = cursor.fetchall()
+    rows = conn.execute(sql, params).fetchall()
     conn.close()
     
-    pending_list = []
-    for row in rows:
-        tool_calls = json.loads(row[1])
-        pending_list.append({
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    pending_list = [
+        {
             "request_id": row[0],
-            "tools": [tc["function"]["name"] for tc in tool_calls],
+            "tools": [name for name in (row[1] or "").split(",") if name],
             "status": row[2],
             "created_at": row[3]
-        })
+        }
+        for row in rows
+    ]
     
-    return {"pending": pending_list, "count": len(pending_list)}
+    return {
+        "pending": pending_list,
+        "count": len(pending_list),
+        "next_cursor": encode_cursor(rows[-1][3], rows[-1][0]) if has_more else None
+    }
 
 
-@router.post("/v1/approve/{request_id}")
-async def approve_request(request_id: str):
-    """도구 실행 승인"""
-    # DB에서 조회
-    pending = get_pending_from_db(request_id)
-    if not pending:
-        raise HTTPException(status_code=404, detail=f"Request {request_id} not found")
-    
-    if pending["status"] != "pending":
-        raise HTTPException(status_code=400, detail=f"Request is already {pending['status']}")
-    
-    # 도구 실행
-    tool_calls = pending["tool_calls"]
-    messages = pending["messages"]
+@router.get("/v1/pending/stats")
+async def get_pending_stats():
+    """승인 대기 만료/정리 작업 지표 조회"""
+    return pending_sweeper.get_stats()
+
+
+def run_tool(func_name: str, args: Any) -> Dict[str, Any]:
+    """도구 하나 실행 (스레드 풀에서 호출)"""
+    if func_name not in TOOL_REGISTRY:
+        return {"success": False, "error": f"Tool '{func_name}' not found"}
+    try:
+        return TOOL_REGISTRY[func_name](**args) if isinstance(args, dict) else TOOL_REGISTRY[func_name]()
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+async def execute_tool_calls(tool_calls: List[Dict], job: ApprovalJob) -> List[Dict[str, Any]]:
+    """
+    저장된 도구 호출들을 스레드 풀에서 동시에 실행하고 tool 메시지 목록을 반환합니다.
+    (결과 메시지는 완료 순서와 관계없이 호출 순서를 유지)
+    """
+    loop = asyncio.get_running_loop()
     
-    for tc in tool_calls:
+    async def run_one(index: int, tc: Dict) -> Dict[str, Any]:
         func_name = tc["function"]["name"]
         args = tc["function"]["arguments"]
         if isinstance(args, str):
@@ -320,29 +416,90 @@ async def approve_request(request_id: str):
             except:
                 args = {}
         
-        if func_name in TOOL_REGISTRY:
-            try:
-                result = TOOL_REGISTRY[func_name](**args) if isinstance(args, dict) else TOOL_REGISTRY[func_name]()
-            except Exception as e:
-                result = {"success": False, "error": str(e)}
-        else:
-            result = {"success": False, "error": f"Tool '{func_name}' not found"}
-        
-        messages.append({
+        await job.emit("tool_started", index=index, name=func_name)
+        result = await loop.run_in_executor(tool_executor, run_tool, func_name, args)
+        await job.emit("tool_finished", index=index, name=func_name, success=result.get("success", True))
+        return {
             "role": "tool",
             "tool_call_id": tc.get("id", "none"),
             "name": func_name,
             "content": json.dumps(result, ensure_ascii=False)
-        })
+        }
+    
+    return list(await asyncio.gather(*(run_one(i, tc) for i, tc in enumerate(tool_calls))))
+
+
+async def run_approved_request(request_id: str, pending: Dict, job: ApprovalJob) -> Dict:
+    """승인된 요청 처리: 도구 동시 실행 → LLM 최종 응답 → 상태 completed (실패 시 failed)"""
+    messages = pending["messages"]
+    try:
+        messages.extend(await execute_tool_calls(pending["tool_calls"], job))
+        
+        # LLM 최종 응답 요청
+        await job.emit("llm_started")
+        final_response = await call_llm(messages, TOOL_DEFS)
+        
+        # 상태 업데이트
+        await asyncio.to_thread(
+            update_pending_status, request_id, ApprovalStatus.COMPLETED.value,
+            json.dumps(final_response, ensure_ascii=False)
+        )
+        await job.emit("completed", status=ApprovalStatus.COMPLETED.value)
+        return final_response
+    except Exception as e:
+        await asyncio.to_thread(
+            update_pending_status, request_id, ApprovalStatus.FAILED.value,
+            json.dumps({"error": str(e)}, ensure_ascii=False)
+        )
+        await job.emit("failed", status=ApprovalStatus.FAILED.value, error=str(e))
+        raise
+
+
+def wants_background(background: bool, raw_request: Request) -> bool:
+    """?background=true 또는 Prefer: respond-async 헤더면 202로 응답"""
+    return background or "respond-async" in raw_request.headers.get("prefer", "").lower()
+
+
+@router.post("/v1/approve/{request_id}")
+async def approve_request(request_id: str, raw_request: Request, background: bool = False):
+    """
+    도구 실행 승인
+    - 기본: 도구 실행과 LLM 최종 응답까지 기다린 뒤 결과 반환
+    - background=true (또는 Prefer: respond-async): 202로 바로 응답하고 백그라운드에서 처리
+      → GET /v1/result/{id} 폴링 또는 GET /v1/result/{id}/events (SSE) 구독
+    """
+    # DB에서 조회
+    pending = await asyncio.to_thread(get_pending_from_db, request_id)
+    if not pending:
+        raise HTTPException(status_code=404, detail=f"Request {request_id} not found")
     
-    # LLM 최종 응답 요청
-    final_response = await call_llm(messages, TOOL_DEFS)
+    if pending["status"] != "pending":
+        raise HTTPException(status_code=400, detail=f"Request is already {pending['status']}")
     
-    # 상태 업데이트
-    update_pending_status(request_id, "completed", json.dumps(final_response, ensure_ascii=False))
+    # 동시에 들어온 승인 요청 중 하나만 처리
+    if not await asyncio.to_thread(claim_pending, request_id):
+        raise HTTPException(status_code=400, detail="Request is already being processed")
     
-    if request_id in pending_requests:
-        del pending_requests[request_id]
+    pending_requests.pop(request_id, None)
+    job = approval_jobs.create(request_id)
+    await job.emit("approved", tools=[tc["function"]["name"] for tc in pending["tool_calls"]])
+    
+    if wants_background(background, raw_request):
+        job.task = asyncio.create_task(run_approved_request(request_id, pending, job))
+        # 백그라운드 작업의 예외는 failed 이벤트/상태로 남기므로 여기서는 로그 경고만 막음
+        job.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return JSONResponse(status_code=202, content={
+            "request_id": request_id,
+            "status": ApprovalStatus.APPROVED.value,
+            "message": "승인되었습니다. 도구 실행과 최종 응답 생성이 백그라운드에서 진행됩니다.",
+            "result_url": f"/v1/result/{request_id}",
+            "events_url": f"/v1/result/{request_id}/events"
+        })
+    
+    try:
+        final_response = await run_approved_request(request_id, pending, job)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
     
     return {
         "request_id": request_id,
@@ -378,12 +535,38 @@ async def reject_request(request_id: str):
 @router.get("/v1/result/{request_id}")
 async def get_result(request_id: str):
     """결과 조회"""
-    pending = get_pending_from_db(request_id)
+    pending = await asyncio.to_thread(get_pending_from_db, request_id)
     if not pending:
         raise HTTPException(status_code=404, detail=f"Request {request_id} not found")
     
-    return {
+    result = {
         "request_id": request_id,
         "status": pending["status"],
         "result": pending["result"]
     }
+    # 이 서버에서 처리 중이거나 최근 처리한 요청이면 진행 이벤트도 함께 반환
+    job = approval_jobs.get(request_id)
+    if job:
+        result["progress"] = job.to_dict()
+    return result
+
+
+@router.get("/v1/result/{request_id}/events")
+async def stream_result_events(request_id: str):
+    """승인 후 처리 진행 이벤트 SSE 스트림 (completed/failed 이벤트 후 종료)"""
+    job = approval_jobs.get(request_id)
+    if job is None:
+        pending = await asyncio.to_thread(get_pending_from_db, request_id)
+        if not pending:
+            raise HTTPException(status_code=404, detail=f"Request {request_id} not found")
+    
+    async def event_stream():
+        if job is None:
+            # 진행 기록이 없으면 (재시작 전 처리됨, 아직 승인 전 등) 현재 상태만 한 번 전송
+            yield format_sse({"event": "status", "status": pending["status"], "result": pending["result"]})
+            return
+        async for event in job.stream():
+            yield format_sse(event)
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
@@ -14,6 +14,10 @@ from contextlib import asynccontextmanager
 
 # 스크립트 위치를 경로에 추가
 sys.path.insert(0, str(Path(__file__).parent))
+# 공용 모듈(common/log_utils.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from log_utils import setup_logging
+from admission import setup_admission
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -29,14 +33,8 @@ config = load_config()
 
 # 로깅 설정 (파일만, DB 없음)
 LOG_FILE = (Path(__file__).parent / config["logging"]["file"]).resolve()
-logging.basicConfig(
-    level=getattr(logging, config["logging"]["level"]),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(LOG_FILE, encoding="utf-8")
-    ]
-)
+# 콘솔/파일 출력은 QueueListener 스레드가 담당 (요청 경로에서 디스크 I/O 제거)
+setup_logging(config["logging"], LOG_FILE)
 logger = logging.getLogger("agent_loop_api")
 
 
@@ -46,7 +44,12 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Agent Loop API Server starting...")
     logger.info(f"   Listening on http://{config['agent']['host']}:{config['agent']['port']}")
     logger.info(f"   LLM: {config['llm']['provider']} ({config['llm']['model']})")
+    pending_sweeper.start()
     yield
+    await pending_sweeper.close()
+    await approval_jobs.close()
+    tool_executor.shutdown(wait=False)
+    await llm_gateway.close()
     logger.info("🛑 Agent Loop API Server stopped")
 
 
@@ -58,14 +61,23 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 채팅 엔드포인트 입장 제어 (CORS보다 먼저 추가해야 거절 응답에도 CORS 헤더가 붙음, 비활성화면 None)
+admission = setup_admission(app, config.get("admission"), ["/v1/chat/completions"])
+
 # CORS 설정
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"])
 
 # 라우터 등록
-from agent_loop_api_routes import router
+from agent_loop_api_routes import router, pending_sweeper, approval_jobs, tool_executor, llm_gateway
 app.include_router(router)
 
 
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """입장 제어 지표 조회 (처리 중/대기 중 요청 수, 거절 건수, 대기 시간)"""
+    return admission.get_stats() if admission else {"enabled": False}
+
+
 if __name__ == "__main__":
     import uvicorn
     import signal
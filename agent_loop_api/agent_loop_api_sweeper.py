@@ -0,0 +1,203 @@
+"""
+agent_loop_api_sweeper.py - 승인 대기 요청 자동 만료 및 정리
+
+설정의 approval.timeout_seconds가 지나도록 승인/거절되지 않은 요청을 'expired'로 바꾸고,
+메모리 저장소(pending_requests)에서도 제거합니다.
+승인되어 처리 중('approved')인 채로 approval.processing_timeout_seconds가 지난 요청은
+서버 재시작이나 백그라운드 작업 취소로 멈춘 것으로 보고 'failed'로 바꿉니다.
+처리가 끝난(completed/rejected/expired/failed) 행은 보존 기간(retention_seconds)과
+최대 보존 개수(max_finished_rows)를 넘으면 삭제하여 테이블이 계속 커지지 않게 합니다.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from agent_loop_api_models import ApprovalStatus
+
+logger = logging.getLogger("agent_loop_api.sweeper")
+
+EXPIRED_RESULT = json.dumps({"message": "승인 대기 시간이 초과되어 자동 만료됨"}, ensure_ascii=False)
+STUCK_RESULT = json.dumps({"error": "승인 후 처리가 제한 시간 안에 끝나지 않아 실패로 처리됨"}, ensure_ascii=False)
+
+# 정리(삭제) 대상 상태. approved는 처리 중이므로 제외
+FINISHED_STATUSES = (
+    ApprovalStatus.COMPLETED.value,
+    ApprovalStatus.REJECTED.value,
+    ApprovalStatus.EXPIRED.value,
+    ApprovalStatus.FAILED.value,
+)
+
+
+class PendingSweeper:
+    """승인 대기 요청 만료/정리 백그라운드 작업"""
+
+    def __init__(
+        self,
+        db_path: Union[str, Path],
+        memory_store: Dict[str, Dict[str, Any]],
+        timeout: float = 300,
+        auto_expire: bool = True,
+        processing_timeout: float = 600,
+        interval: float = 30,
+        retention: float = 86400,
+        max_finished_rows: int = 10000,
+        vacuum_min_deleted: int = 1000
+    ):
+        self.db_path = str(db_path)
+        self.memory_store = memory_store
+        self.timeout = timeout
+        self.auto_expire = auto_expire
+        self.processing_timeout = processing_timeout
+        self.interval = interval
+        self.retention = retention
+        self.max_finished_rows = max_finished_rows
+        self.vacuum_min_deleted = vacuum_min_deleted
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"sweeps": 0, "expired": 0, "failed_stuck": 0, "evicted": 0, "deleted": 0, "vacuums": 0, "errors": 0}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "memory_pending": len(self.memory_store),
+            "timeout_seconds": self.timeout,
+            "auto_expire": self.auto_expire
+        }
+
+    async def sweep(self) -> Dict[str, int]:
+        """만료 처리 + 정리를 한 번 수행 (DB 작업은 스레드에서)"""
+        expired_ids, failed_ids, deleted = await asyncio.to_thread(self._sweep_db)
+
+        # 메모리 저장소에서 만료된 요청 제거
+        evicted = 0
+        for request_id in expired_ids:
+            if self.memory_store.pop(request_id, None) is not None:
+                evicted += 1
+
+        self.stats["sweeps"] += 1
+        self.stats["expired"] += len(expired_ids)
+        self.stats["failed_stuck"] += len(failed_ids)
+        self.stats["evicted"] += evicted
+        self.stats["deleted"] += deleted
+        if failed_ids:
+            logger.warning(f"⚠️ [Sweeper] 처리 중 멈춘 승인 요청 {len(failed_ids)}건을 failed로 변경: {', '.join(failed_ids)}")
+        if expired_ids or deleted:
+            logger.info(f"🧹 [Sweeper] 만료 {len(expired_ids)}건, 메모리 제거 {evicted}건, 삭제 {deleted}건")
+        return {"expired": len(expired_ids), "failed": len(failed_ids), "evicted": evicted, "deleted": deleted}
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"⚠️ [Sweeper] 정리 작업 실패: {e}")
+            await asyncio.sleep(self.interval)
+
+    def _sweep_db(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            expired_ids = self._expire_stale(conn) if self.auto_expire else []
+            failed_ids = self._fail_stuck(conn)
+            deleted = self._purge_finished(conn)
+            if deleted >= self.vacuum_min_deleted:
+                # 삭제된 페이지를 파일에서 반환 (트랜잭션 밖에서만 가능)
+                conn.execute("VACUUM")
+                self.stats["vacuums"] += 1
+            return expired_ids, failed_ids, deleted
+        finally:
+            conn.close()
+
+    def _expire_stale(self, conn: sqlite3.Connection) -> List[str]:
+        # created_at은 CURRENT_TIMESTAMP(UTC)로 기록되므로 SQLite의 datetime('now')와 비교
+        with conn:
+            rows = conn.execute(
+                "SELECT request_id FROM pending_requests WHERE status = ? AND created_at <= datetime('now', ?)",
+                (ApprovalStatus.PENDING.value, f"-{int(self.timeout)} seconds")
+            ).fetchall()
+            expired_ids = [row[0] for row in rows]
+            # 조회와 갱신 사이에 승인/거절된 요청은 status 조건으로 제외됨
+            conn.executemany(
+                "UPDATE pending_requests SET status = ?, result = ?, updated_at = ? WHERE request_id = ? AND status = ?",
+                [
+                    (ApprovalStatus.EXPIRED.value, EXPIRED_RESULT, datetime.now().isoformat(),
+                     request_id, ApprovalStatus.PENDING.value)
+                    for request_id in expired_ids
+                ]
+            )
+        return expired_ids
+
+    def _fail_stuck(self, conn: sqlite3.Connection) -> List[str]:
+        # updated_at은 claim_pending()이 approved로 바꿀 때 로컬 시각 isoformat으로 기록됨
+        cutoff = (datetime.now() - timedelta(seconds=self.processing_timeout)).isoformat()
+        with conn:
+            rows = conn.execute(
+                "SELECT request_id FROM pending_requests WHERE status = ? AND updated_at < ?",
+                (ApprovalStatus.APPROVED.value, cutoff)
+            ).fetchall()
+            failed_ids = [row[0] for row in rows]
+            # 조회와 갱신 사이에 처리가 끝난 요청은 status 조건으로 제외됨
+            conn.executemany(
+                "UPDATE pending_requests SET status = ?, result = ?, updated_at = ? WHERE request_id = ? AND status = ?",
+                [
+                    (ApprovalStatus.FAILED.value, STUCK_RESULT, datetime.now().isoformat(),
+                     request_id, ApprovalStatus.APPROVED.value)
+                    for request_id in failed_ids
+                ]
+            )
+        return failed_ids
+
+    def _purge_finished(self, conn: sqlite3.Connection) -> int:
+        # updated_at은 로컬 시각 isoformat으로 기록됨
+        cutoff = (datetime.now() - timedelta(seconds=self.retention)).isoformat()
+        placeholders = ", ".join("?" * len(FINISHED_STATUSES))
+        with conn:
+            deleted = conn.execute(
+                f"DELETE FROM pending_requests WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*FINISHED_STATUSES, cutoff)
+            ).rowcount
+            # 보존 기간 안이라도 최대 개수를 넘으면 오래된 것부터 삭제
+            deleted += conn.execute(f"""
+                DELETE FROM pending_requests WHERE request_id IN (
+                    SELECT request_id FROM pending_requests WHERE status IN ({placeholders})
+                    ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (*FINISHED_STATUSES, self.max_finished_rows)).rowcount
+        return deleted
+
+
+def create_pending_sweeper(
+    approval_config: Optional[Dict[str, Any]],
+    db_path: Union[str, Path],
+    memory_store: Dict[str, Dict[str, Any]]
+) -> PendingSweeper:
+    """설정(approval)으로 정리 작업 생성"""
+    approval_config = approval_config or {}
+    return PendingSweeper(
+        db_path,
+        memory_store,
+        timeout=approval_config.get("timeout_seconds", 300),
+        auto_expire=approval_config.get("auto_reject_on_timeout", True),
+        processing_timeout=approval_config.get("processing_timeout_seconds", 600),
+        interval=approval_config.get("sweep_interval_seconds", 30),
+        retention=approval_config.get("retention_seconds", 86400),
+        max_finished_rows=approval_config.get("max_finished_rows", 10000),
+        vacuum_min_deleted=approval_config.get("vacuum_min_deleted", 1000)
+    )
@@ -5,6 +5,7 @@ agent_loop_api_tools.py - 도구 정의 및 실행
 DB에서 데이터를 조회/수정하는 도구들이 포함됩니다.
 """
 
+import json
 import sqlite3
 import os
 from pathlib import Path
@@ -41,9 +42,11 @@ def init_database():
             status TEXT DEFAULT 'pending',
             result TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            tool_names TEXT
         )
     """)
+    migrate_pending_requests(cursor)
     
     # 샘플 데이터 확인 및 삽입
     cursor.execute("SELECT COUNT(*) FROM employees")
@@ -64,6 +67,39 @@ def init_database():
     conn.close()
 
 
+def format_tool_names(tool_calls: List[Dict[str, Any]]) -> str:
+    """
+    도구 이름 목록을 tool_names 컬럼 형식(",name1,name2,")으로 변환
+    양 끝에도 구분자를 두어 LIKE '%,name,%' 조건이 다른 이름의 일부와 일치하지 않게 함
+    """
+    names = [tc.get("function", {}).get("name", "") for tc in tool_calls]
+    return "," + ",".join(names) + ","
+
+
+def migrate_pending_requests(cursor: sqlite3.Cursor):
+    """
+    pending_requests 목록 조회용 컬럼/인덱스 추가 (기존 DB 호환)
+    - tool_names: 목록 조회 시 tool_calls JSON을 파싱하지 않도록 도구 이름을 별도 보관
+    - (status, created_at, request_id) 인덱스: 상태별 커서 페이지네이션
+    """
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(pending_requests)")}
+    if "tool_names" not in columns:
+        cursor.execute("ALTER TABLE pending_requests ADD COLUMN tool_names TEXT")
+    
+    # 컬럼 추가 전에 저장된 행은 한 번만 채움
+    rows = cursor.execute("SELECT request_id, tool_calls FROM pending_requests WHERE tool_names IS NULL").fetchall()
+    if rows:
+        cursor.executemany(
+            "UPDATE pending_requests SET tool_names = ? WHERE request_id = ?",
+            [(format_tool_names(json.loads(tool_calls or "[]")), request_id) for request_id, tool_calls in rows]
+        )
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pending_status_created
+        ON pending_requests(status, created_at, request_id)
+    """)
+
+
 # ============================================================
 # 도구 함수 정의
 # ============================================================
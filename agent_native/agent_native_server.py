@@ -6,10 +6,10 @@ LLM이 도구 호출을 요청하면, 클라이언트(Void)에게 반환하기 
 최종 답변이 나올 때까지 이 과정을 반복합니다.
 """
 
+import asyncio
 import json
 import logging
 import sys
-import sqlite3
 import re
 from datetime import datetime
 from pathlib import Path
@@ -26,6 +26,17 @@ from pydantic import BaseModel
 # 스크립트 위치를 경로에 추가하여 어디서 실행하든 native_tools를 찾을 수 있게 함
 sys.path.append(str(Path(__file__).parent))
 from native_tools import NATIVE_TOOL_DEFS, NATIVE_TOOL_REGISTRY
+# 공용 DB 모듈(db/log_sink.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "db"))
+from log_sink import create_log_sink
+# 공용 모듈(common/log_utils.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from log_utils import setup_logging, log_payload
+from llm_cache import create_llm_cache, cache_bypass_requested, cached_llm_call
+from llm_gateway import create_llm_gateway
+from context_window import create_context_window
+from admission import setup_admission
+from tool_runner import run_concurrent_tool_calls
 
 # 설정 로드
 CONFIG_PATH = Path(__file__).parent / "agent_native_config" / "agent_native_config.json"
@@ -46,14 +57,8 @@ config = load_config()
 
 # 로깅 설정
 LOG_FILE = Path(__file__).parent / "agent_native.log"
-logging.basicConfig(
-    level=getattr(logging, config["logging"]["level"]),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(LOG_FILE, encoding="utf-8")
-    ]
-)
+# 콘솔/파일 출력은 QueueListener 스레드가 담당 (요청 경로에서 디스크 I/O 제거)
+setup_logging(config["logging"], LOG_FILE)
 logger = logging.getLogger("agent_native")
 # mcp_client 로거도 같은 핸들러를 사용하도록 설정 (상속)
 logging.getLogger("mcp_client").setLevel(getattr(logging, config["logging"]["level"]))
@@ -62,22 +67,24 @@ logging.getLogger("mcp_client").setLevel(getattr(logging, config["logging"]["lev
 DB_RELATIVE_PATH = config.get("database", {}).get("path", "../db/agent_native_data.db")
 DB_PATH = (CONFIG_PATH.parent / DB_RELATIVE_PATH).resolve()
 
+# agent_logs 배치 기록기 (요청 경로에서 DB I/O 제거)
+log_sink = create_log_sink(DB_PATH, config["logging"].get("db_sink"))
+
+# 결정적(temperature 0) LLM 호출 응답 캐시 (설정에서 비활성화하면 None)
+llm_cache = create_llm_cache(config.get("llm_cache"), CONFIG_PATH.parent)
+
+# 공유 LLM 게이트웨이 (연결 풀 + 5xx/연결 끊김 재시도 + 지연 시간/토큰 지표)
+llm_gateway = create_llm_gateway(config)
+
+# LLM에 보낼 대화 이력을 컨텍스트 예산에 맞게 축소 (설정에서 비활성화하면 None)
+context_window = create_context_window(config.get("context_window"))
+
 # MCP 클라이언트 제거 (로컬 도구 사용)
 # mcp_client = McpSseClient(config["mcp"]["host"], db_path=DB_PATH)
 
 def save_agent_log(request_id: str, message: str, details: Optional[str] = None):
-    """DB에 에이전트 활동 로그 저장"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO agent_logs (request_id, message, details) VALUES (?, ?, ?)",
-            (request_id, message, details)
-        )
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        logger.error(f"⚠️ DB 로그 저장 실패: {e}")
+    """DB에 에이전트 활동 로그 저장 (큐에만 넣고 백그라운드 스레드가 배치로 기록)"""
+    log_sink.write(request_id, message, details)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -85,9 +92,15 @@ async def lifespan(app: FastAPI):
     logger.info("🤖 Agent Native Server 시작 중 (Truly Native Mode)...")
     logger.info(f"✅ {len(NATIVE_TOOL_DEFS)}개의 네이티브 도구 로드 완료")
     yield
+    log_sink.close()
+    if llm_cache:
+        llm_cache.close()
+    await llm_gateway.close()
     logger.info("👋 Agent Native Server 종료")
 
 app = FastAPI(title="Void Lab Test - Active Agent Native", lifespan=lifespan)
+# 채팅 엔드포인트 입장 제어 (CORS보다 먼저 추가해야 거절 응답에도 CORS 헤더가 붙음, 비활성화면 None)
+admission = setup_admission(app, config.get("admission"), ["/v1/chat/completions"])
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"])
 
 # 요청 모델
@@ -158,12 +171,39 @@ async def chat_completions_get():
         "hint": "OpenAI 호환 API 규격은 채팅 완료를 위해 POST /v1/chat/completions를 사용합니다."
     }
 
+@app.get("/logs/stats")
+async def get_log_sink_stats():
+    """agent_logs 배치 기록기 지표 조회 (큐 깊이, 기록/폐기 건수)"""
+    return log_sink.get_stats()
+
+@app.get("/cache/stats")
+async def get_llm_cache_stats():
+    """LLM 응답 캐시 지표 조회 (적중/실패/만료/우회 건수)"""
+    return llm_cache.get_stats() if llm_cache else {"enabled": False}
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """입장 제어 지표 조회 (처리 중/대기 중 요청 수, 거절 건수, 대기 시간)"""
+    return admission.get_stats() if admission else {"enabled": False}
+
+@app.get("/context/stats")
+async def get_context_window_stats():
+    """컨텍스트 창 관리 지표 조회 (축소 횟수, 생략/제거된 메시지 수, 축소 전후 토큰)"""
+    return context_window.get_stats() if context_window else {"enabled": False}
+
+@app.get("/llm/stats")
+async def get_llm_gateway_stats():
+    """LLM 게이트웨이 지표 조회 (지연 시간, 토큰 사용량, 재시도, 연결 풀)"""
+    return llm_gateway.get_stats()
+
 @app.post("/v1/chat/completions")
-async def chat_completions(request: ChatRequest):
+async def chat_completions(request: ChatRequest, raw_request: Request):
     """
     자율 실행 루프를 포함한 채팅 엔드포인트
     """
     request_id = datetime.now().strftime("%H%M%S")
+    # 요청 헤더로 LLM 응답 캐시 우회 가능 (X-LLM-Cache: bypass 또는 Cache-Control: no-cache)
+    use_cache = not cache_bypass_requested(raw_request.headers)
     logger.info(f"📥 [Agent-{request_id}] 새 요청 수신: {request.messages[-1].content}")
     save_agent_log(request_id, "Request Received", request.messages[-1].content)
     
@@ -189,10 +229,10 @@ async def chat_completions(request: ChatRequest):
             # [상태 1: Thinking] LLM에게 현재까지의 대화 이력을 전달하여 '생각'을 요청합니다.
             # n8n의 "AI Agent Node"가 LLM 모델에 질문을 던지는 과정과 동일합니다.
             logger.info(f"📤 [Agent-{request_id}] [LLM REQ] LLM에게 답변 요청 중...")
-            full_ollama_resp = await call_llm(current_messages, tools)
+            full_ollama_resp = await call_llm(current_messages, tools, use_cache=use_cache)
             
             logger.info(f"📥 [Agent-{request_id}] [LLM RESP] 응답 수신 완료")
-            logger.debug(f"--- [LLM RESP Detail] ---\n{json.dumps(full_ollama_resp, ensure_ascii=False, indent=2)}\n-------------------------")
+            log_payload(logger, logging.DEBUG, "--- [LLM RESP Detail] ---", full_ollama_resp)
 
             choice = full_ollama_resp.get("choices", [{}])[0]
             message = choice.get("message", {})
@@ -256,36 +296,11 @@ async def chat_completions(request: ChatRequest):
             logger.info(f"🔧 [Agent-{request_id}] LLM이 {len(tool_calls)}개의 도구 호출 요청")
             current_messages.append(message) # LLM의 도구 요청 메시지 추가 (History Update)
             
-            for tool_call in tool_calls:
-                func_name = tool_call["function"]["name"]
-                args = json.loads(tool_call["function"]["arguments"])
-                call_id = tool_call.get("id")
-                
-                logger.info(f"🛠️  [Agent-{request_id}] [NATIVE TOOL CALL] {func_name} 시작")
-                logger.info(f"   → 인자(Args): {args} [ID: {call_id}]")
-                save_agent_log(request_id, f"Native Tool Call: {func_name}", json.dumps(args))
-                
-                # 로컬 네이티브 도구 직접 실행 (MCP 서버 호출 없음)
-                if func_name in NATIVE_TOOL_REGISTRY:
-                    try:
-                        # 동기 함수인 경우를 대비해 처리 (현재는 모두 동기)
-                        result = NATIVE_TOOL_REGISTRY[func_name](**args)
-                    except Exception as e:
-                        result = {"success": False, "error": str(e)}
-                else:
-                    result = {"success": False, "error": f"정의되지 않은 도구: {func_name}"}
-                
-                logger.info(f"✅ [Agent-{request_id}] [NATIVE TOOL RESULT] {func_name} 완료")
-                logger.debug(f"   → 결과: {json.dumps(result, ensure_ascii=False)}")
-                
-                # [상태 5: Feedback/State Update] 도구 실행 결과(Observation)를 대화 이력에 추가합니다.
-                # role: "tool"을 통해 모델에게 "이것은 네가 시킨 행동의 결과야"라고 알려줍니다.
-                # 이를 통해 다음 루프(상태 1)에서 모델은 이 결과를 바탕으로 다음 행동을 결정하게 됩니다.
-                current_messages.append({
-                    "role": "tool",
-                    "tool_call_id": call_id,
-                    "content": json.dumps(result, ensure_ascii=False)
-                })
+            # [상태 5: Feedback/State Update] 도구 실행 결과(Observation)를 대화 이력에 추가합니다.
+            # role: "tool"을 통해 모델에게 "이것은 네가 시킨 행동의 결과야"라고 알려줍니다.
+            # 이를 통해 다음 루프(상태 1)에서 모델은 이 결과를 바탕으로 다음 행동을 결정하게 됩니다.
+            # 서로 독립적인 도구 호출은 동시에 실행하고, 결과는 호출 순서대로 추가합니다.
+            current_messages.extend(await run_tool_calls(request_id, tool_calls))
                 
             # [Loop Back] 루프의 처음(상태 1)으로 돌아가 정보를 주입받은 LLM의 다음 판단을 기다립니다.
         
@@ -295,33 +310,64 @@ async def chat_completions(request: ChatRequest):
         logger.error(f"❌ [Agent-{request_id}] 처리 중 치명적 에러: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-async def call_llm(messages: List[Dict], tools: Optional[List] = None):
-    """LLM(Ollama, vLLM, OpenAI 등)의 OpenAI 호환 API 호출"""
-    async with httpx.AsyncClient(timeout=config["llm"]["timeout"]) as client:
-        # OpenAI 호환 엔드포인트
-        url = f"{config['llm']['base_url']}/chat/completions"
-        headers = {"Content-Type": "application/json"}
-        
-        api_key = str(config["llm"].get("api_key", "")).strip()
-        # api_key가 존재하고, "not-needed"가 아니며, 빈 문자열이 아닌 경우에만 헤더 추가
-        if api_key and api_key.lower() != "not-needed":
-            headers["Authorization"] = f"Bearer {api_key}"
-
-        payload = {
-            "model": config["llm"]["model"],
-            "messages": messages,
-            "stream": False,
-            "temperature": 0
-        }
-        if tools:
-            payload["tools"] = tools
-            
-        logger.debug(f"📡 [LLM TX] Payload:\n{json.dumps(payload, ensure_ascii=False, indent=2)}")
+async def run_tool_call(request_id: str, tool_call: Dict[str, Any]) -> Dict[str, Any]:
+    """로컬 네이티브 도구 하나를 실행하고 대화 이력에 넣을 tool 메시지를 반환합니다."""
+    func_name = tool_call["function"]["name"]
+    args = json.loads(tool_call["function"]["arguments"])
+    call_id = tool_call.get("id")
+    
+    logger.info(f"🛠️  [Agent-{request_id}] [NATIVE TOOL CALL] {func_name} 시작")
+    logger.info(f"   → 인자(Args): {args} [ID: {call_id}]")
+    save_agent_log(request_id, f"Native Tool Call: {func_name}", json.dumps(args))
+    
+    # 로컬 네이티브 도구 직접 실행 (MCP 서버 호출 없음)
+    if func_name in NATIVE_TOOL_REGISTRY:
+        try:
+            # 동기 도구(sqlite 조회)는 이벤트 루프를 막지 않도록 스레드에서 실행
+            result = await asyncio.to_thread(NATIVE_TOOL_REGISTRY[func_name], **args)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+    else:
+        result = {"success": False, "error": f"정의되지 않은 도구: {func_name}"}
+    
+    logger.info(f"✅ [Agent-{request_id}] [NATIVE TOOL RESULT] {func_name} 완료")
+    log_payload(logger, logging.DEBUG, "   → 결과:", result)
+    
+    return {
+        "role": "tool",
+        "tool_call_id": call_id,
+        "content": json.dumps(result, ensure_ascii=False)
+    }
+
+async def run_tool_calls(request_id: str, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """한 번의 반복에서 요청된 도구 호출들을 동시에 실행합니다. (공용 tool_runner 사용)"""
+    return await run_concurrent_tool_calls(
+        tool_calls,
+        lambda tool_call: run_tool_call(request_id, tool_call),
+        lambda tool_call: tool_call.get("id"),
+        config["agent"].get("max_parallel_tools", 4)
+    )
+
+async def call_llm(messages: List[Dict], tools: Optional[List] = None, use_cache: bool = True):
+    """LLM(Ollama, vLLM, OpenAI 등)의 OpenAI 호환 API 호출 (use_cache=False면 응답 캐시 우회)"""
+    # 예산을 넘으면 오래된 도구 결과/턴을 줄인 사본을 보냄 (원본 이력은 그대로)
+    if context_window:
+        messages = context_window.fit(messages, tools)
+    payload = {
+        "model": config["llm"]["model"],
+        "messages": messages,
+        "stream": False,
+        "temperature": 0
+    }
+    if tools:
+        payload["tools"] = tools
         
+    log_payload(logger, logging.DEBUG, "📡 [LLM TX] Payload:", payload)
+    
+    async def send(body: Dict) -> Dict:
+        # 연결 끊김/5xx는 게이트웨이가 재시도한 뒤에도 실패한 경우에만 여기까지 올라옴
         try:
-            resp = await client.post(url, json=payload, headers=headers)
-            resp.raise_for_status()
-            return resp.json()
+            return await llm_gateway.chat(body)
         except httpx.RemoteProtocolError as e:
             logger.error(f"❌ LLM 서버(Ollama)가 연결을 강제로 끊었습니다. 모델이 로드되어 있는지, 혹은 도구(tools) 형식을 지원하는지 확인해주세요: {e}")
             raise HTTPException(status_code=500, detail=f"LLM Connection Reset: {str(e)}")
@@ -329,6 +375,9 @@ async def call_llm(messages: List[Dict], tools: Optional[List] = None):
             logger.error(f"❌ LLM 호출 중 에러 발생: {e}")
             raise
 
+    # 같은 대화 이력에 대한 결정적 호출은 캐시된 응답을 재사용
+    return await cached_llm_call(llm_cache, payload, send, use_cache)
+
 def generate_pseudo_stream(final_resp: Dict):
     """일반 응답을 SSE 스트림 형식으로 변환"""
     # 첫 번째 청크: role만 전송
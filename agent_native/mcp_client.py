@@ -1,15 +1,22 @@
 import json
 import asyncio
+import itertools
 import httpx
 import logging
-import sqlite3
-import sqlite3
+import random
 import sys
+import time
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable
 
 # 현재 디렉토리 경로 추가
 sys.path.append(str(Path(__file__).parent))
+# 공용 DB 모듈(db/log_sink.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "db"))
+from log_sink import AgentLogSink
+# 공용 모듈(common/log_utils.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from log_utils import log_payload
 
 logger = logging.getLogger("mcp_client")
 
@@ -21,93 +28,252 @@ mcp_client.py - MCP(Model Context Protocol) SSE 클라이언트 인터페이스
 - agent_proxy_server.py(Brain)가 "도구를 실행해"라고 결정하면,
 - 실제로 MCP 서버와 SSE 규격을 통해 통신하여 결과를 받아오는 통로입니다.
 - SSE 연결 관리, 세션 유지, 이벤트 큐 관리 등 저수준 프로토콜 처리를 담당합니다.
+
+[자동 재연결]
+- 감시(supervisor) 태스크가 SSE 스트림을 유지하며, 끊기면 지수 백오프로 재연결합니다.
+  (서버는 20초마다 keep-alive를 보내므로 30초 읽기 타임아웃이 끊김 감지 역할을 합니다)
+- 재연결 중에는 새 도구 호출을 타임아웃까지 기다리지 않고 즉시 실패시킵니다.
+- 응답을 기다리던 요청은 새 세션이 열리면 같은 id로 다시 전송합니다.
+  (서버가 이미 실행한 요청이 다시 실행될 수 있으므로 도구는 재실행에 안전해야 합니다)
 """
     
-    def __init__(self, host: str, db_path: Optional[str] = None):
+    def __init__(
+        self,
+        host: str,
+        db_path: Optional[str] = None,
+        log_sink: Optional[AgentLogSink] = None,
+        request_timeout: float = 20.0,
+        connect_timeout: float = 5.0,
+        reconnect_initial_delay: float = 0.5,
+        reconnect_max_delay: float = 30.0
+    ):
         self.host = host
         self.db_path = db_path
+        # 로그 기록기를 넘겨받지 않았으면 db_path로 전용 기록기를 만들고 close() 시 함께 종료
+        self._owns_log_sink = log_sink is None and db_path is not None
+        self._log_sink = log_sink or (AgentLogSink(db_path) if db_path else None)
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+        self.reconnect_initial_delay = reconnect_initial_delay
+        self.reconnect_max_delay = reconnect_max_delay
         self.session_id = None
         self.endpoint_url = None
         self._client = httpx.AsyncClient(timeout=30.0)
-        self._response_queues: Dict[int, asyncio.Queue] = {}
-        self._listen_task = None
+        # 응답 대기 테이블: JSON-RPC id -> 응답을 받을 Future (하나의 SSE 세션에서 여러 요청을 동시에 처리)
+        self._pending: Dict[int, asyncio.Future] = {}
+        # 재연결 후 다시 보낼 요청 원문: JSON-RPC id -> payload
+        self._inflight: Dict[int, Dict[str, Any]] = {}
+        self._connected = asyncio.Event()
+        self._closed = False
+        self._supervisor_task: Optional[asyncio.Task] = None
+        self.health = {
+            "state": "disconnected",   # disconnected -> connecting -> connected <-> reconnecting, closed
+            "session_id": None,
+            "connects": 0,
+            "reconnects": 0,
+            "consecutive_failures": 0,
+            "resent_requests": 0,
+            "fast_failures": 0,
+            "last_error": None,
+            "last_connected_at": None,
+            "last_disconnected_at": None
+        }
+        # 동시에 여러 도구를 호출해도 ID가 겹치지 않도록 단조 증가 카운터 사용
+        self._msg_ids = itertools.count(1)
+        # 서버가 보내는 JSON-RPC 알림(id 없음, 예: tools/listChanged) 처리기
+        self._notification_handlers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
 
     def _save_log(self, message: str, details: Optional[str] = None):
-        """DB에 MCP 관련 로그 저장"""
-        if not self.db_path:
-            return
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO agent_logs (request_id, message, details) VALUES (?, ?, ?)",
-                ("MCP-SYSTEM", message, details)
-            )
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            logger.error(f"⚠️ MCP DB 로그 저장 실패: {e}")
+        """DB에 MCP 관련 로그 저장 (백그라운드 배치 기록)"""
+        if self._log_sink:
+            self._log_sink.write("MCP-SYSTEM", message, details)
+
+    def on_notification(self, method: str, handler: Callable[[Dict[str, Any]], None]):
+        """서버 알림(method) 수신 시 호출할 처리기를 등록합니다."""
+        self._notification_handlers.setdefault(method, []).append(handler)
+
+    def _dispatch_notification(self, data: Dict[str, Any]):
+        method = data.get("method")
+        logger.info(f"🔔 [MCP] 서버 알림 수신: {method}")
+        for handler in self._notification_handlers.get(method, []):
+            try:
+                handler(data)
+            except Exception as e:
+                logger.error(f"⚠️ [MCP] 알림 처리 실패 ({method}): {e}")
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    def get_health(self) -> Dict[str, Any]:
+        """연결 상태 및 재연결 지표 조회"""
+        return {**self.health, "in_flight": len(self._pending)}
 
     async def connect(self):
-        """SSE 연결을 수립하고 Session ID를 획득합니다."""
-        logger.info(f"📡 [MCP] SSE 연결 시도: {self.host}/sse")
-        
-        # 1. GET /sse 호출 (Stream 시작)
-        # httpx.stream을 사용하여 지속적인 연결 유지
-        self._listen_task = asyncio.create_task(self._listen_sse())
-        
-        # 세션 정보가 올 때까지 대기
-        wait_count = 0
-        while not self.session_id and wait_count < 50:
-            await asyncio.sleep(0.1)
-            wait_count += 1
-            
-        if not self.session_id:
+        """
+        SSE 연결 감시 태스크를 시작하고 첫 Session ID를 받을 때까지 기다립니다.
+        연결에 실패해도 감시 태스크는 백그라운드에서 계속 재연결을 시도합니다.
+        """
+        if self._supervisor_task is None or self._supervisor_task.done():
+            logger.info(f"📡 [MCP] SSE 연결 시도: {self.host}/sse")
+            self._closed = False
+            self.health["state"] = "connecting"
+            # GET /sse 스트림을 유지하는 감시 태스크 시작
+            self._supervisor_task = asyncio.create_task(self._supervise())
+
+        try:
+            # 세션 정보가 올 때까지 대기
+            await asyncio.wait_for(self._connected.wait(), timeout=self.connect_timeout)
+        except asyncio.TimeoutError:
             raise Exception("MCP 서버로부터 세션 ID를 받지 못했습니다.")
-            
+
+    async def _supervise(self):
+        """SSE 스트림이 끊길 때마다 지수 백오프(+지터)로 재연결합니다."""
+        delay = self.reconnect_initial_delay
+        while not self._closed:
+            try:
+                await self._listen_sse()
+                error = "SSE 스트림 종료"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = str(e) or type(e).__name__
+
+            was_connected = self.is_connected
+            self._mark_down(error)
+            if self._closed:
+                break
+            if was_connected:
+                # 정상 세션이 있었다면 일시적 끊김이므로 백오프를 처음부터 다시 시작
+                delay = self.reconnect_initial_delay
+
+            wait = delay * random.uniform(0.8, 1.2)
+            logger.warning(f"🔁 [MCP] {wait:.1f}초 후 재연결 시도 (연속 실패 {self.health['consecutive_failures']}회)")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, self.reconnect_max_delay)
+            self.health["reconnects"] += 1
+
+    def _mark_down(self, error: str):
+        """연결 끊김 상태로 전환 (대기 중인 요청은 재연결 후 재전송을 위해 유지)"""
+        if self.is_connected:
+            logger.error(f"📡 [MCP] SSE 연결 끊김 (Session: {self.session_id}): {error}")
+            self._save_log("MCP Connection Lost", error)
+            self.health["last_disconnected_at"] = time.time()
+        else:
+            logger.error(f"📡 [MCP] SSE 연결 실패: {error}")
+        self._connected.clear()
+        self.session_id = None
+        self.endpoint_url = None
+        self.health.update({
+            "state": "closed" if self._closed else "reconnecting",
+            "session_id": None,
+            "last_error": error
+        })
+        self.health["consecutive_failures"] += 1
+
+    def _on_session_established(self):
+        """endpoint 이벤트 수신 시 연결 상태 갱신 및 대기 요청 재전송"""
+        self._connected.set()
+        self.health.update({
+            "state": "connected",
+            "session_id": self.session_id,
+            "consecutive_failures": 0,
+            "last_connected_at": time.time()
+        })
+        self.health["connects"] += 1
         logger.info(f"📡 [MCP] 연결 성공: Session ID = {self.session_id}")
         self._save_log("MCP Connection Established", f"Session ID: {self.session_id}")
+        if self._inflight:
+            # 청취 루프가 멈추지 않도록 재전송은 별도 태스크에서 수행
+            asyncio.create_task(self._resend_inflight())
+
+    async def _resend_inflight(self):
+        """이전 세션에서 응답을 받지 못한 요청을 새 세션으로 다시 보냅니다."""
+        for msg_id, payload in list(self._inflight.items()):
+            if msg_id not in self._pending or not self.is_connected:
+                continue
+            try:
+                resp = await self._client.post(self._message_url(), json=payload)
+                resp.raise_for_status()
+                self.health["resent_requests"] += 1
+                logger.info(f"🔁 [MCP] 요청 재전송: {payload['params']['name']} (ID: {msg_id})")
+            except Exception as e:
+                logger.error(f"❌ [MCP] 요청 재전송 실패 (ID: {msg_id}): {e}")
+
+    def _message_url(self) -> str:
+        # POST /sse/message?session_id=...
+        return f"{self.host}/sse/message?session_id={self.session_id}"
 
     async def _listen_sse(self):
-        """background에서 SSE 이벤트를 수신합니다."""
-        try:
-            async with self._client.stream("GET", f"{self.host}/sse") as response:
-                current_event = None
-                async for line in response.aiter_lines():
-                    if line.startswith("event:"):
-                        current_event = line.replace("event:", "").strip()
-                    elif line.startswith("data:"):
-                        data_str = line.replace("data:", "").strip()
-                        
-                        if current_event == "endpoint":
-                            # MCP 표준: endpoint 데이터는 JSON이 아닌 raw URI 문자열임
-                            self.endpoint_url = data_str
-                            # URL에서 session_id 추출
-                            if "session_id=" in data_str:
-                                self.session_id = data_str.split("session_id=")[1].split("&")[0]
-                            logger.info(f"📡 [MCP] 엔드포인트 수신 (Standard URI): {self.endpoint_url}")
-                        else:
-                            # 다른 이벤트(예: message)는 JSON임
-                            try:
-                                data = json.loads(data_str)
-                                if current_event == "message":
-                                    msg_id = data.get("id")
-                                    if msg_id in self._response_queues:
-                                        await self._response_queues[msg_id].put(data)
-                            except json.JSONDecodeError:
-                                logger.debug(f"⚠️ [MCP] JSON 파싱 실패 (Data: {data_str})")
-                        
-                        current_event = None
-        except Exception as e:
-            logger.error(f"📡 [MCP] SSE 청취 에러: {e}")
+        """SSE 이벤트를 수신합니다. 스트림이 끊기면 예외를 올려 감시 태스크가 재연결하게 합니다."""
+        async with self._client.stream("GET", f"{self.host}/sse") as response:
+            response.raise_for_status()
+            current_event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    current_event = line.replace("event:", "").strip()
+                elif line.startswith("data:"):
+                    data_str = line.replace("data:", "").strip()
+                    
+                    if current_event == "endpoint":
+                        # MCP 표준: endpoint 데이터는 JSON이 아닌 raw URI 문자열임
+                        self.endpoint_url = data_str
+                        # URL에서 session_id 추출
+                        if "session_id=" in data_str:
+                            self.session_id = data_str.split("session_id=")[1].split("&")[0]
+                        logger.info(f"📡 [MCP] 엔드포인트 수신 (Standard URI): {self.endpoint_url}")
+                        if self.session_id:
+                            self._on_session_established()
+                    else:
+                        # 다른 이벤트(예: message)는 JSON임
+                        try:
+                            data = json.loads(data_str)
+                            if current_event == "message":
+                                msg_id = data.get("id")
+                                if msg_id is None and "method" in data:
+                                    self._dispatch_notification(data)
+                                else:
+                                    self._resolve_pending(msg_id, data)
+                        except json.JSONDecodeError:
+                            logger.debug(f"⚠️ [MCP] JSON 파싱 실패 (Data: {data_str})")
+                    
+                    current_event = None
+
+    def _resolve_pending(self, msg_id: Any, data: Dict[str, Any]):
+        """수신한 응답을 같은 id로 대기 중인 요청에 전달"""
+        future = self._pending.pop(msg_id, None)
+        if future is None:
+            logger.debug(f"⚠️ [MCP] 대기 중인 요청이 없는 응답 (ID: {msg_id})")
+        elif not future.done():
+            future.set_result(data)
+
+    def _fail_pending(self, exc: Exception):
+        """대기 중인 모든 요청을 예외로 종료"""
+        pending, self._pending = self._pending, {}
+        self._inflight.clear()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc)
 
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """도구를 실행하고 결과를 기다립니다."""
-        if not self.session_id:
-            await self.connect()
+        if not self.is_connected:
+            if self.health["state"] == "reconnecting":
+                # 연결이 끊긴 동안에는 타임아웃까지 기다리지 않고 즉시 실패
+                self.health["fast_failures"] += 1
+                logger.warning(f"⚠️ [MCP] 재연결 중이므로 도구 호출 즉시 실패: {tool_name}")
+                return {"error": f"MCP 서버 연결 끊김 (재연결 중): {self.health['last_error']}"}
+            try:
+                # 최초 연결 (동시에 들어온 호출은 같은 연결 수립을 함께 기다림)
+                await self.connect()
+            except Exception as e:
+                logger.error(f"❌ [MCP] 도구 호출 실패: {e}")
+                return {"error": str(e)}
             
-        msg_id = int(asyncio.get_event_loop().time() * 1000)
-        self._response_queues[msg_id] = asyncio.Queue()
+        msg_id = next(self._msg_ids)
+        # POST 응답보다 SSE 결과가 먼저 도착할 수 있으므로 요청 전에 Future를 등록
+        future = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = future
         
         payload = {
             "jsonrpc": "2.0",
@@ -119,19 +285,27 @@ mcp_client.py - MCP(Model Context Protocol) SSE 클라이언트 인터페이스
             "id": msg_id
         }
         
-        # POST /sse/message?session_id=... 호출
-        url = f"{self.host}/sse/message?session_id={self.session_id}"
+        self._inflight[msg_id] = payload
         
         try:
             logger.info(f"📤 [MCP REQ] 도구 호출 요청: {tool_name} (ID: {msg_id})")
-            resp = await self._client.post(url, json=payload)
-            resp.raise_for_status()
+            try:
+                resp = await self._client.post(self._message_url(), json=payload)
+                resp.raise_for_status()
+            except Exception as e:
+                if self.is_connected:
+                    raise
+                # 전송 도중 연결이 끊김: 새 세션에서 재전송되므로 응답 대기를 계속
+                logger.warning(f"⚠️ [MCP] 전송 중 연결 끊김, 재연결 후 재전송 예정 (ID: {msg_id}): {e}")
             
-            # 결과 대기 (이벤트 스트림을 통해 들어옴)
-            result_msg = await asyncio.wait_for(self._response_queues[msg_id].get(), timeout=20.0)
+            # 결과 대기 (이벤트 스트림을 통해 들어옴, 시간 초과 시 Future는 취소됨)
+            result_msg = await asyncio.wait_for(future, timeout=self.request_timeout)
+            if "error" in result_msg:
+                logger.error(f"❌ [MCP] 서버 에러 응답 (ID: {msg_id}): {result_msg['error']}")
+                return {"error": result_msg["error"]}
             result = result_msg.get("result", {})
             logger.info(f"📥 [MCP RESP] 응답 수신 완료 (ID: {msg_id})")
-            logger.debug(f"--- [MCP RESP Detail] ---\n{json.dumps(result, ensure_ascii=False, indent=2)}\n-------------------------")
+            log_payload(logger, logging.DEBUG, "--- [MCP RESP Detail] ---", result)
             self._save_log(f"Tool Result: {tool_name}", json.dumps(result, ensure_ascii=False))
             return result
             
@@ -139,10 +313,17 @@ mcp_client.py - MCP(Model Context Protocol) SSE 클라이언트 인터페이스
             logger.error(f"❌ [MCP] 도구 호출 실패: {e}")
             return {"error": str(e)}
         finally:
-            if msg_id in self._response_queues:
-                del self._response_queues[msg_id]
+            # 정상 완료, 시간 초과, 작업 취소(CancelledError) 모두 대기 테이블에서 제거
+            self._pending.pop(msg_id, None)
+            self._inflight.pop(msg_id, None)
 
     async def close(self):
-        if self._listen_task:
-            self._listen_task.cancel()
+        self._closed = True
+        if self._supervisor_task:
+            self._supervisor_task.cancel()
+        self._connected.clear()
+        self.health["state"] = "closed"
+        self._fail_pending(ConnectionError("MCP 클라이언트 종료"))
         await self._client.aclose()
+        if self._owns_log_sink:
+            self._log_sink.close()
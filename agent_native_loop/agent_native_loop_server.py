@@ -10,14 +10,13 @@ import asyncio
 import json
 import logging
 import sys
-import sqlite3
 import re
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
 import httpx
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -27,6 +26,18 @@ from pydantic import BaseModel
 # 스크립트 위치를 경로에 추가하여 어디서 실행하든 native_tools를 찾을 수 있게 함
 sys.path.append(str(Path(__file__).parent))
 from native_loop_tools import NATIVE_TOOL_DEFS, NATIVE_TOOL_REGISTRY
+from approval_broker import create_approval_broker, CHANNEL_HTTP
+# 공용 DB 모듈(db/log_sink.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "db"))
+from log_sink import create_log_sink
+# 공용 모듈(common/log_utils.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from log_utils import setup_logging, log_payload
+from llm_cache import create_llm_cache, cache_bypass_requested, cached_llm_call
+from llm_gateway import create_llm_gateway
+from context_window import create_context_window
+from admission import setup_admission, released_admission
+from tool_runner import run_concurrent_tool_calls
 
 # 설정 로드
 CONFIG_PATH = (Path(__file__).parent / "agent_native_loop_config" / "agent_native_loop_config.json").resolve()
@@ -47,14 +58,8 @@ config = load_config()
 
 # 로깅 설정
 LOG_FILE = (Path(__file__).parent / "agent_native_loop.log").resolve()
-logging.basicConfig(
-    level=getattr(logging, config["logging"]["level"]),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(LOG_FILE, encoding="utf-8")
-    ]
-)
+# 콘솔/파일 출력은 QueueListener 스레드가 담당 (요청 경로에서 디스크 I/O 제거)
+setup_logging(config["logging"], LOG_FILE)
 logger = logging.getLogger("agent_native_loop")
 # mcp_client 로거도 같은 핸들러를 사용하도록 설정 (상속)
 logging.getLogger("mcp_loop_client").setLevel(getattr(logging, config["logging"]["level"]))
@@ -63,55 +68,45 @@ logging.getLogger("mcp_loop_client").setLevel(getattr(logging, config["logging"]
 DB_RELATIVE_PATH = config.get("database", {}).get("path", "../db/agent_native_loop_data.db")
 DB_PATH = (Path(__file__).parent / "agent_native_loop_config" / DB_RELATIVE_PATH).resolve()
 
+# agent_logs 배치 기록기 (요청 경로에서 DB I/O 제거)
+log_sink = create_log_sink(DB_PATH, config["logging"].get("db_sink"))
+
+# 결정적(temperature 0) LLM 호출 응답 캐시 (설정에서 비활성화하면 None)
+llm_cache = create_llm_cache(config.get("llm_cache"), CONFIG_PATH.parent)
+
+# 공유 LLM 게이트웨이 (연결 풀 + 5xx/연결 끊김 재시도 + 지연 시간/토큰 지표)
+llm_gateway = create_llm_gateway(config)
+
+# LLM에 보낼 대화 이력을 컨텍스트 예산에 맞게 축소 (설정에서 비활성화하면 None)
+context_window = create_context_window(config.get("context_window"))
+
+# 도구 실행 승인 중개자 (동시 요청의 승인 프롬프트를 큐로 관리, 터미널/HTTP/WebSocket 채널)
+approval_broker = create_approval_broker(config.get("approval"))
+
 # MCP 클라이언트 제거 (로컬 도구 사용)
 # mcp_client = McpSseClient(config["mcp"]["host"], db_path=DB_PATH)
 
 def save_agent_log(request_id: str, message: str, details: Optional[str] = None):
-    """DB에 에이전트 활동 로그 저장"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO agent_logs (request_id, message, details) VALUES (?, ?, ?)",
-            (request_id, message, details)
-        )
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        logger.error(f"⚠️ DB 로그 저장 실패: {e}")
-
-async def ask_terminal_approval(func_name: str, args: Dict) -> bool:
-    """
-    터미널에서 도구 실행 승인을 요청합니다.
-    y/Y/yes/Yes 입력 시 True, 그 외는 False 반환
-    """
-    print("\n" + "="*60)
-    print(f"🔧 도구 실행 승인 요청")
-    print(f"   도구: {func_name}")
-    print(f"   인자: {json.dumps(args, ensure_ascii=False, indent=2)}")
-    print("="*60)
-    
-    # async 방식으로 input() 호출 (이벤트 루프 블로킹 방지)
-    loop = asyncio.get_event_loop()
-    user_input = await loop.run_in_executor(None, lambda: input("실행하시겠습니까? (y/n): "))
-    
-    approved = user_input.strip().lower() in ['y', 'yes', '예', 'ㅛ']
-    if approved:
-        print("✅ 승인됨 - 도구를 실행합니다.\n")
-    else:
-        print("❌ 거절됨 - 도구 실행을 건너뜁니다.\n")
-    
-    return approved
+    """DB에 에이전트 활동 로그 저장 (큐에만 넣고 백그라운드 스레드가 배치로 기록)"""
+    log_sink.write(request_id, message, details)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """서버 시작 시 초기화"""
     logger.info("Agent Native Loop Server starting (Truly Native Mode)...")
     logger.info(f"{len(NATIVE_TOOL_DEFS)} native tools loaded")
+    approval_broker.start()
     yield
+    await approval_broker.close()
+    log_sink.close()
+    if llm_cache:
+        llm_cache.close()
+    await llm_gateway.close()
     logger.info("Agent Native Loop Server stopped")
 
 app = FastAPI(title="Void Lab Test - Active Agent Native Loop", lifespan=lifespan)
+# 채팅 엔드포인트 입장 제어 (CORS보다 먼저 추가해야 거절 응답에도 CORS 헤더가 붙음, 비활성화면 None)
+admission = setup_admission(app, config.get("admission"), ["/v1/chat/completions"])
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"])
 
 # 요청 모델
@@ -128,6 +123,10 @@ class ChatRequest(BaseModel):
     tools: Optional[List[Dict[str, Any]]] = None
     stream: bool = False
 
+class ApprovalDecision(BaseModel):
+    approve: Optional[bool] = None                 # True/False: 티켓의 모든 도구에 적용
+    approved_indices: Optional[List[int]] = None   # 1부터 시작하는 도구 번호 (지정한 도구만 승인)
+
 @app.get("/")
 async def root():
     """서버 상태 및 LLM 연결 확인용 루트 엔드포인트"""
@@ -181,12 +180,102 @@ async def chat_completions_get():
         "hint": "OpenAI 호환 API 규격은 채팅 완료를 위해 POST /v1/chat/completions를 사용합니다."
     }
 
+@app.get("/logs/stats")
+async def get_log_sink_stats():
+    """agent_logs 배치 기록기 지표 조회 (큐 깊이, 기록/폐기 건수)"""
+    return log_sink.get_stats()
+
+@app.get("/cache/stats")
+async def get_llm_cache_stats():
+    """LLM 응답 캐시 지표 조회 (적중/실패/만료/우회 건수)"""
+    return llm_cache.get_stats() if llm_cache else {"enabled": False}
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """입장 제어 지표 조회 (처리 중/대기 중 요청 수, 거절 건수, 대기 시간)"""
+    return admission.get_stats() if admission else {"enabled": False}
+
+@app.get("/context/stats")
+async def get_context_window_stats():
+    """컨텍스트 창 관리 지표 조회 (축소 횟수, 생략/제거된 메시지 수, 축소 전후 토큰)"""
+    return context_window.get_stats() if context_window else {"enabled": False}
+
+@app.get("/llm/stats")
+async def get_llm_gateway_stats():
+    """LLM 게이트웨이 지표 조회 (지연 시간, 토큰 사용량, 재시도, 연결 풀)"""
+    return llm_gateway.get_stats()
+
+@app.get("/approvals")
+async def list_approvals():
+    """대기 중인 도구 실행 승인 티켓 조회"""
+    return {"pending": approval_broker.list_pending(), "stats": approval_broker.get_stats()}
+
+def decision_to_list(ticket: Dict[str, Any], decision: Dict[str, Any]) -> List[bool]:
+    """승인 결정(approve 또는 approved_indices)을 도구별 승인 여부 목록으로 변환"""
+    indices = decision.get("approved_indices")
+    if indices is not None:
+        return [i in indices for i in range(1, len(ticket["calls"]) + 1)]
+    return [bool(decision.get("approve", False))]
+
+def resolve_ticket(ticket_id: str, decision: Dict[str, Any], channel: str) -> Dict[str, Any]:
+    """HTTP/WebSocket 채널 공통 승인 처리"""
+    ticket = next((t for t in approval_broker.list_pending() if t["ticket_id"] == ticket_id), None)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail=f"대기 중인 승인 티켓이 없습니다: {ticket_id}")
+    try:
+        approval_broker.resolve(ticket_id, decision_to_list(ticket, decision), channel)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "decided", "ticket_id": ticket_id}
+
+@app.post("/approvals/{ticket_id}")
+async def decide_approval(ticket_id: str, decision: ApprovalDecision):
+    """HTTP 채널로 승인/거절 (터미널보다 먼저 도착하면 이 결정이 반영됨)"""
+    if CHANNEL_HTTP not in approval_broker.channels:
+        raise HTTPException(status_code=403, detail="HTTP 승인 채널이 비활성화되어 있습니다")
+    return resolve_ticket(ticket_id, decision.model_dump(), CHANNEL_HTTP)
+
+@app.websocket("/approvals/ws")
+async def approvals_ws(websocket: WebSocket):
+    """
+    WebSocket 승인 채널
+    - 접속 시 대기 중 티켓 목록(snapshot)을 보내고, 이후 티켓 생성/결정 이벤트를 전송
+    - 클라이언트는 {"ticket_id": ..., "approve": true} 또는 {"ticket_id": ..., "approved_indices": [1, 3]} 전송
+    """
+    if CHANNEL_HTTP not in approval_broker.channels:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    events = approval_broker.subscribe()
+
+    async def forward_events():
+        while True:
+            await websocket.send_json(await events.get())
+
+    sender = asyncio.create_task(forward_events())
+    try:
+        await websocket.send_json({"event": "snapshot", "pending": approval_broker.list_pending()})
+        while True:
+            message = await websocket.receive_json()
+            try:
+                reply = resolve_ticket(str(message.get("ticket_id")), message, "websocket")
+            except HTTPException as e:
+                reply = {"status": "error", "ticket_id": message.get("ticket_id"), "detail": e.detail}
+            await websocket.send_json({"event": "decision_result", **reply})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        approval_broker.unsubscribe(events)
+
 @app.post("/v1/chat/completions")
-async def chat_completions(request: ChatRequest):
+async def chat_completions(request: ChatRequest, raw_request: Request):
     """
     자율 실행 루프를 포함한 채팅 엔드포인트
     """
     request_id = datetime.now().strftime("%H%M%S")
+    # 요청 헤더로 LLM 응답 캐시 우회 가능 (X-LLM-Cache: bypass 또는 Cache-Control: no-cache)
+    use_cache = not cache_bypass_requested(raw_request.headers)
     logger.info(f"[Agent-{request_id}] New request received: {request.messages[-1].content}")
     save_agent_log(request_id, "Request Received", request.messages[-1].content)
     
@@ -215,7 +304,7 @@ async def chat_completions(request: ChatRequest):
                     pass
 
             # LLM 호출
-            full_ollama_resp = await call_llm(current_messages, tools)
+            full_ollama_resp = await call_llm(current_messages, tools, use_cache=use_cache)
             choice = full_ollama_resp.get("choices", [{}])[0]
             assistant_msg = choice.get("message", {})
             current_messages.append(assistant_msg)
@@ -279,8 +368,11 @@ async def chat_completions(request: ChatRequest):
             
             # 도구 실행 (승인 필요)
             logger.info(f"[Agent-{request_id}] Starting {len(tool_calls)} tools (approval required)")
-            rejected = False
+            rejected_count = 0
+            approved_calls = []
+            approved_indices = []
             
+            parsed_calls = []
             for tc in tool_calls:
                 func_name = tc["function"]["name"]
                 args = tc["function"]["arguments"]
@@ -291,41 +383,42 @@ async def chat_completions(request: ChatRequest):
                         pass
                 
                 logger.info(f"[Agent-{request_id}] Tool call: {func_name}({args})")
-                
-                # 🔒 터미널 승인 요청
-                approved = await ask_terminal_approval(func_name, args if isinstance(args, dict) else {})
-                
+                parsed_calls.append((tc, func_name, args))
+            
+            # 🔒 이번 반복의 도구들을 티켓 하나로 승인 요청 (다른 요청의 승인과는 중개자가 순서를 관리)
+            # 사람을 기다리는 동안에는 입장 제어 자리를 반납하여 다른 채팅 요청을 막지 않음
+            async with released_admission():
+                decisions = await approval_broker.request_approval(
+                    request_id, iteration,
+                    [{"name": name, "arguments": a if isinstance(a, dict) else {}} for _, name, a in parsed_calls]
+                )
+            
+            # 승인된 도구만 모아서 실행 (tool 메시지는 tool_calls와 같은 순서로 채움)
+            tool_messages: List[Optional[Dict[str, Any]]] = [None] * len(parsed_calls)
+            for idx, ((tc, func_name, args), approved) in enumerate(zip(parsed_calls, decisions)):
                 if not approved:
-                    rejected = True
+                    rejected_count += 1
                     result = {"success": False, "error": "사용자가 도구 실행을 거절했습니다."}
                     save_agent_log(request_id, f"Tool Rejected: {func_name}", "User rejected")
-                elif func_name in NATIVE_TOOL_REGISTRY:
-                    try:
-                        if isinstance(args, dict):
-                            result = NATIVE_TOOL_REGISTRY[func_name](**args)
-                        else:
-                            result = NATIVE_TOOL_REGISTRY[func_name]()
-                    except Exception as e:
-                        result = {"success": False, "error": str(e)}
-                else:
-                    result = {"success": False, "error": f"Tool '{func_name}' not found"}
-                
-                tool_msg = {
-                    "role": "tool",
-                    "tool_call_id": tc.get("id", "none"),
-                    "name": func_name,
-                    "content": json.dumps(result, ensure_ascii=False)
-                }
-                current_messages.append(tool_msg)
-                save_agent_log(request_id, f"Tool Executed: {func_name}", json.dumps(result, ensure_ascii=False))
+                    tool_messages[idx] = make_tool_message(tc, func_name, result)
+                    save_agent_log(request_id, f"Tool Executed: {func_name}", json.dumps(result, ensure_ascii=False))
+                    logger.info(f"[Agent-{request_id}] User rejected tool execution: {func_name}")
+                    continue
                 
-                # 거절 시 루프 중단
-                if rejected:
-                    logger.info(f"[Agent-{request_id}] User rejected tool execution. Stopping loop.")
-                    break
+                approved_calls.append((tc, func_name, args))
+                approved_indices.append(idx)
+            
+            # 일부만 승인된 경우에도 승인된 도구는 실행한 뒤 루프를 종료
+            if rejected_count:
+                logger.info(f"[Agent-{request_id}] {rejected_count} tool(s) rejected. Stopping loop.")
+            
+            # 승인된 도구들은 동시에 실행하고, 거절 메시지와 합쳐 원래 호출 순서대로 추가
+            for idx, message in zip(approved_indices, await run_tool_calls(request_id, approved_calls)):
+                tool_messages[idx] = message
+            current_messages.extend(tool_messages)
             
             # 거절 시 전체 루프 종료
-            if rejected:
+            if rejected_count:
                 final_response = {
                     "id": "agent-" + datetime.now().strftime("%Y%m%d%H%M%S"),
                     "object": "chat.completion",
@@ -356,30 +449,60 @@ async def chat_completions(request: ChatRequest):
         logger.error(f"❌ [Agent-{request_id}] 처리 중 치명적 에러: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-async def call_llm(messages: List[Dict], tools: Optional[List] = None):
-    """LLM(Ollama, vLLM, OpenAI 등)의 OpenAI 호환 API 호출"""
-    async with httpx.AsyncClient(timeout=config["llm"]["timeout"]) as client:
-        url = f"{config['llm']['base_url']}/chat/completions"
-        headers = {"Content-Type": "application/json"}
-        api_key = str(config["llm"].get("api_key", "")).strip()
-        if api_key and api_key.lower() != "not-needed":
-            headers["Authorization"] = f"Bearer {api_key}"
-
-        payload = {
-            "model": config["llm"]["model"],
-            "messages": messages,
-            "stream": False,
-            "temperature": 0
-        }
-        if tools:
-            payload["tools"] = tools
-            
-        logger.debug(f"📡 [LLM TX] Payload:\n{json.dumps(payload, ensure_ascii=False, indent=2)}")
+def make_tool_message(tc: Dict[str, Any], func_name: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """도구 실행 결과를 대화 이력에 넣을 tool 메시지로 변환"""
+    return {
+        "role": "tool",
+        "tool_call_id": tc.get("id", "none"),
+        "name": func_name,
+        "content": json.dumps(result, ensure_ascii=False)
+    }
+
+async def run_tool_call(request_id: str, tc: Dict[str, Any], func_name: str, args: Any) -> Dict[str, Any]:
+    """승인된 네이티브 도구 하나를 스레드에서 실행하고 tool 메시지를 반환합니다."""
+    if func_name in NATIVE_TOOL_REGISTRY:
+        try:
+            if isinstance(args, dict):
+                result = await asyncio.to_thread(NATIVE_TOOL_REGISTRY[func_name], **args)
+            else:
+                result = await asyncio.to_thread(NATIVE_TOOL_REGISTRY[func_name])
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+    else:
+        result = {"success": False, "error": f"Tool '{func_name}' not found"}
+    
+    save_agent_log(request_id, f"Tool Executed: {func_name}", json.dumps(result, ensure_ascii=False))
+    return make_tool_message(tc, func_name, result)
+
+async def run_tool_calls(request_id: str, approved_calls: List[tuple]) -> List[Dict[str, Any]]:
+    """승인된 도구 호출들을 동시에 실행합니다. (공용 tool_runner 사용)"""
+    return await run_concurrent_tool_calls(
+        approved_calls,
+        lambda call: run_tool_call(request_id, *call),
+        lambda call: call[0].get("id", "none"),
+        config["agent"].get("max_parallel_tools", 4)
+    )
+
+async def call_llm(messages: List[Dict], tools: Optional[List] = None, use_cache: bool = True):
+    """LLM(Ollama, vLLM, OpenAI 등)의 OpenAI 호환 API 호출 (use_cache=False면 응답 캐시 우회)"""
+    # 예산을 넘으면 오래된 도구 결과/턴을 줄인 사본을 보냄 (원본 이력은 그대로)
+    if context_window:
+        messages = context_window.fit(messages, tools)
+    payload = {
+        "model": config["llm"]["model"],
+        "messages": messages,
+        "stream": False,
+        "temperature": 0
+    }
+    if tools:
+        payload["tools"] = tools
         
+    log_payload(logger, logging.DEBUG, "📡 [LLM TX] Payload:", payload)
+    
+    async def send(body: Dict) -> Dict:
+        # 연결 끊김/5xx는 게이트웨이가 재시도한 뒤에도 실패한 경우에만 여기까지 올라옴
         try:
-            resp = await client.post(url, json=payload, headers=headers)
-            resp.raise_for_status()
-            return resp.json()
+            return await llm_gateway.chat(body)
         except httpx.RemoteProtocolError as e:
             logger.error(f"❌ LLM 서버(Ollama)가 연결을 강제로 끊었습니다: {e}")
             raise HTTPException(status_code=500, detail=f"LLM Connection Reset: {str(e)}")
@@ -387,6 +510,9 @@ async def call_llm(messages: List[Dict], tools: Optional[List] = None):
             logger.error(f"❌ LLM 호출 중 에러 발생: {e}")
             raise
 
+    # 같은 대화 이력에 대한 결정적 호출은 캐시된 응답을 재사용
+    return await cached_llm_call(llm_cache, payload, send, use_cache)
+
 def generate_pseudo_stream_hitl(full_resp: Dict):
     """
     LLM 응답을 OpenAI 호환 SSE 스트림으로 변환하여 전송합니다.
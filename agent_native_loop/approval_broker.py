@@ -0,0 +1,307 @@
+"""
+approval_broker.py - 도구 실행 승인(HITL) 중개자
+
+동시에 들어온 여러 채팅 요청이 하나의 터미널을 두고 input()을 다투지 않도록
+승인 요청을 티켓 단위로 큐에 넣고 하나씩 처리합니다.
+
+- 티켓 하나 = 한 요청의 한 반복(iteration)에서 나온 도구 호출 묶음
+  (터미널에서 y=모두 승인, n=모두 거절, "1,3"=해당 번호만 승인)
+- 터미널 입력은 전용 스레드 1개에서만 받으므로 기본 스레드 풀이 막히지 않음
+- HTTP(/approvals)나 WebSocket(/approvals/ws)으로도 같은 티켓을 처리할 수 있고,
+  먼저 도착한 결정만 반영됨
+- 제한 시간 안에 결정이 없으면 timeout_decision(기본 거절)으로 처리
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger("approval_broker")
+
+CHANNEL_TERMINAL = "terminal"
+CHANNEL_HTTP = "http"
+
+APPROVE_WORDS = ("y", "yes", "예", "ㅛ")
+REJECT_WORDS = ("n", "no", "아니오", "ㅜ")
+
+TERMINAL_PROMPT = "실행하시겠습니까? (y=모두 승인 / n=모두 거절 / 1,3=번호 선택): "
+
+
+class ApprovalTicket:
+    """한 요청의 한 반복에서 나온 도구 호출 묶음에 대한 승인 요청"""
+
+    def __init__(self, request_id: str, iteration: int, calls: List[Dict[str, Any]]):
+        self.ticket_id = uuid.uuid4().hex[:8]
+        self.request_id = request_id
+        self.iteration = iteration
+        self.calls = calls  # [{"name": ..., "arguments": {...}}]
+        self.created_at = datetime.now()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.decided_by: Optional[str] = None
+
+    @property
+    def is_pending(self) -> bool:
+        return not self.future.done()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ticket_id": self.ticket_id,
+            "request_id": self.request_id,
+            "iteration": self.iteration,
+            "calls": self.calls,
+            "created_at": self.created_at.isoformat(),
+            "status": "pending" if self.is_pending else "decided",
+            "decided_by": self.decided_by
+        }
+
+
+class ApprovalBroker:
+    """승인 티켓 큐 + 터미널/HTTP 채널 중개"""
+
+    def __init__(
+        self,
+        channels: Optional[List[str]] = None,
+        timeout: Optional[float] = 300.0,
+        timeout_decision: bool = False
+    ):
+        self.channels = set(channels or [CHANNEL_TERMINAL, CHANNEL_HTTP])
+        self.timeout = timeout
+        self.timeout_decision = timeout_decision
+        self._tickets: Dict[str, ApprovalTicket] = {}
+        self._terminal_queue: Optional[asyncio.Queue] = None
+        self._terminal_task: Optional[asyncio.Task] = None
+        # input()은 취소할 수 없으므로 전용 스레드 1개에서만 실행
+        self._input_executor: Optional[ThreadPoolExecutor] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.stats = {"tickets": 0, "approved": 0, "rejected": 0, "timeouts": 0, "by_channel": {}}
+
+    def start(self) -> None:
+        """터미널 채널 처리 태스크 시작 (lifespan에서 호출)"""
+        if CHANNEL_TERMINAL in self.channels and self._terminal_task is None:
+            self._terminal_queue = asyncio.Queue()
+            self._input_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="approval-terminal")
+            self._terminal_task = asyncio.create_task(self._terminal_loop())
+
+    async def close(self) -> None:
+        """대기 중인 티켓을 모두 거절하고 종료"""
+        for ticket in list(self._tickets.values()):
+            self._finish(ticket, [False] * len(ticket.calls), "shutdown")
+        if self._terminal_task:
+            self._terminal_task.cancel()
+            self._terminal_task = None
+        if self._input_executor:
+            # 대기 중인 input()은 중단할 수 없으므로 기다리지 않음
+            self._input_executor.shutdown(wait=False)
+            self._input_executor = None
+
+    async def request_approval(self, request_id: str, iteration: int, calls: List[Dict[str, Any]]) -> List[bool]:
+        """
+        도구 호출 묶음에 대한 승인을 요청하고 결정이 날 때까지 기다립니다.
+
+        Args:
+            request_id: 채팅 요청 ID (승인 화면에 표시)
+            iteration: 에이전트 루프 반복 번호
+            calls: [{"name": 도구 이름, "arguments": 인자}] 목록
+
+        Returns:
+            List[bool]: calls와 같은 순서의 승인 여부
+        """
+        ticket = ApprovalTicket(request_id, iteration, calls)
+        self._tickets[ticket.ticket_id] = ticket
+        self.stats["tickets"] += 1
+        logger.info(f"🔒 [Approval] 티켓 {ticket.ticket_id} 생성 (요청 {request_id}, 도구 {len(calls)}개, 대기 {self.pending_count}건)")
+        self._publish({"event": "ticket_created", "ticket": ticket.to_dict()})
+        if self._terminal_queue is not None:
+            self._terminal_queue.put_nowait(ticket)
+
+        try:
+            # shield: 시간 초과가 나도 Future 자체는 취소하지 않고 timeout_decision으로 확정
+            return await asyncio.wait_for(asyncio.shield(ticket.future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.warning(f"⏰ [Approval] 티켓 {ticket.ticket_id} 시간 초과 ({self.timeout}초)")
+            self._finish(ticket, [self.timeout_decision] * len(calls), "timeout")
+            return ticket.future.result()
+        finally:
+            if not ticket.future.done():
+                # 요청 자체가 취소된 경우 (클라이언트 연결 종료 등)
+                self._finish(ticket, [False] * len(calls), "cancelled")
+            self._tickets.pop(ticket.ticket_id, None)
+
+    def resolve(self, ticket_id: str, decisions: List[bool], channel: str) -> bool:
+        """
+        티켓에 결정을 반영합니다. (이미 처리되었거나 없는 티켓이면 False)
+
+        Args:
+            decisions: 도구별 승인 여부 (길이가 1이면 모든 도구에 적용)
+            channel: 결정한 채널 이름 (통계/로그용)
+        """
+        ticket = self._tickets.get(ticket_id)
+        if ticket is None or not ticket.is_pending:
+            return False
+        if len(decisions) == 1:
+            decisions = decisions * len(ticket.calls)
+        if len(decisions) != len(ticket.calls):
+            raise ValueError(f"결정 개수({len(decisions)})가 도구 개수({len(ticket.calls)})와 다릅니다")
+        self._finish(ticket, list(decisions), channel)
+        return True
+
+    def list_pending(self) -> List[Dict[str, Any]]:
+        return [t.to_dict() for t in self._tickets.values() if t.is_pending]
+
+    @property
+    def pending_count(self) -> int:
+        return sum(1 for t in self._tickets.values() if t.is_pending)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "pending": self.pending_count,
+            "channels": sorted(self.channels),
+            "subscribers": len(self._subscribers)
+        }
+
+    def subscribe(self) -> asyncio.Queue:
+        """티켓 생성/결정 이벤트 구독 (WebSocket 채널용)"""
+        q: asyncio.Queue = asyncio.Queue(maxsize=1000)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        self._subscribers.discard(q)
+
+    def _finish(self, ticket: ApprovalTicket, decisions: List[bool], channel: str) -> None:
+        if not ticket.is_pending:
+            return
+        ticket.decided_by = channel
+        ticket.future.set_result(decisions)
+        approved = sum(1 for d in decisions if d)
+        self.stats["approved"] += approved
+        self.stats["rejected"] += len(decisions) - approved
+        self.stats["by_channel"][channel] = self.stats["by_channel"].get(channel, 0) + 1
+        logger.info(f"✅ [Approval] 티켓 {ticket.ticket_id} 처리 ({channel}): 승인 {approved}/{len(decisions)}")
+        self._publish({"event": "ticket_decided", "ticket": ticket.to_dict(), "decisions": decisions})
+
+    def _publish(self, event: Dict[str, Any]) -> None:
+        for q in list(self._subscribers):
+            try:
+                q.put_nowait(event)
+            except asyncio.QueueFull:
+                # 읽지 않는 구독자는 이벤트를 놓침 (다음 접속 시 /approvals로 현재 상태 조회)
+                pass
+
+    async def _terminal_loop(self):
+        """
+        터미널 채널: 대기 중인 티켓을 하나씩 보여주고 입력을 받음
+
+        input()은 취소할 수 없으므로, 보여주던 티켓이 다른 채널(HTTP/WS)이나 시간 초과로 먼저 처리되면
+        진행 중인 input()은 그대로 두고 다음 티켓을 보여줍니다. 이후 입력은 새로 보여준 티켓에 적용됩니다.
+        """
+        loop = asyncio.get_running_loop()
+        ticket: Optional[ApprovalTicket] = None
+        reader: Optional[asyncio.Future] = None  # 진행 중인 input() (티켓이 바뀌어도 유지)
+        next_ticket: Optional[asyncio.Future] = None
+        try:
+            while True:
+                if reader is None:
+                    # 티켓이 없을 때도 읽어야 그 사이의 입력이 다음 티켓에 잘못 적용되지 않음
+                    reader = loop.run_in_executor(self._input_executor, input)
+                if ticket is None:
+                    next_ticket = asyncio.ensure_future(self._terminal_queue.get())
+                    waiting = {next_ticket}
+                else:
+                    next_ticket = None
+                    waiting = {ticket.future}
+                done, _ = await asyncio.wait(waiting | {reader}, return_when=asyncio.FIRST_COMPLETED)
+
+                if reader in done:
+                    try:
+                        answer = reader.result()
+                    except EOFError:
+                        logger.warning("⚠️ [Approval] 터미널 입력을 사용할 수 없어 터미널 채널을 중지합니다. (HTTP 채널 사용)")
+                        self.channels.discard(CHANNEL_TERMINAL)
+                        self._terminal_queue = None
+                        self._terminal_task = None
+                        return
+                    reader = None
+                    if ticket is None:
+                        print("ℹ️ 대기 중인 승인 요청이 없어 입력을 무시합니다.\n")
+                    elif ticket.is_pending:
+                        decisions = self._parse_answer(answer, len(ticket.calls))
+                        if decisions is None:
+                            print("⚠️ 입력을 이해하지 못했습니다. 다시 입력해주세요.")
+                            print(TERMINAL_PROMPT, end="", flush=True)
+                        else:
+                            self.resolve(ticket.ticket_id, decisions, CHANNEL_TERMINAL)
+                            self._print_result(decisions)
+                            ticket = None
+
+                if ticket is not None and not ticket.is_pending:
+                    print(f"\nℹ️ 티켓 {ticket.ticket_id}은(는) 이미 {ticket.decided_by} 채널에서 처리되었습니다.\n")
+                    ticket = None
+
+                if next_ticket is not None:
+                    if next_ticket in done:
+                        queued: ApprovalTicket = next_ticket.result()
+                        if queued.is_pending:  # 다른 채널에서 이미 처리된 티켓은 건너뜀
+                            ticket = queued
+                            self._print_ticket(ticket)
+                            print(TERMINAL_PROMPT, end="", flush=True)
+                    else:
+                        next_ticket.cancel()
+                    next_ticket = None
+        finally:
+            if next_ticket is not None:
+                next_ticket.cancel()
+
+    @staticmethod
+    def _print_result(decisions: List[bool]) -> None:
+        approved = sum(1 for d in decisions if d)
+        if approved == len(decisions):
+            print("✅ 승인됨 - 도구를 실행합니다.\n")
+        elif approved == 0:
+            print("❌ 거절됨 - 도구 실행을 건너뜁니다.\n")
+        else:
+            print(f"☑️ 일부 승인됨 ({approved}/{len(decisions)})\n")
+
+    def _print_ticket(self, ticket: ApprovalTicket) -> None:
+        waiting = self._terminal_queue.qsize() if self._terminal_queue else 0
+        print("\n" + "="*60)
+        print(f"🔧 도구 실행 승인 요청 [티켓 {ticket.ticket_id}]")
+        print(f"   요청: {ticket.request_id} (반복 {ticket.iteration})")
+        for idx, call in enumerate(ticket.calls, 1):
+            print(f"   {idx}. 도구: {call['name']}")
+            print(f"      인자: {json.dumps(call['arguments'], ensure_ascii=False, indent=2)}")
+        if waiting:
+            print(f"   (이후 대기 중인 승인 요청 {waiting}건)")
+        print("="*60)
+
+    @staticmethod
+    def _parse_answer(answer: str, count: int) -> Optional[List[bool]]:
+        """터미널 입력을 도구별 승인 여부로 변환 (이해할 수 없으면 None)"""
+        answer = answer.strip().lower()
+        if answer in APPROVE_WORDS:
+            return [True] * count
+        if answer in REJECT_WORDS or answer == "":
+            return [False] * count
+        try:
+            selected = {int(part) for part in answer.replace(" ", "").split(",") if part}
+        except ValueError:
+            return None
+        if not selected or any(i < 1 or i > count for i in selected):
+            return None
+        return [i in selected for i in range(1, count + 1)]
+
+
+def create_approval_broker(approval_config: Optional[Dict[str, Any]]) -> ApprovalBroker:
+    """설정(approval)으로 승인 중개자 생성"""
+    approval_config = approval_config or {}
+    return ApprovalBroker(
+        channels=approval_config.get("channels", [CHANNEL_TERMINAL, CHANNEL_HTTP]),
+        timeout=approval_config.get("timeout_seconds", 300),
+        timeout_decision=approval_config.get("timeout_decision", "reject") == "approve"
+    )
@@ -5,10 +5,15 @@ native_loop_tools.py - MCP 서버 없이 에이전트가 직접 실행하는 도
 import json
 import sqlite3
 import logging
+import sys
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 from datetime import datetime, date
 
+# 공용 DB 모듈(db/docs_search.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "db"))
+from docs_search import search_documents
+
 logger = logging.getLogger(__name__)
 
 # 데이터베이스 경로 설정 (agent_native_loop_config와 동일한 위치를 바라보도록 설정)
@@ -16,25 +21,14 @@ DB_PATH = (Path(__file__).parent.parent / "db" / "agent_native_loop_data.db").re
 # 실제 서비스용 데이터 DB (mcp_data.db의 내용을 활용)
 SERVICE_DB_PATH = (Path(__file__).parent.parent / "db" / "mcp_data.db").resolve()
 
-def search_docs(query: str) -> Dict[str, Any]:
-    """회사 문서에서 정보를 검색합니다."""
-    logger.info(f"[NativeTools] search_docs 실행: query='{query}'")
+def search_docs(query: str, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+    """회사 문서에서 정보를 검색합니다. (FTS 인덱스가 있으면 BM25 순위, 없으면 LIKE)"""
+    logger.info(f"[NativeTools] search_docs 실행: query='{query}', limit={limit}, offset={offset}")
     
     conn = sqlite3.connect(SERVICE_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, title, content, category 
-        FROM documents 
-        WHERE title LIKE ? OR content LIKE ?
-    """, (f"%{query}%", f"%{query}%"))
-    
-    results = []
-    for row in cursor.fetchall():
-        results.append({
-            "id": row[0], "title": row[1], "content": row[2], "category": row[3]
-        })
+    results = search_documents(conn, query, limit=limit, offset=offset)
     conn.close()
-    return {"success": True, "query": query, "count": len(results), "results": results}
+    return {"success": True, "query": query, "count": len(results), "limit": limit, "offset": offset, "results": results}
 
 def get_employee_info(employee_id: str) -> Dict[str, Any]:
     """직원 정보를 조회합니다."""
@@ -139,7 +133,9 @@ NATIVE_TOOL_DEFS = [
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "query": {"type": "string", "description": "검색할 키워드"}
+                    "query": {"type": "string", "description": "검색할 키워드"},
+                    "limit": {"type": "integer", "description": "최대 결과 수 (기본: 10)"},
+                    "offset": {"type": "integer", "description": "건너뛸 결과 수 (기본: 0)"}
                 },
                 "required": ["query"]
             }
@@ -6,16 +6,15 @@ LLM이 도구 호출을 요청하면, 클라이언트(Void)에게 반환하기 
 최종 답변이 나올 때까지 이 과정을 반복합니다.
 """
 
+import asyncio
 import json
 import logging
 import sys
-import sqlite3
 import re
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
-import httpx
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -26,6 +25,18 @@ from pydantic import BaseModel
 # 스크립트 위치를 경로에 추가하여 어디서 실행하든 mcp_client를 찾을 수 있게 함
 sys.path.append(str(Path(__file__).parent))
 from mcp_client import McpSseClient
+from tool_catalog import ToolCatalog
+# 공용 DB 모듈(db/log_sink.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "db"))
+from log_sink import create_log_sink
+# 공용 모듈(common/log_utils.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from log_utils import setup_logging, log_payload
+from llm_cache import create_llm_cache, cache_bypass_requested, cached_llm_call
+from llm_gateway import create_llm_gateway
+from context_window import create_context_window
+from admission import setup_admission
+from tool_runner import iter_concurrent_tool_calls, run_concurrent_tool_calls
 
 # 설정 로드
 CONFIG_PATH = Path(__file__).parent / "agent_proxy_config" / "agent_proxy_config.json"
@@ -46,14 +57,8 @@ config = load_config()
 
 # 로깅 설정
 LOG_FILE = Path(__file__).parent / "agent_proxy.log"
-logging.basicConfig(
-    level=getattr(logging, config["logging"]["level"]),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(LOG_FILE, encoding="utf-8")
-    ]
-)
+# 콘솔/파일 출력은 QueueListener 스레드가 담당 (요청 경로에서 디스크 I/O 제거)
+setup_logging(config["logging"], LOG_FILE)
 logger = logging.getLogger("agent_proxy")
 # mcp_client 로거도 같은 핸들러를 사용하도록 설정 (상속)
 logging.getLogger("mcp_client").setLevel(getattr(logging, config["logging"]["level"]))
@@ -62,22 +67,40 @@ logging.getLogger("mcp_client").setLevel(getattr(logging, config["logging"]["lev
 DB_RELATIVE_PATH = config.get("database", {}).get("path", "../db/agent_proxy_data.db")
 DB_PATH = (CONFIG_PATH.parent / DB_RELATIVE_PATH).resolve()
 
-# MCP 클라이언트 (DB 경로 전달)
-mcp_client = McpSseClient(config["mcp"]["host"], db_path=DB_PATH)
+# agent_logs 배치 기록기 (요청 경로에서 DB I/O 제거)
+log_sink = create_log_sink(DB_PATH, config["logging"].get("db_sink"))
+
+# 결정적(temperature 0) LLM 호출 응답 캐시 (설정에서 비활성화하면 None)
+llm_cache = create_llm_cache(config.get("llm_cache"), CONFIG_PATH.parent)
+
+# 공유 LLM 게이트웨이 (연결 풀 + 5xx/연결 끊김 재시도 + 지연 시간/토큰 지표)
+llm_gateway = create_llm_gateway(config)
+
+# LLM에 보낼 대화 이력을 컨텍스트 예산에 맞게 축소 (설정에서 비활성화하면 None)
+context_window = create_context_window(config.get("context_window"))
+
+# MCP 클라이언트 (에이전트와 같은 로그 기록기 공유)
+mcp_client = McpSseClient(
+    config["mcp"]["host"],
+    log_sink=log_sink,
+    request_timeout=config["mcp"].get("request_timeout", 20.0),
+    connect_timeout=config["mcp"].get("connect_timeout", 5.0),
+    reconnect_initial_delay=config["mcp"].get("reconnect_initial_delay", 0.5),
+    reconnect_max_delay=config["mcp"].get("reconnect_max_delay", 30.0)
+)
+
+# MCP 도구 목록 캐시 (요청마다 /tools를 호출하지 않도록 TTL 캐시 + 변경 알림 시 무효화)
+tool_catalog = ToolCatalog(
+    config["mcp"]["host"],
+    ttl=config["mcp"].get("tools_cache_ttl", 300),
+    refresh_interval=config["mcp"].get("tools_refresh_interval", 60)
+)
+for method in ("notifications/tools/list_changed", "tools/listChanged"):
+    mcp_client.on_notification(method, lambda _msg: tool_catalog.invalidate())
 
 def save_agent_log(request_id: str, message: str, details: Optional[str] = None):
-    """DB에 에이전트 활동 로그 저장"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO agent_logs (request_id, message, details) VALUES (?, ?, ?)",
-            (request_id, message, details)
-        )
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        logger.error(f"⚠️ DB 로그 저장 실패: {e}")
+    """DB에 에이전트 활동 로그 저장 (큐에만 넣고 백그라운드 스레드가 배치로 기록)"""
+    log_sink.write(request_id, message, details)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -87,13 +110,21 @@ async def lifespan(app: FastAPI):
         await mcp_client.connect()
         logger.info("✅ MCP 서버 연결 및 세션 확보 완료")
     except Exception as e:
-        logger.error(f"❌ MCP 서버 연결 실패: {e}")
+        logger.error(f"❌ MCP 서버 연결 실패 (백그라운드에서 재연결 시도): {e}")
+    tool_catalog.start()
     
     yield
+    await tool_catalog.close()
     await mcp_client.close()
+    log_sink.close()
+    if llm_cache:
+        llm_cache.close()
+    await llm_gateway.close()
     logger.info("👋 Agent Proxy Server 종료")
 
 app = FastAPI(title="Void Lab Test - Active Agent Proxy", lifespan=lifespan)
+# 채팅 엔드포인트 입장 제어 (CORS보다 먼저 추가해야 거절 응답에도 CORS 헤더가 붙음, 비활성화면 None)
+admission = setup_admission(app, config.get("admission"), ["/v1/chat/completions"])
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"])
 
 # 요청 모델
@@ -125,41 +156,72 @@ async def list_models():
         ]
     }
 
+@app.get("/mcp/health")
+async def get_mcp_health():
+    """MCP SSE 연결 상태 및 재연결 지표 조회"""
+    return mcp_client.get_health()
+
+@app.get("/tools/catalog")
+async def get_tool_catalog():
+    """캐시된 MCP 도구 목록 및 캐시 지표 조회"""
+    return {
+        "fresh": tool_catalog.is_fresh,
+        "stats": tool_catalog.stats,
+        "tools": await tool_catalog.get_tools()
+    }
+
+@app.get("/logs/stats")
+async def get_log_sink_stats():
+    """agent_logs 배치 기록기 지표 조회 (큐 깊이, 기록/폐기 건수)"""
+    return log_sink.get_stats()
+
+@app.get("/cache/stats")
+async def get_llm_cache_stats():
+    """LLM 응답 캐시 지표 조회 (적중/실패/만료/우회 건수)"""
+    return llm_cache.get_stats() if llm_cache else {"enabled": False}
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """입장 제어 지표 조회 (처리 중/대기 중 요청 수, 거절 건수, 대기 시간)"""
+    return admission.get_stats() if admission else {"enabled": False}
+
+@app.get("/context/stats")
+async def get_context_window_stats():
+    """컨텍스트 창 관리 지표 조회 (축소 횟수, 생략/제거된 메시지 수, 축소 전후 토큰)"""
+    return context_window.get_stats() if context_window else {"enabled": False}
+
+@app.get("/llm/stats")
+async def get_llm_gateway_stats():
+    """LLM 게이트웨이 지표 조회 (지연 시간, 토큰 사용량, 재시도, 연결 풀)"""
+    return llm_gateway.get_stats()
+
 @app.post("/v1/chat/completions")
-async def chat_completions(request: ChatRequest):
+async def chat_completions(request: ChatRequest, raw_request: Request):
     """
     자율 실행 루프를 포함한 채팅 엔드포인트
     """
     request_id = datetime.now().strftime("%H%M%S")
+    # 요청 헤더로 LLM 응답 캐시 우회 가능 (X-LLM-Cache: bypass 또는 Cache-Control: no-cache)
+    use_cache = not cache_bypass_requested(raw_request.headers)
     logger.info(f"📥 [Agent-{request_id}] 새 요청 수신: {request.messages[-1].content}")
     save_agent_log(request_id, "Request Received", request.messages[-1].content)
     
     try:
         current_messages = [msg.model_dump(exclude_none=True) for msg in request.messages]
         
-        # 도구 자동 검색 (요청에 없으면 MCP 서버에서 가져옴)
+        # 도구 자동 검색 (요청에 없으면 캐시된 MCP 도구 목록 사용)
         tools = request.tools
         if not tools:
-            try:
-                logger.info(f"🔍 [Agent-{request_id}] MCP 서버에서 도구 목록 가져오는 중...")
-                mcp_tools_resp = await httpx.AsyncClient().get(f"{config['mcp']['host']}/tools")
-                mcp_tools_resp.raise_for_status()
-                mcp_tool_defs = mcp_tools_resp.json().get("tools", [])
-                
-                # MCP 형식을 OpenAI/Ollama 도구 형식으로 변환
-                tools = []
-                for t in mcp_tool_defs:
-                    tools.append({
-                        "type": "function",
-                        "function": {
-                            "name": t["name"],
-                            "description": t["description"],
-                            "parameters": t["inputSchema"]
-                        }
-                    })
-                logger.info(f"📦 [Agent-{request_id}] {len(tools)}개의 도구 발견")
-            except Exception as e:
-                logger.warning(f"⚠️ 도구 목록 가져오기 실패: {e}")
+            tools = await tool_catalog.get_tools()
+            logger.info(f"📦 [Agent-{request_id}] {len(tools)}개의 도구 사용 (캐시)")
+        
+        # 실시간 스트리밍 모드: 루프 전체를 스트림 안에서 실행하여 진행 상황과 최종 답변 토큰을 바로 전달
+        if request.stream and config["agent"].get("true_streaming", True):
+            logger.info(f"📡 [Agent-{request_id}] 실시간 스트리밍 모드로 루프 실행")
+            return StreamingResponse(
+                generate_agent_stream(request_id, current_messages, tools),
+                media_type="text/event-stream"
+            )
         
         # --------------------------------------------------------
         # 🔄 Autonomous Agent Loop (n8n 스타일의 상태 머신)
@@ -173,10 +235,10 @@ async def chat_completions(request: ChatRequest):
             # [상태 1: Thinking] LLM에게 현재까지의 대화 이력을 전달하여 '생각'을 요청합니다.
             # n8n의 "AI Agent Node"가 LLM 모델에 질문을 던지는 과정과 동일합니다.
             logger.info(f"📤 [Agent-{request_id}] [LLM REQ] LLM에게 답변 요청 중...")
-            full_ollama_resp = await call_llm(current_messages, tools)
+            full_ollama_resp = await call_llm(current_messages, tools, use_cache=use_cache)
             
             logger.info(f"📥 [Agent-{request_id}] [LLM RESP] 응답 수신 완료")
-            logger.debug(f"--- [LLM RESP Detail] ---\n{json.dumps(full_ollama_resp, ensure_ascii=False, indent=2)}\n-------------------------")
+            log_payload(logger, logging.DEBUG, "--- [LLM RESP Detail] ---", full_ollama_resp)
 
             choice = full_ollama_resp.get("choices", [{}])[0]
             message = choice.get("message", {})
@@ -186,35 +248,10 @@ async def chat_completions(request: ChatRequest):
             # [상태 2: Fallback/Analysis] 모델의 응답이 규격화된 tool_calls인지, 혹은 텍스트 내 JSON인지 분석합니다.
             # n8n이 LLM 응답을 파싱하여 다음 노드(도구)를 실행할지 결정하는 "Output Parser" 단계입니다.
             if not tool_calls and content:
-                # 마크다운 코드 블록 제거 및 JSON 추출 시도
-                json_str = content.strip()
-                if "```json" in json_str:
-                    json_str = re.search(r"```json\s*(.*?)\s*```", json_str, re.DOTALL)
-                    json_str = json_str.group(1) if json_str else content.strip()
-                elif "```" in json_str:
-                    json_str = re.search(r"```\s*(.*?)\s*```", json_str, re.DOTALL)
-                    json_str = json_str.group(1) if json_str else content.strip()
-                
-                # 중괄호로 시작하는 경우 추출 시도
-                if not json_str.startswith("{") and "{" in json_str:
-                    json_str = json_str[json_str.find("{"):json_str.rfind("}")+1]
-
-                if json_str.startswith("{"):
-                    try:
-                        potential_tool = json.loads(json_str)
-                        if "name" in potential_tool and "arguments" in potential_tool:
-                            tool_calls = [{
-                                "id": f"call_{i}_{datetime.now().strftime('%M%S')}",
-                                "type": "function",
-                                "function": {
-                                    "name": potential_tool["name"],
-                                    "arguments": json.dumps(potential_tool["arguments"])
-                                }
-                            }]
-                            message["tool_calls"] = tool_calls
-                            logger.info(f"💡 [Agent-{request_id}] Content에서 마크다운 도구 호출 패턴 발견!")
-                    except:
-                        pass
+                tool_calls = extract_tool_calls_from_content(content, i)
+                if tool_calls:
+                    message["tool_calls"] = tool_calls
+                    logger.info(f"💡 [Agent-{request_id}] Content에서 마크다운 도구 호출 패턴 발견!")
 
             # 도구 호출이 있으면 content를 비워줌 (모델에 따라 중복으로 인식할 수 있음)
             if tool_calls:
@@ -240,29 +277,11 @@ async def chat_completions(request: ChatRequest):
             logger.info(f"🔧 [Agent-{request_id}] LLM이 {len(tool_calls)}개의 도구 호출 요청")
             current_messages.append(message) # LLM의 도구 요청 메시지 추가 (History Update)
             
-            for tool_call in tool_calls:
-                func_name = tool_call["function"]["name"]
-                args = json.loads(tool_call["function"]["arguments"])
-                call_id = tool_call.get("id")
-                
-                logger.info(f"🛠️  [Agent-{request_id}] [TOOL CALL] {func_name} 시작")
-                logger.info(f"   → 인자(Args): {args} [ID: {call_id}]")
-                save_agent_log(request_id, f"Tool Call: {func_name}", json.dumps(args))
-                
-                # MCP 서버 호출 (외부 도구 인터페이스)
-                result = await mcp_client.call_tool(func_name, args)
-                
-                logger.info(f"✅ [Agent-{request_id}] [TOOL RESULT] {func_name} 완료")
-                logger.debug(f"   → 결과: {json.dumps(result, ensure_ascii=False)}")
-                
-                # [상태 5: Feedback/State Update] 도구 실행 결과(Observation)를 대화 이력에 추가합니다.
-                # role: "tool"을 통해 모델에게 "이것은 네가 시킨 행동의 결과야"라고 알려줍니다.
-                # 이를 통해 다음 루프(상태 1)에서 모델은 이 결과를 바탕으로 다음 행동을 결정하게 됩니다.
-                current_messages.append({
-                    "role": "tool",
-                    "tool_call_id": call_id,
-                    "content": json.dumps(result, ensure_ascii=False)
-                })
+            # [상태 5: Feedback/State Update] 도구 실행 결과(Observation)를 대화 이력에 추가합니다.
+            # role: "tool"을 통해 모델에게 "이것은 네가 시킨 행동의 결과야"라고 알려줍니다.
+            # 이를 통해 다음 루프(상태 1)에서 모델은 이 결과를 바탕으로 다음 행동을 결정하게 됩니다.
+            # 서로 독립적인 도구 호출은 동시에 실행하고, 결과는 호출 순서대로 추가합니다.
+            current_messages.extend(await run_tool_calls(request_id, tool_calls))
                 
             # [Loop Back] 루프의 처음(상태 1)으로 돌아가 정보를 주입받은 LLM의 다음 판단을 기다립니다.
         
@@ -272,34 +291,277 @@ async def chat_completions(request: ChatRequest):
         logger.error(f"❌ [Agent-{request_id}] 처리 중 치명적 에러: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-async def call_llm(messages: List[Dict], tools: Optional[List] = None):
-    """LLM(Ollama, vLLM, OpenAI 등)의 OpenAI 호환 API 호출"""
-    async with httpx.AsyncClient(timeout=config["llm"]["timeout"]) as client:
-        # OpenAI 호환 엔드포인트
-        url = f"{config['llm']['base_url']}/chat/completions"
-        headers = {}
-        headers = {}
-        api_key = str(config["llm"].get("api_key", "")).strip()
-        # api_key가 존재하고, "not-needed"가 아니며, 빈 문자열이 아닌 경우에만 헤더 추가
-        if api_key and api_key.lower() != "not-needed":
-            headers["Authorization"] = f"Bearer {api_key}"
-
-        payload = {
+def extract_tool_calls_from_content(content: str, iteration: int) -> List[Dict[str, Any]]:
+    """
+    텍스트(content) 안에 JSON으로 섞여 온 도구 호출을 찾아 OpenAI tool_calls 형식으로 변환합니다.
+    (모델이 정식 tool_calls 필드 대신 마크다운/JSON 텍스트로 도구를 요청하는 경우 대비)
+    """
+    # 마크다운 코드 블록 제거 및 JSON 추출 시도
+    json_str = content.strip()
+    if "```json" in json_str:
+        json_str = re.search(r"```json\s*(.*?)\s*```", json_str, re.DOTALL)
+        json_str = json_str.group(1) if json_str else content.strip()
+    elif "```" in json_str:
+        json_str = re.search(r"```\s*(.*?)\s*```", json_str, re.DOTALL)
+        json_str = json_str.group(1) if json_str else content.strip()
+    
+    # 중괄호로 시작하는 경우 추출 시도
+    if not json_str.startswith("{") and "{" in json_str:
+        json_str = json_str[json_str.find("{"):json_str.rfind("}")+1]
+
+    if json_str.startswith("{"):
+        try:
+            potential_tool = json.loads(json_str)
+            if "name" in potential_tool and "arguments" in potential_tool:
+                return [{
+                    "id": f"call_{iteration}_{datetime.now().strftime('%M%S')}",
+                    "type": "function",
+                    "function": {
+                        "name": potential_tool["name"],
+                        "arguments": json.dumps(potential_tool["arguments"])
+                    }
+                }]
+        except:
+            pass
+    return []
+
+async def run_tool_call(request_id: str, tool_call: Dict[str, Any]) -> Dict[str, Any]:
+    """MCP 서버를 통해 도구 하나를 실행하고 대화 이력에 넣을 tool 메시지를 반환합니다."""
+    func_name = tool_call["function"]["name"]
+    raw_args = tool_call["function"].get("arguments") or ""
+    call_id = tool_call.get("id")
+    
+    # 인자 없는 도구(get_all_employees 등)는 스트리밍 중 arguments 조각이 오지 않아 빈 문자열일 수 있음
+    try:
+        args = json.loads(raw_args) if raw_args.strip() else {}
+    except json.JSONDecodeError as e:
+        logger.warning(f"⚠️ [Agent-{request_id}] {func_name} 인자 파싱 실패: {raw_args!r}")
+        return {
+            "role": "tool",
+            "tool_call_id": call_id,
+            "content": json.dumps({"success": False, "error": f"도구 인자를 JSON으로 해석할 수 없습니다: {e}"}, ensure_ascii=False)
+        }
+    
+    logger.info(f"🛠️  [Agent-{request_id}] [TOOL CALL] {func_name} 시작")
+    logger.info(f"   → 인자(Args): {args} [ID: {call_id}]")
+    save_agent_log(request_id, f"Tool Call: {func_name}", json.dumps(args))
+    
+    # MCP 서버 호출 (외부 도구 인터페이스)
+    result = await mcp_client.call_tool(func_name, args)
+    
+    logger.info(f"✅ [Agent-{request_id}] [TOOL RESULT] {func_name} 완료")
+    log_payload(logger, logging.DEBUG, "   → 결과:", result)
+    
+    return {
+        "role": "tool",
+        "tool_call_id": call_id,
+        "content": json.dumps(result, ensure_ascii=False)
+    }
+
+async def run_tool_calls(request_id: str, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    한 번의 반복에서 요청된 도구 호출들을 동시에 실행합니다. (공용 tool_runner 사용)
+    
+    MCP 엔진은 한 세션 안의 tools/call을 동시에 처리하므로(mcp_config의 engine.session_concurrency)
+    하나의 MCP 세션을 공유해도 서버 쪽에서 직렬화되지 않습니다.
+    """
+    return await run_concurrent_tool_calls(
+        tool_calls,
+        lambda tool_call: run_tool_call(request_id, tool_call),
+        lambda tool_call: tool_call.get("id"),
+        config["agent"].get("max_parallel_tools", 4)
+    )
+
+async def generate_agent_stream(request_id: str, current_messages: List[Dict], tools: Optional[List]):
+    """
+    자율 실행 루프를 스트림 안에서 실행하며 OpenAI 호환 SSE 청크를 생성합니다.
+    
+    - 각 반복에서 LLM을 stream: True로 호출합니다.
+    - 도구 호출 턴은 클라이언트에 노출하지 않고, 도구 시작/완료 진행 이벤트만 전송합니다.
+    - 최종 답변 턴은 업스트림 토큰을 그대로 전달합니다.
+    
+    content가 '{' 또는 '`'로 시작하면 텍스트 기반 도구 호출일 수 있으므로 턴이 끝날 때까지 버퍼링하고,
+    그 외에는 첫 토큰부터 바로 전달합니다. 전달 도중 코드 블록(```)이나 '{'가 나오면 그 지점부터는
+    턴이 끝날 때까지 보류하며, 텍스트 기반 도구 호출은 이렇게 전달하지 않은 부분에서만 추출합니다.
+    이미 전달한 텍스트 뒤에 도구 호출이 오면 그 텍스트는 assistant 메시지의 content로 남깁니다.
+    """
+    resp_id = "agent-" + datetime.now().strftime("%Y%m%d%H%M%S")
+    created = int(datetime.now().timestamp())
+    show_progress_text = config["agent"].get("stream_progress_text", True)
+    
+    def make_chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, agent_event: Optional[Dict] = None) -> str:
+        chunk = {
+            "id": resp_id,
+            "object": "chat.completion.chunk",
+            "created": created,
             "model": config["llm"]["model"],
-            "messages": messages,
-            "stream": False,
-            "temperature": 0
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
         }
-        if tools:
-            payload["tools"] = tools
+        # 진행 이벤트는 OpenAI 규격 외 필드로 전달 (일반 클라이언트는 무시)
+        if agent_event:
+            chunk["agent_event"] = agent_event
+        return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    
+    def progress_chunk(event: Dict[str, Any], text: str) -> str:
+        return make_chunk({"content": text} if show_progress_text else {}, agent_event=event)
+    
+    yield make_chunk({"role": "assistant"})
+    
+    try:
+        max_iterations = 5
+        for i in range(max_iterations):
+            logger.info(f"🔄 [Agent-{request_id}] 반복 {i+1}단계 실행 중... (streaming)")
+            
+            content_parts: List[str] = []
+            tool_call_parts: Dict[int, Dict[str, Any]] = {}
+            # None: 판단 전, "stream": 바로 전달, "buffer": 처음부터 보류, "held": 전달하다가 도구 호출 후보부터 보류
+            mode = None
+            sent = 0  # content 중 클라이언트에 전달한 글자 수
             
-        logger.debug(f"📡 [LLM TX] Payload:\n{json.dumps(payload, ensure_ascii=False, indent=2)}")
-        resp = await client.post(url, json=payload, headers=headers)
-        resp.raise_for_status()
+            async for chunk in stream_llm(current_messages, tools):
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                delta = choices[0].get("delta") or {}
+                
+                # 정식 tool_calls 델타는 index 기준으로 이어붙임 (arguments는 조각으로 옴)
+                for tc in delta.get("tool_calls") or []:
+                    acc = tool_call_parts.setdefault(tc.get("index", 0), {
+                        "id": None, "type": "function", "function": {"name": "", "arguments": ""}
+                    })
+                    if tc.get("id"):
+                        acc["id"] = tc["id"]
+                    fn = tc.get("function") or {}
+                    acc["function"]["name"] += fn.get("name") or ""
+                    acc["function"]["arguments"] += fn.get("arguments") or ""
+                
+                piece = delta.get("content")
+                if not piece:
+                    continue
+                content_parts.append(piece)
+                if tool_call_parts:
+                    continue
+                
+                if mode is None:
+                    head = "".join(content_parts).lstrip()
+                    if not head:
+                        continue
+                    mode = "buffer" if head.startswith("{") or head.startswith("`") else "stream"
+                if mode == "stream":
+                    pending = "".join(content_parts)[sent:]
+                    cut = min((pos for pos in (pending.find("```"), pending.find("{")) if pos >= 0), default=-1)
+                    if cut >= 0:
+                        mode = "held"
+                    else:
+                        # 청크 경계에 걸친 ``` 조각은 다음 조각을 볼 때까지 보류
+                        cut = len(pending.rstrip("`"))
+                    if cut:
+                        yield make_chunk({"content": pending[:cut]})
+                        sent += cut
+            
+            content = "".join(content_parts)
+            streamed, unsent = content[:sent], content[sent:]
+            tool_calls = [tool_call_parts[idx] for idx in sorted(tool_call_parts)]
+            for idx, tc in enumerate(tool_calls):
+                tc["id"] = tc["id"] or f"call_{i}_{idx}_{datetime.now().strftime('%M%S')}"
+            if tool_calls:
+                assistant_content = content
+            else:
+                # 텍스트 기반 도구 호출은 사용자에게 보여주지 않은 부분에서만 추출
+                if mode in ("buffer", "held"):
+                    tool_calls = extract_tool_calls_from_content(unsent, i)
+                assistant_content = streamed
+            
+            if not tool_calls:
+                logger.info(f"✅ [Agent-{request_id}] 최종 응답 도달 (streaming)")
+                if unsent:
+                    yield make_chunk({"content": unsent})
+                yield make_chunk({}, finish_reason="stop")
+                yield "data: [DONE]\n\n"
+                return
+            
+            logger.info(f"🔧 [Agent-{request_id}] LLM이 {len(tool_calls)}개의 도구 호출 요청")
+            current_messages.append({"role": "assistant", "content": assistant_content, "tool_calls": tool_calls})
+            if streamed and not streamed.endswith("\n"):
+                # 이미 전달한 텍스트와 이후 진행 이벤트/답변이 붙지 않도록 줄바꿈
+                yield make_chunk({"content": "\n\n"})
+            
+            for tool_call in tool_calls:
+                func_name = tool_call["function"]["name"]
+                yield progress_chunk(
+                    {"type": "tool_start", "name": func_name, "id": tool_call["id"]},
+                    f"> 🛠️ `{func_name}` 실행 중...\n"
+                )
+            
+            # 도구들을 동시에 실행하면서 완료되는 순서대로 진행 이벤트를 전송
+            tool_messages: List[Optional[Dict[str, Any]]] = [None] * len(tool_calls)
+            async for idx, tool_msg in iter_concurrent_tool_calls(
+                tool_calls,
+                lambda tool_call: run_tool_call(request_id, tool_call),
+                lambda tool_call: tool_call.get("id"),
+                config["agent"].get("max_parallel_tools", 4)
+            ):
+                tool_messages[idx] = tool_msg
+                func_name = tool_calls[idx]["function"]["name"]
+                yield progress_chunk(
+                    {"type": "tool_end", "name": func_name, "id": tool_calls[idx]["id"]},
+                    f"> ✅ `{func_name}` 완료\n\n"
+                )
+            current_messages.extend(tool_messages)
+        
+        logger.error(f"❌ [Agent-{request_id}] 최대 반복 횟수 초과 (streaming)")
+        yield make_chunk({"content": "최대 반복 횟수를 초과하여 응답을 완료하지 못했습니다."}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+    
+    except Exception as e:
+        logger.error(f"❌ [Agent-{request_id}] 스트리밍 처리 중 에러: {str(e)}", exc_info=True)
+        yield f"data: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+async def stream_llm(messages: List[Dict], tools: Optional[List] = None):
+    """LLM을 stream: True로 호출하여 OpenAI 스트리밍 청크(dict)를 순서대로 반환"""
+    # 예산을 넘으면 오래된 도구 결과/턴을 줄인 사본을 보냄 (원본 이력은 그대로)
+    if context_window:
+        messages = context_window.fit(messages, tools)
+    payload = {
+        "model": config["llm"]["model"],
+        "messages": messages,
+        "stream": True,
+        "temperature": 0
+    }
+    if tools:
+        payload["tools"] = tools
+    
+    log_payload(logger, logging.DEBUG, "📡 [LLM TX] Payload (stream):", payload)
+    async for line in llm_gateway.stream_lines(payload):
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            logger.debug(f"⚠️ [LLM RX] 청크 파싱 실패: {data}")
+
+async def call_llm(messages: List[Dict], tools: Optional[List] = None, use_cache: bool = True):
+    """LLM(Ollama, vLLM, OpenAI 등)의 OpenAI 호환 API 호출 (use_cache=False면 응답 캐시 우회)"""
+    # 예산을 넘으면 오래된 도구 결과/턴을 줄인 사본을 보냄 (원본 이력은 그대로)
+    if context_window:
+        messages = context_window.fit(messages, tools)
+    payload = {
+        "model": config["llm"]["model"],
+        "messages": messages,
+        "stream": False,
+        "temperature": 0
+    }
+    if tools:
+        payload["tools"] = tools
         
-        # OpenAI 규격 응답에서 message 추출하여 Ollama 형식과 비슷하게 반환
-        result = resp.json()
-        return result
+    log_payload(logger, logging.DEBUG, "📡 [LLM TX] Payload:", payload)
+
+    # 같은 대화 이력에 대한 결정적 호출은 캐시된 응답을 재사용 (캐시 미스 시 공유 게이트웨이로 호출)
+    return await cached_llm_call(llm_cache, payload, llm_gateway.chat, use_cache)
 
 def generate_pseudo_stream(final_resp: Dict):
     """일반 응답을 SSE 스트림 형식으로 변환"""
@@ -0,0 +1,128 @@
+"""
+tool_catalog.py - MCP 도구 목록 캐시
+
+에이전트가 요청마다 MCP 서버의 /tools를 호출하지 않도록 도구 목록(OpenAI 형식)을 캐시합니다.
+- TTL이 지나면 다음 조회 시 갱신합니다.
+- 백그라운드 태스크가 주기적으로 미리 갱신합니다.
+- MCP 서버가 SSE로 tools/listChanged 알림을 보내면 즉시 무효화하고 다시 가져옵니다.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set
+
+import httpx
+
+# 현재 디렉토리 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+logger = logging.getLogger("tool_catalog")
+
+
+class ToolCatalog:
+    """MCP 도구 목록 TTL 캐시"""
+
+    def __init__(self, mcp_host: str, ttl: float = 300.0, refresh_interval: float = 60.0):
+        self.mcp_host = mcp_host
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._tools: Optional[List[Dict[str, Any]]] = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._client = httpx.AsyncClient(timeout=10.0)
+        self._refresh_task: Optional[asyncio.Task] = None
+        # 변경 알림으로 시작한 재조회 태스크 (참조를 잡아두어야 실행 중 GC되지 않고 예외도 확인됨)
+        self._invalidate_tasks: Set[asyncio.Task] = set()
+        self.stats = {"hits": 0, "refreshes": 0, "failures": 0, "invalidations": 0}
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._tools is not None and (time.monotonic() - self._fetched_at) < self.ttl
+
+    async def get_tools(self) -> List[Dict[str, Any]]:
+        """
+        캐시된 도구 목록을 반환합니다. 캐시가 없거나 만료되었으면 먼저 갱신합니다.
+
+        Returns:
+            List[Dict]: OpenAI 함수 호출 형식의 도구 목록 (가져오지 못하면 빈 목록)
+        """
+        if self.is_fresh:
+            self.stats["hits"] += 1
+            return self._tools
+
+        async with self._lock:
+            # 잠금을 기다리는 동안 다른 요청이 이미 갱신했을 수 있음
+            if not self.is_fresh:
+                await self.refresh()
+        return self._tools or []
+
+    async def refresh(self) -> None:
+        """MCP 서버에서 도구 목록을 가져와 캐시를 교체합니다. 실패 시 기존 캐시를 유지합니다."""
+        try:
+            resp = await self._client.get(f"{self.mcp_host}/tools")
+            resp.raise_for_status()
+            # 변환까지 성공해야 캐시를 교체 (name/inputSchema가 빠진 항목 등)
+            tools = self._convert_mcp_to_openai(resp.json().get("tools", []))
+        except Exception as e:
+            self.stats["failures"] += 1
+            logger.warning(f"⚠️ [Catalog] 도구 목록 가져오기 실패 (기존 캐시 유지): {e}")
+            return
+
+        self._tools = tools
+        self._fetched_at = time.monotonic()
+        self.stats["refreshes"] += 1
+        logger.info(f"📦 [Catalog] 도구 목록 갱신: {len(self._tools)}개")
+
+    def invalidate(self) -> None:
+        """캐시를 만료시키고 백그라운드에서 즉시 다시 가져옵니다. (tools/listChanged 알림 처리용)"""
+        self.stats["invalidations"] += 1
+        self._fetched_at = 0.0
+        logger.info("🔄 [Catalog] 도구 목록 변경 알림 수신 - 캐시 무효화")
+        task = asyncio.get_running_loop().create_task(self.get_tools())
+        self._invalidate_tasks.add(task)
+        task.add_done_callback(self._on_invalidate_done)
+
+    def start(self) -> None:
+        """주기적 백그라운드 갱신 시작"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+        for task in list(self._invalidate_tasks):
+            task.cancel()
+        await self._client.aclose()
+
+    def _on_invalidate_done(self, task: asyncio.Task) -> None:
+        self._invalidate_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ [Catalog] 도구 목록 재조회 실패: {task.exception()}")
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                async with self._lock:
+                    await self.refresh()
+            except Exception as e:
+                # 예외로 루프가 끝나면 주기적 갱신이 조용히 멈추므로 기록하고 계속
+                logger.error(f"❌ [Catalog] 주기적 갱신 중 에러: {e}", exc_info=True)
+            await asyncio.sleep(self.refresh_interval)
+
+    @staticmethod
+    def _convert_mcp_to_openai(mcp_tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """MCP 형식({name, description, inputSchema})을 OpenAI/Ollama 도구 형식으로 변환"""
+        return [
+            {
+                "type": "function",
+                "function": {
+                    "name": t["name"],
+                    "description": t["description"],
+                    "parameters": t["inputSchema"]
+                }
+            }
+            for t in mcp_tools
+        ]
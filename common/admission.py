@@ -0,0 +1,299 @@
+"""
+admission.py - 채팅 엔드포인트 입장 제어 (동시 처리 수 제한)
+
+에이전트 요청 하나가 LLM 왕복을 최대 max_iterations번 하면서 수십 초 동안 연결을 잡고 있으므로,
+요청이 몰리면 업스트림(vLLM/Ollama) 연결 수백 개가 한꺼번에 쌓일 수 있습니다.
+proxy_server, agent_proxy, agent_native, agent_native_loop, agent_loop_api가 함께 사용합니다.
+
+- 전체 동시 처리 수(max_concurrent)와 클라이언트별 동시 처리 수(max_per_client) 제한
+- 자리가 없으면 대기열(max_queue)에서 최대 queue_timeout_seconds 동안 대기
+- 대기열이 가득 찼거나 대기 시간을 넘기면 바로 503, 클라이언트별 한도 대기 시간 초과는 429
+  (둘 다 Retry-After 헤더 포함)
+- 클라이언트 구분: X-Client-Id 헤더. 헤더가 없는 요청은 전체 한도만 적용
+  (Void와 테스트 클라이언트는 모두 127.0.0.1에서 접속하므로 IP로 구분하면 사실상 전체 한도가 됨)
+- ASGI 미들웨어이므로 스트리밍 응답은 마지막 청크를 보낼 때까지 자리를 유지함
+- 사람의 승인(HITL)처럼 오래 기다리는 구간은 released_admission()으로 자리를 잠시 반납함
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLIENT_ID_HEADER = b"x-client-id"
+
+# 대기 시간 백분위 계산에 사용할 최근 입장 수
+WAIT_WINDOW = 500
+
+
+class AdmissionRejected(Exception):
+    """입장 거절 (status_code: 429 또는 503)"""
+
+    def __init__(self, status_code: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+
+
+class _Admission:
+    """요청 하나가 얻은 자리 (held가 False면 반납한 상태)"""
+
+    def __init__(self, controller: "AdmissionController", client_id: Optional[str]):
+        self.controller = controller
+        self.client_id = client_id
+        self.held = True
+
+
+# 현재 요청의 자리 (미들웨어가 설정하고 엔드포인트에서 released_admission()으로 사용)
+_current_admission: ContextVar[Optional[_Admission]] = ContextVar("admission", default=None)
+
+
+class _ClientSlot:
+    """클라이언트 하나의 세마포어와 사용 중/대기 중인 요청 수 (0이 되면 제거)"""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class AdmissionController:
+    """전체/클라이언트별 세마포어 + 대기열 한도 + 대기 시간 예산"""
+
+    def __init__(
+        self,
+        max_concurrent: int = 32,
+        max_per_client: int = 4,
+        max_queue: int = 64,
+        queue_timeout: float = 10.0,
+        retry_after: int = 2
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_client = max_per_client
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._clients: Dict[str, _ClientSlot] = {}
+        self.active = 0
+        self.waiting = 0
+        self._waits: deque = deque(maxlen=WAIT_WINDOW)
+        self.stats = {
+            "admitted": 0, "queued": 0, "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0, "rejected_client_limit": 0
+        }
+
+    async def acquire(self, client_id: Optional[str]) -> None:
+        """
+        자리를 얻을 때까지 기다립니다. (얻지 못하면 AdmissionRejected)
+        클라이언트 자리를 먼저 얻고 전체 자리를 얻으므로, 한 클라이언트가 전체 자리를 잡은 채 기다리지 않습니다.
+        client_id가 None이면 클라이언트별 한도 없이 전체 자리만 얻습니다.
+        """
+        started = time.monotonic()
+        slot = self._join_client(client_id)
+        try:
+            if slot is not None:
+                await self._wait(slot.semaphore, started, 429, "rejected_client_limit")
+            try:
+                await self._wait(self._global, started, 503, "rejected_queue_timeout")
+            except BaseException:
+                if slot is not None:
+                    slot.semaphore.release()
+                raise
+        except BaseException:
+            self._drop_client(client_id, slot)
+            raise
+
+        self.active += 1
+        self.stats["admitted"] += 1
+        self._waits.append(time.monotonic() - started)
+
+    async def reacquire(self, client_id: Optional[str]) -> None:
+        """
+        released_admission()으로 반납했던 자리를 다시 얻습니다.
+        이미 받아들인 요청이므로 대기열 한도와 대기 시간 예산 없이 자리가 날 때까지 기다립니다.
+        """
+        slot = self._join_client(client_id)
+        try:
+            if slot is not None:
+                await slot.semaphore.acquire()
+            try:
+                await self._global.acquire()
+            except BaseException:
+                if slot is not None:
+                    slot.semaphore.release()
+                raise
+        except BaseException:
+            self._drop_client(client_id, slot)
+            raise
+        self.active += 1
+
+    def release(self, client_id: Optional[str]) -> None:
+        self.active -= 1
+        self._global.release()
+        slot = self._clients.get(client_id) if client_id is not None else None
+        if slot is not None:
+            slot.semaphore.release()
+            self._drop_client(client_id, slot)
+
+    def get_stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        return {
+            **self.stats,
+            "enabled": True,
+            "active": self.active,
+            "waiting": self.waiting,
+            "clients": len(self._clients),
+            "max_concurrent": self.max_concurrent,
+            "max_per_client": self.max_per_client,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "queue_wait_seconds": {
+                "count": len(waits),
+                "p50": round(waits[len(waits) // 2], 4),
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 4),
+                "max": round(waits[-1], 4)
+            } if waits else {"count": 0}
+        }
+
+    async def _wait(self, semaphore: asyncio.Semaphore, started: float, status_code: int, stat: str) -> None:
+        if not semaphore.locked():
+            await semaphore.acquire()  # 바로 얻을 수 있으면 대기열을 거치지 않음
+            return
+        if self.waiting >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            raise AdmissionRejected(503, f"대기열이 가득 찼습니다 ({self.max_queue}건)")
+        remaining = self.queue_timeout - (time.monotonic() - started)
+        self.waiting += 1
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=max(remaining, 0))
+        except asyncio.TimeoutError:
+            self.stats[stat] += 1
+            if status_code == 429:
+                raise AdmissionRejected(429, f"클라이언트 동시 요청 한도({self.max_per_client}건) 초과")
+            raise AdmissionRejected(503, f"대기 시간 {self.queue_timeout}초 초과 (동시 처리 {self.max_concurrent}건)")
+        finally:
+            self.waiting -= 1
+
+    def _join_client(self, client_id: Optional[str]) -> Optional[_ClientSlot]:
+        if client_id is None:
+            return None
+        slot = self._clients.get(client_id)
+        if slot is None:
+            slot = self._clients[client_id] = _ClientSlot(self.max_per_client)
+        slot.users += 1
+        return slot
+
+    def _drop_client(self, client_id: Optional[str], slot: Optional[_ClientSlot]) -> None:
+        if slot is None:
+            return
+        slot.users -= 1
+        if slot.users == 0 and self._clients.get(client_id) is slot:
+            del self._clients[client_id]
+
+
+class AdmissionMiddleware:
+    """지정한 경로(paths)의 요청에만 입장 제어를 적용하는 ASGI 미들웨어"""
+
+    def __init__(self, app, controller: AdmissionController, paths: List[str]):
+        self.app = app
+        self.controller = controller
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        client_id = self._client_id(scope)
+        try:
+            await self.controller.acquire(client_id)
+        except AdmissionRejected as e:
+            logger.warning(f"🚦 [Admission] {client_id or self._client_ip(scope)} 요청 거절 ({e.status_code}): {e.reason}")
+            await self._reject(send, e)
+            return
+        admission = _Admission(self.controller, client_id)
+        token = _current_admission.set(admission)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_admission.reset(token)
+            if admission.held:
+                self.controller.release(client_id)
+
+    @staticmethod
+    def _client_id(scope) -> Optional[str]:
+        """X-Client-Id 헤더 값 (없으면 None: 클라이언트별 한도를 적용하지 않음)"""
+        for name, value in scope.get("headers", []):
+            if name == CLIENT_ID_HEADER:
+                return value.decode("latin-1")
+        return None
+
+    @staticmethod
+    def _client_ip(scope) -> str:
+        client: Optional[Tuple[str, int]] = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def _reject(self, send, error: AdmissionRejected) -> None:
+        body = json.dumps({"detail": error.reason}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": error.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.controller.retry_after).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+@asynccontextmanager
+async def released_admission():
+    """
+    현재 요청의 자리를 잠시 반납합니다. (입장 제어가 꺼져 있거나 대상 경로가 아니면 아무것도 하지 않음)
+
+    사람의 승인을 기다리는 동안(최대 approval.timeout_seconds) 자리를 잡고 있으면
+    승인 대기 몇 건만으로 다른 요청이 모두 거절되므로, 그 구간을 이것으로 감쌉니다.
+    블록이 정상적으로 끝나면 자리를 다시 얻고, 예외로 끝나면 반납한 상태로 둡니다.
+    """
+    admission = _current_admission.get()
+    if admission is None or not admission.held:
+        yield
+        return
+    admission.controller.release(admission.client_id)
+    admission.held = False
+    yield
+    await admission.controller.reacquire(admission.client_id)
+    admission.held = True
+
+
+def setup_admission(app, admission_config: Optional[Dict[str, Any]], default_paths: List[str]) -> Optional[AdmissionController]:
+    """
+    설정(admission)으로 입장 제어를 앱에 연결합니다. 비활성화면 None
+
+    CORS 미들웨어보다 먼저 호출해야 거절 응답에도 CORS 헤더가 붙습니다.
+    (add_middleware는 나중에 추가한 것이 바깥쪽에서 실행됨)
+    """
+    admission_config = admission_config or {}
+    if not admission_config.get("enabled", False):
+        return None
+    controller = AdmissionController(
+        max_concurrent=admission_config.get("max_concurrent", 32),
+        max_per_client=admission_config.get("max_per_client", 4),
+        max_queue=admission_config.get("max_queue", 64),
+        queue_timeout=admission_config.get("queue_timeout_seconds", 10.0),
+        retry_after=admission_config.get("retry_after_seconds", 2)
+    )
+    app.add_middleware(AdmissionMiddleware, controller=controller, paths=admission_config.get("paths", default_paths))
+    logger.info(
+        f"🚦 [Admission] 입장 제어 활성화 (전체 {controller.max_concurrent}, 클라이언트별 {controller.max_per_client}, "
+        f"대기열 {controller.max_queue})"
+    )
+    return controller
@@ -0,0 +1,213 @@
+"""
+context_window.py - 에이전트 루프 대화 이력의 컨텍스트 창 관리
+
+에이전트 루프는 반복마다 assistant 메시지와 도구 결과(json.dumps(result))를 current_messages에 쌓고
+전체 이력을 다시 보냅니다. get_all_employees, search_docs 같은 도구 결과는 클 수 있어서
+반복할수록 프롬프트와 vLLM prefill 시간이 계속 늘어납니다.
+agent_proxy, agent_native, agent_native_loop, agent_loop_api의 call_llm이 LLM 호출 직전에 사용합니다.
+
+LLM에 보낼 사본만 줄이고 원본 이력(current_messages, DB에 저장하는 messages)은 그대로 둡니다.
+같은 이력이면 항상 같은 결과가 나오므로 LLM 응답 캐시 키도 안정적으로 유지됩니다.
+
+예산(max_context_tokens - reserve_output_tokens - 도구 정의)을 넘으면 다음 순서로 줄입니다.
+1. 도구 결과 하나가 max_tool_result_tokens를 넘으면 앞부분만 남기고 자름 (항상 적용)
+2. 최근 keep_recent_tool_results개를 제외한 오래된 도구 결과부터 생략 표시로 바꿈
+3. 그래도 넘으면 마지막 user 메시지 이전의 오래된 메시지부터 제거
+   (assistant의 tool_calls와 그 도구 결과는 함께 제거. summarize_dropped면 제거한 턴의 요약을 남김)
+앞쪽 system 메시지와 마지막 user 메시지 이후(현재 턴)는 제거하지 않습니다.
+
+토큰 수는 토크나이저 없이 추정합니다. (ASCII는 chars_per_token자당 1토큰, 그 외 문자는 1자당 1토큰)
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 메시지마다 붙는 역할/구분 토큰 추정치
+MESSAGE_OVERHEAD_TOKENS = 4
+# 요약에 남길 메시지 하나당 최대 글자 수
+SUMMARY_SNIPPET_CHARS = 80
+
+
+class ContextWindow:
+    """토큰 예산에 맞게 LLM 요청 메시지 사본을 줄이는 관리자"""
+
+    def __init__(
+        self,
+        max_context_tokens: int = 16384,
+        reserve_output_tokens: int = 2048,
+        max_tool_result_tokens: int = 2000,
+        keep_recent_tool_results: int = 2,
+        summarize_dropped: bool = True,
+        chars_per_token: float = 4.0
+    ):
+        self.max_context_tokens = max_context_tokens
+        self.reserve_output_tokens = reserve_output_tokens
+        self.max_tool_result_tokens = max_tool_result_tokens
+        self.keep_recent_tool_results = keep_recent_tool_results
+        self.summarize_dropped = summarize_dropped
+        self.chars_per_token = chars_per_token
+        self.stats = {
+            "calls": 0, "trimmed_calls": 0, "truncated_tool_results": 0, "elided_tool_results": 0,
+            "dropped_messages": 0, "tokens_before": 0, "tokens_after": 0, "over_budget": 0
+        }
+
+    def estimate_tokens(self, text: str) -> int:
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        return int(ascii_chars / self.chars_per_token) + (len(text) - ascii_chars) + 1
+
+    def message_tokens(self, message: Dict[str, Any]) -> int:
+        content = message.get("content")
+        if content is not None and not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        tokens = MESSAGE_OVERHEAD_TOKENS + (self.estimate_tokens(content) if content else 0)
+        if message.get("tool_calls"):
+            tokens += self.estimate_tokens(json.dumps(message["tool_calls"], ensure_ascii=False))
+        return tokens
+
+    def fit(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        예산에 맞게 줄인 메시지 목록을 반환합니다. (바꾼 메시지만 복사하고 원본은 수정하지 않음)
+
+        Args:
+            messages: 전체 대화 이력
+            tools: 요청에 함께 보낼 도구 정의 (예산에서 제외)
+        """
+        self.stats["calls"] += 1
+        budget = self.max_context_tokens - self.reserve_output_tokens
+        if tools:
+            budget -= self.estimate_tokens(json.dumps(tools, ensure_ascii=False))
+
+        result = list(messages)
+        sizes = [self.message_tokens(m) for m in result]
+        before = sum(sizes)
+
+        # 1. 너무 큰 도구 결과는 항상 자름
+        for idx, message in enumerate(result):
+            if message.get("role") == "tool" and sizes[idx] - MESSAGE_OVERHEAD_TOKENS > self.max_tool_result_tokens:
+                result[idx] = self._truncate(message)
+                sizes[idx] = self.message_tokens(result[idx])
+                self.stats["truncated_tool_results"] += 1
+
+        # 2. 오래된 도구 결과부터 생략 표시로 교체 (tool_call_id는 유지해야 tool_calls와 짝이 맞음)
+        tool_names = {
+            call.get("id"): call.get("function", {}).get("name")
+            for m in result for call in m.get("tool_calls") or []
+        }
+        tool_indices = [i for i, m in enumerate(result) if m.get("role") == "tool"]
+        old_tools = tool_indices[:max(0, len(tool_indices) - self.keep_recent_tool_results)]
+        for idx in old_tools:
+            if sum(sizes) <= budget:
+                break
+            result[idx] = self._elide(result[idx], sizes[idx], tool_names)
+            sizes[idx] = self.message_tokens(result[idx])
+            self.stats["elided_tool_results"] += 1
+
+        # 3. 오래된 턴 제거 (앞쪽 system 메시지와 현재 턴은 보호)
+        if sum(sizes) > budget:
+            result, sizes = self._drop_old_turns(result, sizes, budget)
+
+        after = sum(sizes)
+        self.stats["tokens_before"] += before
+        self.stats["tokens_after"] += after
+        if after < before:
+            self.stats["trimmed_calls"] += 1
+            logger.info(f"✂️ [ContextWindow] 프롬프트 축소: 약 {before} → {after} 토큰 (예산 {budget})")
+        if after > budget:
+            self.stats["over_budget"] += 1
+            logger.warning(f"⚠️ [ContextWindow] 축소 후에도 예산 초과 (약 {after}/{budget} 토큰)")
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "enabled": True,
+            "max_context_tokens": self.max_context_tokens,
+            "reserve_output_tokens": self.reserve_output_tokens,
+            "avg_tokens_after": round(self.stats["tokens_after"] / self.stats["calls"]) if self.stats["calls"] else 0
+        }
+
+    def _truncate(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        content = message.get("content") or ""
+        # 추정 토큰 수에 비례하여 남길 글자 수 계산
+        keep = int(len(content) * self.max_tool_result_tokens / max(self.estimate_tokens(content), 1))
+        omitted = len(content) - keep
+        return {**message, "content": f"{content[:keep]}\n...[도구 결과가 길어 {omitted}자 생략]"}
+
+    @staticmethod
+    def _elide(message: Dict[str, Any], tokens: int, tool_names: Dict[str, str]) -> Dict[str, Any]:
+        name = message.get("name") or tool_names.get(message.get("tool_call_id")) or "tool"
+        return {**message, "content": f"[이전 도구 결과 생략: {name}, 약 {tokens} 토큰]"}
+
+    def _drop_old_turns(self, messages: List[Dict[str, Any]], sizes: List[int], budget: int):
+        start = 0
+        while start < len(messages) and messages[start].get("role") == "system":
+            start += 1
+        last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=len(messages))
+        if last_user <= start:
+            return messages, sizes
+
+        # 제거 단위: 메시지 하나 (tool_calls가 있는 assistant는 뒤따르는 tool 메시지까지 한 단위)
+        end = start
+        total = sum(sizes)
+        dropped: List[Dict[str, Any]] = []
+        summary_cost = 0
+        while end < last_user and total + summary_cost > budget:
+            unit_end = end + 1
+            if messages[end].get("tool_calls"):
+                while unit_end < last_user and messages[unit_end].get("role") == "tool":
+                    unit_end += 1
+            dropped.extend(messages[end:unit_end])
+            total -= sum(sizes[end:unit_end])
+            end = unit_end
+            if self.summarize_dropped:
+                summary_cost = self.message_tokens(self._summarize(dropped))
+        # 앞쪽에 남은 tool 메시지는 짝이 되는 tool_calls가 없으므로 함께 제거
+        while end < last_user and messages[end].get("role") == "tool":
+            dropped.append(messages[end])
+            end += 1
+
+        if not dropped:
+            return messages, sizes
+        self.stats["dropped_messages"] += len(dropped)
+        kept = messages[:start] + messages[end:]
+        kept_sizes = sizes[:start] + sizes[end:]
+        if self.summarize_dropped:
+            summary = self._summarize(dropped)
+            kept.insert(start, summary)
+            kept_sizes.insert(start, self.message_tokens(summary))
+        return kept, kept_sizes
+
+    @staticmethod
+    def _summarize(dropped: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """제거한 턴의 요약 (LLM 호출 없이 메시지 앞부분과 호출한 도구 이름만 남김)"""
+        lines = []
+        for message in dropped:
+            role = message.get("role")
+            if role == "tool":
+                continue
+            content = message.get("content")
+            if isinstance(content, str) and content.strip():
+                snippet = " ".join(content.split())[:SUMMARY_SNIPPET_CHARS]
+                lines.append(f"- {role}: {snippet}")
+            for call in message.get("tool_calls") or []:
+                lines.append(f"- {role}: 도구 호출 {call.get('function', {}).get('name', '?')}")
+        body = "\n".join(lines) if lines else "- (내용 없음)"
+        return {"role": "system", "content": f"[이전 대화 요약 - 컨텍스트 길이 제한으로 {len(dropped)}개 메시지 생략]\n{body}"}
+
+
+def create_context_window(window_config: Optional[Dict[str, Any]]) -> Optional[ContextWindow]:
+    """설정(context_window)으로 관리자 생성. 비활성화면 None"""
+    window_config = window_config or {}
+    if not window_config.get("enabled", False):
+        return None
+    return ContextWindow(
+        max_context_tokens=window_config.get("max_context_tokens", 16384),
+        reserve_output_tokens=window_config.get("reserve_output_tokens", 2048),
+        max_tool_result_tokens=window_config.get("max_tool_result_tokens", 2000),
+        keep_recent_tool_results=window_config.get("keep_recent_tool_results", 2),
+        summarize_dropped=window_config.get("summarize_dropped", True),
+        chars_per_token=window_config.get("chars_per_token", 4.0)
+    )
@@ -0,0 +1,230 @@
+"""
+llm_cache.py - 결정적(temperature 0) LLM 호출 응답 캐시
+
+에이전트 서버의 call_llm은 항상 temperature 0으로 호출하고, IDE 클라이언트는 재시도/재렌더링 때
+같은 대화 이력을 그대로 다시 보내는 경우가 많습니다. 이런 호출은 5~30초짜리 LLM 왕복 없이
+이전 응답을 돌려줄 수 있습니다.
+
+- 키: 모델 + 메시지 + 도구 + 샘플링 파라미터를 정규화한 JSON의 SHA-256 (내용 기반 주소)
+- 1단계: 메모리 LRU (max_entries)
+- 2단계: SQLite 디스크 캐시 (disk_path를 지정한 경우, max_disk_entries)
+- 두 단계 모두 TTL이 지나면 만료
+- 요청 헤더 "X-LLM-Cache: bypass" 또는 "Cache-Control: no-cache"면 캐시를 건너뜀
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+BYPASS_HEADER = "x-llm-cache"
+
+
+def cache_bypass_requested(headers: Mapping[str, str]) -> bool:
+    """요청 헤더에 캐시 우회 지시가 있는지 확인"""
+    if headers.get(BYPASS_HEADER, "").strip().lower() in ("bypass", "off", "no-cache"):
+        return True
+    return "no-cache" in headers.get("cache-control", "").lower()
+
+
+class LLMResponseCache:
+    """메모리 LRU + 선택적 SQLite 2단계 LLM 응답 캐시"""
+
+    def __init__(
+        self,
+        ttl: float = 600.0,
+        max_entries: int = 256,
+        disk_path: Optional[Union[str, Path]] = None,
+        max_disk_entries: int = 5000
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        # key -> (만료 시각, 응답 JSON 문자열). 문자열로 보관하여 호출자가 응답을 수정해도 캐시는 안전
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._disk_path = str(disk_path) if disk_path else None
+        self._disk_lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self.stats = {
+            "hits_memory": 0, "hits_disk": 0, "misses": 0, "stores": 0,
+            "evictions": 0, "expired": 0, "bypassed": 0
+        }
+        if self._disk_path:
+            self._open_disk()
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """LLM 요청 페이로드로 캐시 키 생성 (stream 여부는 응답 내용과 무관하므로 제외)"""
+        material = {k: v for k, v in payload.items() if k != "stream"}
+        raw = json.dumps(material, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_cacheable(payload: Dict[str, Any]) -> bool:
+        """결정적 호출(temperature 0)만 캐시"""
+        return payload.get("temperature", 1) == 0 and not payload.get("stream", False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """캐시된 응답 반환 (없거나 만료되면 None)"""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, body = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.stats["hits_memory"] += 1
+                return json.loads(body)
+            del self._memory[key]
+            self.stats["expired"] += 1
+
+        if self._disk is not None:
+            row = await asyncio.to_thread(self._disk_get, key, now)
+            if row is not None:
+                expires_at, body = row
+                self._remember(key, expires_at, body)
+                self.stats["hits_disk"] += 1
+                return json.loads(body)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, response: Dict[str, Any]) -> None:
+        """응답 저장 (정상 완료된 응답만)"""
+        choices = response.get("choices") or []
+        if not choices or choices[0].get("finish_reason") not in (None, "stop", "tool_calls"):
+            return
+        body = json.dumps(response, ensure_ascii=False)
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, body)
+        self.stats["stores"] += 1
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk_put, key, expires_at, body)
+
+    def record_bypass(self) -> None:
+        self.stats["bypassed"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["hits_memory"] + self.stats["hits_disk"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_enabled": self._disk is not None
+        }
+
+    def close(self) -> None:
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.close()
+                self._disk = None
+
+    def _remember(self, key: str, expires_at: float, body: str) -> None:
+        self._memory[key] = (expires_at, body)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _open_disk(self) -> None:
+        try:
+            conn = sqlite3.connect(self._disk_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)")
+            conn.commit()
+            self._disk = conn
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ [LLMCache] 디스크 캐시 비활성화 ({self._disk_path}): {e}")
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        with self._disk_lock:
+            row = self._disk.execute(
+                "SELECT expires_at, response FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] <= now:
+                self._disk.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._disk.commit()
+                self.stats["expired"] += 1
+                return None
+            self._disk.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._disk.commit()
+            return row[0], row[1]
+
+    def _disk_put(self, key: str, expires_at: float, body: str) -> None:
+        now = time.time()
+        with self._disk_lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, body, expires_at, now)
+            )
+            # 만료 항목 정리 후 최대 개수를 넘으면 가장 오래 사용하지 않은 항목부터 삭제
+            self._disk.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            self._disk.execute("""
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_disk_entries,))
+            self._disk.commit()
+
+
+def create_llm_cache(cache_config: Optional[Dict[str, Any]], base_dir: Path) -> Optional[LLMResponseCache]:
+    """설정(llm_cache)으로 캐시 생성. 비활성화면 None (disk_path는 설정 파일 위치 기준 상대 경로)"""
+    cache_config = cache_config or {}
+    if not cache_config.get("enabled", False):
+        return None
+    disk_path = cache_config.get("disk_path")
+    return LLMResponseCache(
+        ttl=cache_config.get("ttl_seconds", 600),
+        max_entries=cache_config.get("max_entries", 256),
+        disk_path=(base_dir / disk_path).resolve() if disk_path else None,
+        max_disk_entries=cache_config.get("max_disk_entries", 5000)
+    )
+
+
+async def cached_llm_call(
+    cache: Optional[LLMResponseCache],
+    payload: Dict[str, Any],
+    send,
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    캐시를 확인하고 없으면 send(payload)로 LLM을 호출한 뒤 응답을 저장합니다.
+
+    Args:
+        cache: 응답 캐시 (None이면 항상 호출)
+        payload: LLM 요청 페이로드
+        send: payload를 받아 응답 dict를 반환하는 코루틴 함수
+        use_cache: False면 조회/저장 모두 건너뜀 (요청 헤더로 우회한 경우)
+    """
+    if cache is None or not cache.is_cacheable(payload):
+        return await send(payload)
+    if not use_cache:
+        cache.record_bypass()
+        return await send(payload)
+
+    key = cache.make_key(payload)
+    cached = await cache.get(key)
+    if cached is not None:
+        logger.info(f"⚡ [LLMCache] 캐시 응답 사용 (key={key[:12]})")
+        return cached
+    response = await send(payload)
+    await cache.put(key, response)
+    return response
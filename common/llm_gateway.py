@@ -0,0 +1,634 @@
+"""
+llm_gateway.py - OpenAI 호환 LLM 호출 공용 게이트웨이
+
+proxy_server, agent_proxy, agent_native, agent_native_loop, agent_loop_api가 함께 사용합니다.
+서버마다 따로 구현하던 헤더 구성, 클라이언트 생성, 오류 처리를 한 곳으로 모았습니다.
+
+- 연결 풀을 유지하는 httpx.AsyncClient 하나를 모든 호출이 공유 (첫 호출 시 생성)
+- 비스트리밍(chat)과 스트리밍(stream_lines) 호출
+- 5xx 응답 / 연결 실패 / 연결 끊김은 지터를 섞은 지수 백오프로 재시도
+  (스트리밍은 첫 줄을 받기 전까지만 재시도. 응답 대기 시간 초과는 같은 백엔드로 재시도하지 않음)
+- 프로파일(llm 섹션)의 timeout / connect_timeout / max_retries 적용
+- 호출별 지연 시간(스트리밍은 첫 줄 도착 시간 포함)과 토큰 사용량 지표
+
+[다중 백엔드 라우팅 (llm_routing 섹션, enabled=true일 때)]
+- 여러 프로파일/레플리카(backends)에 요청을 분산
+  - least_outstanding: 처리 중인 요청 수 / 가중치가 가장 작은 백엔드
+  - weighted_round_robin: 가중치 비율대로 순환 (smooth WRR)
+- 수동 헬스 체크: 연속 eject_after_failures번 실패한 백엔드는 eject_seconds 동안 제외
+- 재시도는 가능하면 아직 시도하지 않은 다른 백엔드로 보냄
+- 응답 대기 시간 초과 시 failover_profiles(보조 프로파일)로 전환
+- 백엔드별 지연 시간 히스토그램 제공 (get_stats()["backends"])
+
+[동일 요청 합치기 (llm_coalescing 섹션, 기본 활성화)]
+- IDE 재시도나 여러 사용자의 같은 질문처럼 완전히 같은 요청이 동시에 처리 중이면
+  LLM에는 한 번만 보내고 결과를 함께 받음 (single-flight)
+- 키: 정규화한 요청 페이로드(모델, 메시지, 도구, temperature 등)의 SHA-256
+- 스트리밍은 받은 줄을 모든 구독자에게 처음부터 똑같이 전달 (늦게 합류해도 전체 응답을 받음)
+- 기다리는 호출자가 모두 연결을 끊으면 LLM 호출도 취소
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 재시도할 HTTP 상태 코드 (서버 과부하/재시작/게이트웨이 오류)
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+# 재시도할 전송 오류 (요청이 LLM에 도달하지 못했거나 연결이 끊긴 경우)
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.ReadError)
+
+# 지연 시간 백분위 계산에 사용할 최근 호출 수
+LATENCY_WINDOW = 500
+# 백엔드별 지연 시간 히스토그램 구간 상한(초). 마지막 구간은 그 이상 전부
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STRATEGY_LEAST_OUTSTANDING = "least_outstanding"
+STRATEGY_WEIGHTED_ROUND_ROBIN = "weighted_round_robin"
+
+
+class _RetryableStatus(Exception):
+    """재시도 가능한 상태 코드 응답 (내부 신호용)"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def make_request_key(payload: Dict[str, Any]) -> str:
+    """동일 요청 판별 키 (정규화한 페이로드 JSON의 SHA-256)"""
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """LLM에 실제로 보낸 요청 하나와 그 결과를 기다리는 호출자들"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        # 스트리밍 전용: 지금까지 받은 줄, 종료 여부, 종료 오류
+        self.lines: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+
+    async def pump(self, source: AsyncIterator[str]) -> None:
+        """업스트림 스트림을 읽어 lines에 쌓고 구독자에게 알림"""
+        try:
+            async for line in source:
+                self.lines.append(line)
+                async with self._changed:
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self.error = httpx.ReadError("LLM 스트림이 취소되었습니다")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """처음 줄부터 전달하고, 스트림이 끝날 때까지 새 줄을 이어서 전달"""
+        sent = 0
+        while True:
+            while sent < len(self.lines):
+                yield self.lines[sent]
+                sent += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.lines) > sent or self.done)
+
+    def leave(self, flights: Dict[str, "_Flight"], key: str) -> None:
+        """
+        호출자 하나가 빠짐. 남은 호출자가 없으면 업스트림 호출 취소
+
+        취소 전에 처리 중 목록에서 바로 제거해야, 완료 콜백이 실행되기 전에 합류한 호출자가
+        취소된 요청을 받지 않고 새로 호출함
+        """
+        self.waiters -= 1
+        if self.waiters == 0 and self.task is not None and not self.task.done():
+            if flights.get(key) is self:
+                del flights[key]
+            self.task.cancel()
+
+
+def _summarize(samples: deque) -> Dict[str, Any]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "avg": round(sum(ordered) / len(ordered), 4),
+        "p50": round(ordered[len(ordered) // 2], 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "max": round(ordered[-1], 4)
+    }
+
+
+class LLMBackend:
+    """LLM 엔드포인트 하나 (프로파일 또는 레플리카)와 그 상태"""
+
+    def __init__(
+        self,
+        name: str,
+        llm_config: Dict[str, Any],
+        client_config: Dict[str, Any],
+        weight: float = 1,
+        rewrite_model: bool = False
+    ):
+        self.name = name
+        self.llm_config = llm_config
+        self.weight = max(weight, 0.01)
+        self.model = llm_config.get("model")
+        self.rewrite_model = rewrite_model
+        self.url = f"{llm_config['base_url']}/chat/completions"
+        self.headers = self._build_headers()
+        # 프로파일의 connect_timeout이 있으면 우선 (원격 vLLM 등 프로파일마다 네트워크 조건이 다름)
+        self.timeout = httpx.Timeout(
+            llm_config.get("timeout", 120),
+            connect=llm_config.get("connect_timeout", client_config.get("connect_timeout", 10.0))
+        )
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.current_weight = 0.0  # smooth WRR 누적 가중치
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {"requests": 0, "successes": 0, "failures": 0, "timeouts": 0, "ejections": 0}
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def prepare(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """라우팅 백엔드마다 모델 이름이 다르므로(예: vLLM → Ollama 대체) model을 백엔드 것으로 바꿈"""
+        if self.rewrite_model and self.model and payload.get("model") != self.model:
+            return {**payload, "model": self.model}
+        return payload
+
+    def record_success(self, latency: float) -> None:
+        self.stats["successes"] += 1
+        self.consecutive_failures = 0
+        self._latencies.append(latency)
+        for idx, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.histogram[idx] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def record_failure(self, eject_after: int, eject_seconds: float, timeout: bool = False) -> None:
+        self.stats["failures"] += 1
+        if timeout:
+            self.stats["timeouts"] += 1
+        self.consecutive_failures += 1
+        if eject_after and self.consecutive_failures >= eject_after:
+            self.ejected_until = time.monotonic() + eject_seconds
+            self.consecutive_failures = 0
+            self.stats["ejections"] += 1
+            logger.warning(f"🚫 [LLMGateway] 백엔드 '{self.name}' {eject_seconds}초 동안 제외 (연속 {eject_after}회 실패)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS] + ["inf"]
+        return {
+            **self.stats,
+            "base_url": self.llm_config["base_url"],
+            "model": self.model,
+            "weight": self.weight,
+            "in_flight": self.in_flight,
+            "healthy": self.is_healthy(now),
+            "ejected_for_seconds": round(max(0.0, self.ejected_until - now), 1),
+            "latency_seconds": _summarize(self._latencies),
+            "latency_histogram": dict(zip(labels, self.histogram))
+        }
+
+    def _build_headers(self) -> Dict[str, str]:
+        """api_key가 존재하고 "not-needed"가 아닌 경우에만 Authorization 추가"""
+        headers = {"Content-Type": "application/json"}
+        api_key = str(self.llm_config.get("api_key", "")).strip()
+        if api_key and api_key.lower() != "not-needed":
+            headers["Authorization"] = f"Bearer {api_key}"
+        return headers
+
+
+class LLMGateway:
+    """OpenAI 호환 /chat/completions 호출기 (프로세스당 1개)"""
+
+    def __init__(
+        self,
+        backends: List[LLMBackend],
+        client_config: Optional[Dict[str, Any]] = None,
+        retry_config: Optional[Dict[str, Any]] = None,
+        routing_config: Optional[Dict[str, Any]] = None,
+        failover_backends: Optional[List[LLMBackend]] = None,
+        coalescing_config: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Args:
+            backends: 요청을 분산할 기본 백엔드 목록 (1개면 라우팅 없이 단일 호출)
+            client_config: 연결 풀 설정 (http_client 섹션)
+            retry_config: 재시도 설정 (llm_retry 섹션)
+            routing_config: 라우팅 설정 (llm_routing 섹션: strategy, eject_after_failures, eject_seconds)
+            failover_backends: 응답 대기 시간 초과 시 전환할 보조 백엔드
+            coalescing_config: 동일 요청 합치기 설정 (llm_coalescing 섹션: enabled, streams)
+        """
+        if not backends:
+            raise ValueError("LLM 백엔드가 하나 이상 필요합니다")
+        self.backends = backends
+        self.failover_backends = failover_backends or []
+        self.client_config = client_config or {}
+        retry_config = retry_config or {}
+        routing_config = routing_config or {}
+        self.max_retries = backends[0].llm_config.get("max_retries", retry_config.get("max_retries", 2))
+        self.backoff_initial = retry_config.get("backoff_initial", 0.5)
+        self.backoff_max = retry_config.get("backoff_max", 8.0)
+        self.strategy = routing_config.get("strategy", STRATEGY_LEAST_OUTSTANDING)
+        self.eject_after = routing_config.get("eject_after_failures", 3)
+        self.eject_seconds = routing_config.get("eject_seconds", 30)
+        coalescing_config = coalescing_config or {}
+        self.coalesce = coalescing_config.get("enabled", True)
+        self.coalesce_streams = self.coalesce and coalescing_config.get("streams", True)
+        self._flights: Dict[str, _Flight] = {}
+        self._stream_flights: Dict[str, _Flight] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._first_line_latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {
+            "requests_total": 0, "streams_total": 0, "in_flight": 0, "errors_total": 0, "retries_total": 0,
+            "failovers_total": 0, "coalesced_total": 0, "coalesced_streams_total": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0
+        }
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """공유 클라이언트 (없거나 닫혔으면 생성)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    async def chat(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        비스트리밍 호출. 재시도/대체 후에도 실패하면 httpx 예외를 그대로 올림
+        같은 요청이 이미 처리 중이면 그 결과를 함께 받음 (호출자마다 복사본 반환)
+        """
+        if not self.coalesce:
+            return await self._chat(payload)
+
+        key = make_request_key(payload)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._chat(payload))
+            flight.task.add_done_callback(lambda _: self._end_flight(self._flights, key, flight))
+        else:
+            self.stats["coalesced_total"] += 1
+            logger.info(f"🔗 [LLMGateway] 처리 중인 동일 요청에 합류 (key={key[:12]}, 대기 {flight.waiters + 1}건)")
+        flight.waiters += 1
+        try:
+            # shield: 한 호출자가 취소되어도 다른 호출자가 기다리는 업스트림 호출은 유지
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.leave(self._flights, key)
+        return copy.deepcopy(result)
+
+    async def stream_lines(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        스트리밍 호출. 응답 본문을 빈 줄을 제외한 줄 단위로 반환합니다.
+        같은 요청이 이미 스트리밍 중이면 업스트림 스트림 하나를 함께 구독합니다.
+        """
+        if not self.coalesce_streams:
+            async for line in self._stream_lines(payload):
+                yield line
+            return
+
+        key = make_request_key(payload)
+        flight = self._stream_flights.get(key)
+        if flight is None:
+            flight = self._stream_flights[key] = _Flight()
+            flight.task = asyncio.create_task(flight.pump(self._stream_lines(payload)))
+            flight.task.add_done_callback(lambda _: self._end_flight(self._stream_flights, key, flight))
+        else:
+            self.stats["coalesced_streams_total"] += 1
+            logger.info(f"🔗 [LLMGateway] 처리 중인 동일 스트림에 합류 (key={key[:12]}, 구독 {flight.waiters + 1}건)")
+        flight.waiters += 1
+        try:
+            async for line in flight.subscribe():
+                yield line
+        finally:
+            flight.leave(self._stream_flights, key)
+
+    async def _chat(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """업스트림 비스트리밍 호출 (라우팅/재시도/대체 포함)"""
+        self.stats["requests_total"] += 1
+        self.stats["in_flight"] += 1
+        started = time.monotonic()
+        attempt = 0
+        tried: Set[str] = set()
+        failover = False
+        try:
+            while True:
+                backend = self._pick(tried, failover)
+                tried.add(backend.name)
+                backend.stats["requests"] += 1
+                backend.in_flight += 1
+                call_started = time.monotonic()
+                try:
+                    response = await self.client.post(
+                        backend.url, json=backend.prepare(payload), headers=backend.headers, timeout=backend.timeout
+                    )
+                    if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                        raise _RetryableStatus(response.status_code)
+                    response.raise_for_status()
+                    result = response.json()
+                    backend.record_success(time.monotonic() - call_started)
+                    break
+                except (_RetryableStatus, *RETRY_EXCEPTIONS) as e:
+                    backend.record_failure(self.eject_after, self.eject_seconds)
+                    if attempt >= self.max_retries:
+                        raise
+                    attempt += 1
+                    await self._backoff(attempt, backend, e)
+                except httpx.TimeoutException:
+                    backend.record_failure(self.eject_after, self.eject_seconds, timeout=True)
+                    if not self._start_failover(failover, backend):
+                        raise
+                    failover = True
+                except httpx.HTTPStatusError as e:
+                    if e.response is not None and e.response.status_code >= 500:
+                        backend.record_failure(self.eject_after, self.eject_seconds)
+                    raise
+                finally:
+                    backend.in_flight -= 1
+        except Exception:
+            self.stats["errors_total"] += 1
+            raise
+        finally:
+            self.stats["in_flight"] -= 1
+
+        self._latencies.append(time.monotonic() - started)
+        self._record_usage(result.get("usage"))
+        return result
+
+    async def _stream_lines(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        업스트림 스트리밍 호출.
+        첫 줄을 받기 전의 오류만 재시도/대체하고, 이후 오류는 그대로 올립니다.
+        """
+        self.stats["streams_total"] += 1
+        self.stats["in_flight"] += 1
+        started = time.monotonic()
+        attempt = 0
+        tried: Set[str] = set()
+        failover = False
+        received = False
+        try:
+            while True:
+                backend = self._pick(tried, failover)
+                tried.add(backend.name)
+                backend.stats["requests"] += 1
+                backend.in_flight += 1
+                try:
+                    async with self.client.stream(
+                        "POST", backend.url, json=backend.prepare(payload), headers=backend.headers, timeout=backend.timeout
+                    ) as response:
+                        if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                            await response.aread()
+                            raise _RetryableStatus(response.status_code)
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            if not received:
+                                received = True
+                                # 스트리밍 백엔드 지연 시간은 첫 줄 도착 시간 기준
+                                first_line = time.monotonic() - started
+                                self._first_line_latencies.append(first_line)
+                                backend.record_success(first_line)
+                            # usage는 마지막 청크에만 있으므로 문자열 검사 후에만 파싱
+                            if '"usage"' in line:
+                                self._record_usage_from_line(line)
+                            yield line
+                    break
+                except (_RetryableStatus, *RETRY_EXCEPTIONS) as e:
+                    if received:
+                        raise
+                    backend.record_failure(self.eject_after, self.eject_seconds)
+                    if attempt >= self.max_retries:
+                        raise
+                    attempt += 1
+                    await self._backoff(attempt, backend, e)
+                except httpx.TimeoutException:
+                    if received:
+                        raise
+                    backend.record_failure(self.eject_after, self.eject_seconds, timeout=True)
+                    if not self._start_failover(failover, backend):
+                        raise
+                    failover = True
+                finally:
+                    backend.in_flight -= 1
+        except Exception:
+            self.stats["errors_total"] += 1
+            raise
+        finally:
+            self.stats["in_flight"] -= 1
+            if received:
+                self._latencies.append(time.monotonic() - started)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """요청 카운터, 지연 시간 백분위, 토큰 사용량, 백엔드별 상태/히스토그램, 연결 풀 상태"""
+        primary = self.backends[0]
+        stats: Dict[str, Any] = {
+            **self.stats,
+            "base_url": primary.llm_config["base_url"],
+            "model": primary.model,
+            "strategy": self.strategy if len(self.backends) > 1 else None,
+            "max_retries": self.max_retries,
+            "latency_seconds": _summarize(self._latencies),
+            "first_line_latency_seconds": _summarize(self._first_line_latencies),
+            "backends": {b.name: b.get_stats() for b in self.backends},
+            "failover_backends": {b.name: b.get_stats() for b in self.failover_backends},
+            "coalescing": {
+                "enabled": self.coalesce,
+                "streams": self.coalesce_streams,
+                "in_flight_keys": len(self._flights),
+                "in_flight_stream_keys": len(self._stream_flights)
+            },
+            "initialized": self._client is not None and not self._client.is_closed,
+            "http2": self.client_config.get("http2", False),
+            "limits": {
+                "max_connections": self.client_config.get("max_connections", 100),
+                "max_keepalive_connections": self.client_config.get("max_keepalive_connections", 20),
+                "keepalive_expiry": self.client_config.get("keepalive_expiry", 30.0)
+            }
+        }
+        # httpx는 풀 상태를 공개 API로 제공하지 않으므로 httpcore 풀을 조심스럽게 조회
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["connections"] = {
+                "total": len(connections),
+                "idle": sum(1 for c in connections if c.is_idle()),
+                "active": sum(1 for c in connections if not c.is_idle() and not c.is_closed())
+            }
+        return stats
+
+    async def close(self) -> None:
+        flights = list(self._flights.values()) + list(self._stream_flights.values())
+        for flight in flights:
+            flight.task.cancel()
+        await asyncio.gather(*(f.task for f in flights), return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _end_flight(flights: Dict[str, _Flight], key: str, flight: _Flight) -> None:
+        """완료된 요청을 처리 중 목록에서 제거 (이후 같은 요청은 새로 호출)"""
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def _pick(self, tried: Set[str], failover: bool) -> LLMBackend:
+        """
+        다음 호출을 보낼 백엔드 선택
+        - 제외(eject)되지 않았고 이번 호출에서 아직 시도하지 않은 백엔드 우선
+        - 기본 백엔드가 모두 제외 상태면 보조 백엔드 사용
+        - 후보가 없으면 제외/시도 여부를 무시하고 선택 (요청을 버리지 않음)
+        """
+        now = time.monotonic()
+        pool = self.backends
+        if self.failover_backends and (failover or not any(b.is_healthy(now) for b in self.backends)):
+            pool = self.failover_backends
+        if len(pool) == 1:
+            return pool[0]
+
+        candidates = [b for b in pool if b.name not in tried and b.is_healthy(now)]
+        if not candidates:
+            candidates = [b for b in pool if b.is_healthy(now)] or pool
+
+        if self.strategy == STRATEGY_WEIGHTED_ROUND_ROBIN:
+            # smooth weighted round robin: 가중치 비율을 유지하면서 같은 백엔드가 연속되지 않게 분산
+            total = sum(b.weight for b in candidates)
+            for b in candidates:
+                b.current_weight += b.weight
+            chosen = max(candidates, key=lambda b: b.current_weight)
+            chosen.current_weight -= total
+            return chosen
+        # least outstanding requests (동률이면 무작위)
+        return min(candidates, key=lambda b: (b.in_flight / b.weight, random.random()))
+
+    def _start_failover(self, already_failover: bool, backend: LLMBackend) -> bool:
+        """응답 대기 시간 초과 시 보조 백엔드로 전환할 수 있으면 True"""
+        if already_failover or not self.failover_backends:
+            return False
+        self.stats["failovers_total"] += 1
+        logger.warning(f"⏱️ [LLMGateway] 백엔드 '{backend.name}' 응답 시간 초과 - 보조 프로파일로 전환")
+        return True
+
+    def _create_client(self) -> httpx.AsyncClient:
+        # HTTP/2는 h2 패키지가 필요하므로 없으면 HTTP/1.1로 대체
+        http2 = self.client_config.get("http2", False)
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("⚠️ h2 패키지가 없어 HTTP/2를 비활성화합니다 (pip install 'httpx[http2]')")
+                http2 = False
+
+        limits = httpx.Limits(
+            max_connections=self.client_config.get("max_connections", 100),
+            max_keepalive_connections=self.client_config.get("max_keepalive_connections", 20),
+            keepalive_expiry=self.client_config.get("keepalive_expiry", 30.0)
+        )
+        # 요청마다 백엔드의 timeout을 지정하므로 여기서는 기본값만 설정
+        return httpx.AsyncClient(limits=limits, timeout=self.backends[0].timeout, http2=http2)
+
+    async def _backoff(self, attempt: int, backend: LLMBackend, error: Exception) -> None:
+        """지수 백오프 + 지터 (동시에 실패한 요청들이 같은 순간에 몰리지 않게)"""
+        self.stats["retries_total"] += 1
+        delay = min(self.backoff_max, self.backoff_initial * (2 ** (attempt - 1)))
+        delay *= random.uniform(0.5, 1.5)
+        logger.warning(
+            f"🔁 [LLMGateway] LLM 호출 재시도 {attempt}/{self.max_retries} ({delay:.2f}초 후, 실패 백엔드 '{backend.name}'): {error!r}"
+        )
+        await asyncio.sleep(delay)
+
+    def _record_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        if not usage:
+            return
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            self.stats[key] += usage.get(key) or 0
+
+    def _record_usage_from_line(self, line: str) -> None:
+        data = line[5:].strip() if line.startswith("data:") else line
+        try:
+            self._record_usage(json.loads(data).get("usage"))
+        except (json.JSONDecodeError, AttributeError):
+            pass
+
+
+def _build_backends(
+    entries: List[Any],
+    profiles: Dict[str, Dict[str, Any]],
+    client_config: Dict[str, Any]
+) -> List[LLMBackend]:
+    """
+    llm_routing의 backends/failover_profiles 항목으로 백엔드 생성
+    - 문자열: 프로파일 이름
+    - dict: {"profile": 이름, "name": 표시 이름, "weight": 가중치, 그 외 키는 프로파일 값을 덮어씀}
+      (예: 같은 vLLM 프로파일의 두 번째 레플리카 → {"profile": "vllm", "name": "vllm-2", "base_url": "..."})
+    """
+    backends = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"profile": entry}
+        profile_name = entry.get("profile")
+        if profile_name not in profiles:
+            logger.warning(f"⚠️ [LLMGateway] 알 수 없는 프로파일 '{profile_name}' - 건너뜀")
+            continue
+        overrides = {k: v for k, v in entry.items() if k not in ("profile", "name", "weight")}
+        backends.append(LLMBackend(
+            entry.get("name", profile_name),
+            {**profiles[profile_name], **overrides},
+            client_config,
+            weight=entry.get("weight", 1),
+            rewrite_model=True
+        ))
+    return backends
+
+
+def create_llm_gateway(config: Dict[str, Any]) -> LLMGateway:
+    """
+    서버 설정 전체(llm, llm_profiles, llm_routing, llm_coalescing, http_client, llm_retry 섹션)로 게이트웨이 생성
+    llm_routing이 없거나 비활성화면 llm 섹션(active_profile) 하나만 사용
+    """
+    client_config = config.get("http_client") or {}
+    routing = config.get("llm_routing") or {}
+    profiles = config.get("llm_profiles") or {}
+
+    backends: List[LLMBackend] = []
+    failover: List[LLMBackend] = []
+    if routing.get("enabled"):
+        backends = _build_backends(routing.get("backends", []), profiles, client_config)
+        failover = _build_backends(routing.get("failover_profiles", []), profiles, client_config)
+    if not backends:
+        backends = [LLMBackend(config.get("active_profile", "default"), config["llm"], client_config)]
+    elif len(backends) > 1:
+        logger.info(f"⚖️ [LLMGateway] {len(backends)}개 백엔드로 분산 ({routing.get('strategy', STRATEGY_LEAST_OUTSTANDING)})")
+
+    return LLMGateway(
+        backends, client_config, config.get("llm_retry"), routing, failover, config.get("llm_coalescing")
+    )
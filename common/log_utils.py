@@ -0,0 +1,143 @@
+"""
+log_utils.py - 서버 공용 로깅 설정 및 페이로드 로깅
+
+proxy_server, agent_proxy, agent_native, agent_native_loop, agent_loop_api, mcp_server가 함께 사용합니다.
+
+[비동기 로그 출력]
+setup_logging()은 루트 로거에 QueueHandler 하나만 붙이고, 실제 콘솔/파일 출력은
+QueueListener 스레드가 담당합니다. 요청 처리 중에는 디스크 쓰기를 기다리지 않습니다.
+
+[지연 페이로드 로깅]
+요청/응답 본문(수 KB의 JSON)을 f-string으로 만들면 해당 레벨이 꺼져 있어도 직렬화 비용을 냅니다.
+log_payload()는 레벨이 켜져 있고 샘플링에 당첨된 경우에만 직렬화하며, 긴 본문은 잘라서 남깁니다.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# 페이로드 로깅 기본값 (setup_logging()에서 logging.payload 설정으로 덮어씀)
+_payload_settings = {
+    "max_chars": 4000,     # 0이면 자르지 않음
+    "sample_rate": 1.0,    # 0.0 ~ 1.0, 페이로드 로그를 남길 확률
+    "indent": 2            # None이면 한 줄로 직렬화
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(
+    log_config: Dict[str, Any],
+    log_file: Optional[Union[str, Path]] = None,
+    queue_size: int = 10000
+) -> logging.handlers.QueueListener:
+    """
+    루트 로거를 QueueHandler → QueueListener(콘솔 + 파일) 구조로 설정합니다.
+
+    Args:
+        log_config: 설정 파일의 logging 섹션 (level, format, payload)
+        log_file: 로그 파일 경로 (None이면 콘솔만)
+        queue_size: 로그 레코드 큐 크기 (가득 차면 레코드를 버림)
+
+    Returns:
+        QueueListener: 종료 시 stop()으로 남은 로그를 모두 출력 (atexit에도 등록됨)
+    """
+    global _listener
+    level = getattr(logging, log_config.get("level", "INFO"))
+    formatter = logging.Formatter(log_config.get("format", LOG_FORMAT))
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    configure_payload_logging(**log_config.get("payload", {}))
+
+    if _listener is not None:
+        _listener.stop()
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_DroppingQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """큐가 가득 차면 요청 경로를 막지 않고 레코드를 버리는 QueueHandler"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def configure_payload_logging(
+    max_chars: Optional[int] = None,
+    sample_rate: Optional[float] = None,
+    indent: Optional[int] = -1
+) -> None:
+    """페이로드 로깅의 잘라내기 길이, 샘플링 비율, 들여쓰기를 변경합니다."""
+    if max_chars is not None:
+        _payload_settings["max_chars"] = max_chars
+    if sample_rate is not None:
+        _payload_settings["sample_rate"] = sample_rate
+    if indent != -1:
+        _payload_settings["indent"] = indent
+
+
+def format_payload(payload: Any, max_chars: Optional[int] = None) -> str:
+    """페이로드를 JSON 문자열로 직렬화하고 max_chars를 넘으면 잘라냅니다."""
+    if isinstance(payload, str):
+        text = payload
+    else:
+        try:
+            text = json.dumps(payload, ensure_ascii=False, indent=_payload_settings["indent"], default=str)
+        except (TypeError, ValueError):
+            text = repr(payload)
+
+    limit = _payload_settings["max_chars"] if max_chars is None else max_chars
+    if limit and len(text) > limit:
+        return f"{text[:limit]}… (+{len(text) - limit}자 생략)"
+    return text
+
+
+def log_payload(
+    logger: logging.Logger,
+    level: int,
+    label: str,
+    payload: Any,
+    max_chars: Optional[int] = None
+) -> None:
+    """
+    레벨이 켜져 있을 때만 페이로드를 직렬화하여 "{label}\\n{payload}" 형태로 남깁니다.
+
+    Args:
+        logger: 대상 로거
+        level: 로그 레벨 (예: logging.DEBUG)
+        label: 페이로드 앞에 붙일 제목
+        payload: JSON 직렬화할 객체 (문자열이면 그대로 사용)
+        max_chars: 이 호출에만 적용할 최대 길이 (None이면 설정값)
+    """
+    if not logger.isEnabledFor(level):
+        return
+    sample_rate = _payload_settings["sample_rate"]
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    logger.log(level, "%s\n%s", label, format_payload(payload, max_chars), stacklevel=2)
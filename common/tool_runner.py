@@ -0,0 +1,74 @@
+"""
+tool_runner.py - 한 반복의 도구 호출들을 동시에 실행하는 공용 헬퍼
+
+agent_proxy, agent_native, agent_native_loop가 LLM이 한 번에 요청한 도구 호출들을 실행할 때 사용합니다.
+
+- 동시 실행 수는 요청 단위로 max_parallel개로 제한
+- 호출 하나가 예외를 내도(인자 파싱 오류, MCP 전송 오류 등) 요청 전체를 중단하지 않고
+  그 호출만 오류 tool 메시지로 바꿔 LLM이 실패를 보고 다음 행동을 정하게 함
+- 결과는 호출 순서대로(run_concurrent_tool_calls) 또는 완료 순서대로(iter_concurrent_tool_calls) 받을 수 있음
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def tool_error_message(tool_call_id: Optional[str], error: BaseException) -> Dict[str, Any]:
+    """도구 실행 중 발생한 예외를 대화 이력에 넣을 tool 메시지로 변환"""
+    return {
+        "role": "tool",
+        "tool_call_id": tool_call_id,
+        "content": json.dumps({"success": False, "error": f"{type(error).__name__}: {error}"}, ensure_ascii=False)
+    }
+
+
+async def iter_concurrent_tool_calls(
+    calls: List[Any],
+    run_one: Callable[[Any], Awaitable[Dict[str, Any]]],
+    call_id: Callable[[Any], Optional[str]],
+    max_parallel: int = 4
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    도구 호출들을 동시에 실행하고 완료되는 순서대로 (호출 번호, tool 메시지)를 반환합니다.
+
+    Args:
+        calls: 도구 호출 목록 (형태는 run_one이 해석)
+        run_one: 호출 하나를 실행하고 tool 메시지를 반환하는 코루틴 함수
+        call_id: 호출에서 tool_call_id를 꺼내는 함수 (오류 메시지용)
+        max_parallel: 동시 실행 수
+    """
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def run_guarded(idx: int, call: Any) -> Tuple[int, Dict[str, Any]]:
+        async with semaphore:
+            try:
+                return idx, await run_one(call)
+            except Exception as e:
+                logger.error(f"❌ [ToolRunner] 도구 호출 {idx + 1}/{len(calls)} 실패: {e}", exc_info=True)
+                return idx, tool_error_message(call_id(call), e)
+
+    tasks = [asyncio.ensure_future(run_guarded(idx, call)) for idx, call in enumerate(calls)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # 소비자가 중간에 멈춘 경우(클라이언트 연결 종료 등) 남은 호출이 방치되지 않도록 취소
+        for task in tasks:
+            task.cancel()
+
+
+async def run_concurrent_tool_calls(
+    calls: List[Any],
+    run_one: Callable[[Any], Awaitable[Dict[str, Any]]],
+    call_id: Callable[[Any], Optional[str]],
+    max_parallel: int = 4
+) -> List[Dict[str, Any]]:
+    """도구 호출들을 동시에 실행하고 tool 메시지를 호출 순서대로 반환합니다. (인자는 iter_concurrent_tool_calls와 같음)"""
+    messages: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+    async for idx, message in iter_concurrent_tool_calls(calls, run_one, call_id, max_parallel):
+        messages[idx] = message
+    return messages
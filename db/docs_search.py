@@ -0,0 +1,349 @@
+"""
+docs_search.py - documents 테이블 전문 검색(FTS5) 공용 모듈
+
+mcp_data.db의 documents 테이블에 대한 FTS5 인덱스를 만들고 검색합니다.
+mcp_server/mcp_tools.py, agent_native/native_tools.py, agent_native_loop/native_loop_tools.py가
+같은 DB를 바라보므로 스키마와 검색 로직을 이 모듈 하나로 공유합니다.
+
+[한국어 토크나이징]
+한국어는 조사가 단어에 붙어 있어(예: "휴가는", "유급휴가") 공백 기준 토크나이저로는 부분 일치가 되지 않습니다.
+그래서 문자 n-gram 기반의 trigram 토크나이저를 사용합니다. 다만 trigram은 3글자 미만 검색어를
+MATCH로 찾을 수 없으므로, 짧은 검색어("휴가", "보안" 등)가 포함되면 bigram 인덱스로 검색합니다.
+
+bigram 인덱스(documents_bigram_fts)는 단어마다 2글자 조각과 마지막 1글자를 공백으로 이어 저장한
+unicode61 FTS5 테이블입니다. ("유급휴가" → "유급 급휴 휴가 가")
+검색어는 bigram 구문으로 바꿔 찾으므로(1글자는 접두어 검색) 단어 안의 부분 일치가 인덱스로 처리됩니다.
+조각 분리는 Python에서 하므로 트리거로 동기화할 수 없어, 데이터를 넣는 쪽(init_mcp_db, mcp_tools 초기화)이
+sync_bigram_index()로 재구축하고 그때의 documents 데이터 버전(table_versions)을 기록합니다.
+검색은 읽기만 하며, 기록된 버전이 현재 버전과 다르거나(재구축 전 변경) FTS5를 지원하지 않으면 LIKE 검색으로 대체합니다.
+"""
+
+import re
+import sqlite3
+import logging
+from typing import Dict, Any, List, Optional
+
+from table_versions import get_table_versions
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "documents_fts"
+
+# trigram 토크나이저가 인덱싱할 수 있는 최소 검색어 길이
+MIN_FTS_TERM_LENGTH = 3
+
+# 짧은 검색어용 bigram 인덱스와 재구축 시점의 documents 버전을 기록하는 상태 테이블
+BIGRAM_TABLE = "documents_bigram_fts"
+BIGRAM_STATE_TABLE = "documents_bigram_state"
+
+# unicode61 토크나이저가 토큰으로 취급하는 문자 (밑줄은 구분자이므로 제외)
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+# 검색 결과 하이라이트 표시 (LLM이 마크다운으로 읽을 수 있도록 굵게 표시)
+HIGHLIGHT_OPEN = "**"
+HIGHLIGHT_CLOSE = "**"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_TOKENS = 32
+
+# 외부 콘텐츠(external content) 방식: 본문은 documents에만 저장하고 FTS 테이블은 인덱스만 보관
+FTS_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title,
+        content,
+        category UNINDEXED,
+        content='documents',
+        content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    # documents 변경 시 인덱스를 자동으로 동기화하는 트리거
+    f"""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_ai AFTER INSERT ON documents BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content, category)
+        VALUES (new.id, new.title, new.content, new.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_ad AFTER DELETE ON documents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, category)
+        VALUES ('delete', old.id, old.title, old.content, old.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_au AFTER UPDATE ON documents BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, category)
+        VALUES ('delete', old.id, old.title, old.content, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, title, content, category)
+        VALUES (new.id, new.title, new.content, new.category);
+    END
+    """,
+]
+
+# bigram 인덱스는 조각 텍스트를 직접 저장 (rowid = documents.id)
+BIGRAM_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {BIGRAM_TABLE} USING fts5(
+        title,
+        content,
+        tokenize='unicode61'
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {BIGRAM_STATE_TABLE} (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        documents_version INTEGER NOT NULL
+    )
+    """,
+]
+
+
+def ensure_docs_fts(conn: sqlite3.Connection) -> bool:
+    """
+    FTS5 인덱스와 동기화 트리거를 생성합니다. (documents 테이블이 이미 있어야 함)
+
+    인덱스를 새로 만든 경우 기존 documents 내용으로 한 번 재구축합니다.
+    짧은 검색어용 bigram 인덱스 테이블도 함께 만들며, 내용은 sync_bigram_index()가 채웁니다.
+    SQLite가 FTS5/trigram을 지원하지 않으면 False를 반환하며, 검색은 LIKE로 동작합니다.
+
+    Args:
+        conn: documents 테이블이 있는 DB 연결
+
+    Returns:
+        bool: FTS 인덱스 사용 가능 여부
+    """
+    existed = has_docs_fts(conn)
+    try:
+        for ddl in FTS_SCHEMA + BIGRAM_SCHEMA:
+            conn.execute(ddl)
+        if not existed:
+            conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            logger.info(f"[DocsSearch] FTS 인덱스 생성 및 재구축 완료: {FTS_TABLE}")
+        conn.commit()
+        return True
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        logger.warning(f"[DocsSearch] FTS5(trigram) 미지원, LIKE 검색으로 대체합니다: {e}")
+        return False
+
+
+def has_docs_fts(conn: sqlite3.Connection, table: str = FTS_TABLE) -> bool:
+    """FTS 인덱스 테이블 존재 여부"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (table,)
+    ).fetchone()
+    return row is not None
+
+
+def search_documents(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int = 10,
+    offset: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    documents를 검색하여 관련도 순으로 반환합니다.
+
+    모든 검색어가 3글자 이상이고 FTS 인덱스가 있으면 BM25 순위(제목 가중치 2배)와
+    하이라이트된 snippet을 반환합니다. 짧은 검색어가 있으면 bigram 인덱스로 같은 방식의
+    BM25 검색을 하고, 인덱스를 쓸 수 없으면 LIKE 검색으로 대체합니다.
+    여러 검색어는 OR 조건으로 결합됩니다.
+
+    Args:
+        conn: mcp_data.db 연결
+        query: 검색어 (공백으로 여러 단어 구분)
+        limit: 최대 결과 수
+        offset: 건너뛸 결과 수 (페이지네이션)
+
+    Returns:
+        List[Dict]: id, title, content, category, snippet, score를 포함한 결과 목록
+    """
+    terms = query.split()
+    if not terms:
+        return []
+
+    if all(len(t) >= MIN_FTS_TERM_LENGTH for t in terms) and has_docs_fts(conn):
+        return _search_fts(conn, terms, limit, offset)
+    # 단어 문자로만 된 검색어는 bigram 구문으로 바꿀 수 있음 (기호가 섞이면 LIKE)
+    if all(WORD_PATTERN.fullmatch(t) for t in terms) and _bigram_index_ready(conn):
+        return _search_bigram(conn, terms, limit, offset)
+    return _search_like(conn, terms, limit, offset)
+
+
+def _search_fts(conn: sqlite3.Connection, terms: List[str], limit: int, offset: int) -> List[Dict[str, Any]]:
+    """FTS5 MATCH + BM25 순위 검색"""
+    # 각 검색어를 구문(phrase)으로 감싸 FTS 쿼리 문법 문자(", *, - 등)를 무력화
+    match_expr = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+    cursor = conn.execute(f"""
+        SELECT rowid, title, content, category,
+               snippet({FTS_TABLE}, 1, ?, ?, ?, ?),
+               bm25({FTS_TABLE}, 2.0, 1.0, 0.0) AS score
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH ?
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    """, (HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, SNIPPET_ELLIPSIS, SNIPPET_TOKENS, match_expr, limit, offset))
+
+    return [
+        {
+            "id": row[0],
+            "title": row[1],
+            "content": row[2],
+            "category": row[3],
+            "snippet": row[4],
+            # bm25()는 관련도가 높을수록 작은(음수) 값이므로 부호를 뒤집어 반환
+            "score": round(-row[5], 4)
+        }
+        for row in cursor.fetchall()
+    ]
+
+
+def _to_bigrams(text: Optional[str]) -> str:
+    """단어별 2글자 조각 + 마지막 1글자 (1글자 단어는 그대로)"""
+    tokens: List[str] = []
+    for word in WORD_PATTERN.findall((text or "").lower()):
+        tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        tokens.append(word[-1])
+    return " ".join(tokens)
+
+
+def sync_bigram_index(conn: sqlite3.Connection) -> bool:
+    """
+    documents 버전이 마지막 재구축 때와 다르면 bigram 인덱스를 다시 만듭니다.
+
+    documents에 데이터를 넣은 뒤, ensure_table_versions() 이후에 한 곳(단일 writer)에서 호출합니다.
+    검색 경로(search_documents)에서는 호출하지 않습니다.
+
+    Returns:
+        bool: bigram 인덱스 사용 가능 여부 (인덱스 또는 버전 정보가 없으면 False)
+    """
+    if not has_docs_fts(conn, BIGRAM_TABLE):
+        return False
+    if _bigram_index_ready(conn):
+        return True
+    try:
+        # 쓰기 잠금을 잡은 뒤 버전과 문서를 읽어야 재구축 중 바뀐 내용이 누락되지 않음
+        conn.execute(f"DELETE FROM {BIGRAM_TABLE}")
+        version = get_table_versions(conn).get("documents")
+        if version is None:
+            conn.rollback()
+            return False
+        docs = conn.execute("SELECT id, title, content FROM documents").fetchall()
+        conn.executemany(
+            f"INSERT INTO {BIGRAM_TABLE}(rowid, title, content) VALUES (?, ?, ?)",
+            [(doc_id, _to_bigrams(title), _to_bigrams(content)) for doc_id, title, content in docs]
+        )
+        conn.execute(
+            f"INSERT OR REPLACE INTO {BIGRAM_STATE_TABLE} (id, documents_version) VALUES (1, ?)",
+            (version,)
+        )
+        conn.commit()
+        logger.info(f"[DocsSearch] bigram 인덱스 재구축 완료: {len(docs)}건 (documents 버전 {version})")
+        return True
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        logger.warning(f"[DocsSearch] bigram 인덱스 재구축 실패, LIKE 검색으로 대체합니다: {e}")
+        return False
+
+
+def _bigram_index_ready(conn: sqlite3.Connection) -> bool:
+    """bigram 인덱스가 현재 documents 버전으로 재구축되어 있는지 (읽기 전용)"""
+    if not has_docs_fts(conn, BIGRAM_TABLE):
+        return False
+    version = get_table_versions(conn).get("documents")
+    try:
+        row = conn.execute(f"SELECT documents_version FROM {BIGRAM_STATE_TABLE} WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return False
+    if version is None or row is None or row[0] != version:
+        logger.debug("[DocsSearch] bigram 인덱스가 최신이 아니어서 LIKE 검색으로 대체합니다")
+        return False
+    return True
+
+
+def _search_bigram(conn: sqlite3.Connection, terms: List[str], limit: int, offset: int) -> List[Dict[str, Any]]:
+    """짧은 검색어를 위한 bigram 인덱스 BM25 검색 (인덱스에 원문이 없으므로 snippet은 직접 생성)"""
+    phrases = []
+    for t in terms:
+        t = t.lower()
+        if len(t) == 1:
+            # 1글자는 그 글자로 시작하는 조각(또는 단어 끝 글자)을 접두어로 검색
+            phrases.append(f'"{t}"*')
+        else:
+            # 연속된 조각의 구문 일치 = 한 단어 안의 부분 문자열 일치
+            phrases.append('"' + " ".join(t[i:i + 2] for i in range(len(t) - 1)) + '"')
+    cursor = conn.execute(f"""
+        SELECT d.id, d.title, d.content, d.category,
+               bm25({BIGRAM_TABLE}, 2.0, 1.0) AS score
+        FROM {BIGRAM_TABLE}
+        JOIN documents d ON d.id = {BIGRAM_TABLE}.rowid
+        WHERE {BIGRAM_TABLE} MATCH ?
+        ORDER BY score, d.id
+        LIMIT ? OFFSET ?
+    """, (" OR ".join(phrases), limit, offset))
+
+    return [
+        {
+            "id": row[0],
+            "title": row[1],
+            "content": row[2],
+            "category": row[3],
+            "snippet": _make_snippet(row[2], terms),
+            "score": round(-row[4], 4)
+        }
+        for row in cursor.fetchall()
+    ]
+
+
+def _search_like(conn: sqlite3.Connection, terms: List[str], limit: int, offset: int) -> List[Dict[str, Any]]:
+    """기호가 섞인 짧은 검색어, 재구축 전의 bigram 인덱스 또는 FTS 미지원 환경을 위한 LIKE 검색"""
+    conditions = " OR ".join(["title LIKE ? OR content LIKE ?"] * len(terms))
+    params: List[Any] = []
+    for t in terms:
+        params.extend([f"%{t}%", f"%{t}%"])
+
+    # 점수를 SQL에서 계산하여 LIMIT/OFFSET 전에 정렬해야 페이지 간 관련도 순서가 유지됨
+    # (제목 일치를 본문 일치보다 2배로 평가하는 출현 횟수 점수, 동점이면 id 순)
+    occurrences = "(length(lower({col})) - length(replace(lower({col}), ?, ''))) / length(?)"
+    score_expr = " + ".join(
+        f"{occurrences.format(col='title')} * 2 + {occurrences.format(col='content')}" for _ in terms
+    )
+    score_params: List[Any] = []
+    for t in terms:
+        score_params.extend([t.lower(), t.lower(), t.lower(), t.lower()])
+
+    cursor = conn.execute(f"""
+        SELECT id, title, content, category, {score_expr} AS score
+        FROM documents
+        WHERE {conditions}
+        ORDER BY score DESC, id
+        LIMIT ? OFFSET ?
+    """, (*score_params, *params, limit, offset))
+
+    return [
+        {
+            "id": row[0],
+            "title": row[1],
+            "content": row[2],
+            "category": row[3],
+            "snippet": _make_snippet(row[2], terms),
+            "score": float(row[4])
+        }
+        for row in cursor.fetchall()
+    ]
+
+
+def _make_snippet(text: str, terms: List[str], width: int = 40) -> str:
+    """첫 번째 일치 위치 주변을 잘라 검색어를 하이라이트합니다."""
+    positions = [text.find(t) for t in terms if t in text]
+    if not positions:
+        return text[:width * 2] + (SNIPPET_ELLIPSIS if len(text) > width * 2 else "")
+
+    pos = min(positions)
+    start = max(0, pos - width)
+    end = min(len(text), pos + width)
+    snippet = text[start:end]
+    for t in terms:
+        snippet = snippet.replace(t, f"{HIGHLIGHT_OPEN}{t}{HIGHLIGHT_CLOSE}")
+    return (SNIPPET_ELLIPSIS if start > 0 else "") + snippet + (SNIPPET_ELLIPSIS if end < len(text) else "")
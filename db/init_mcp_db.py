@@ -5,6 +5,8 @@ import sys
 
 # 현재 디렉토리 경로 추가
 sys.path.append(str(Path(__file__).parent))
+from docs_search import ensure_docs_fts, sync_bigram_index
+from table_versions import ensure_table_versions, bump_table_versions
 
 # DB 경로 설정
 DB_PATH = Path(__file__).parent / "mcp_data.db"
@@ -15,7 +17,10 @@ def init_mcp_db():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    # 1. 테이블 삭제 (초기화용)
+    # 1. 테이블 삭제 (초기화용, FTS 인덱스 포함 - 트리거는 documents와 함께 삭제됨)
+    cursor.execute("DROP TABLE IF EXISTS documents_fts")
+    cursor.execute("DROP TABLE IF EXISTS documents_bigram_fts")
+    cursor.execute("DROP TABLE IF EXISTS documents_bigram_state")
     cursor.execute("DROP TABLE IF EXISTS documents")
     cursor.execute("DROP TABLE IF EXISTS employees")
     cursor.execute("DROP TABLE IF EXISTS vacations")
@@ -76,6 +81,17 @@ def init_mcp_db():
     cursor.executemany("INSERT INTO vacations (employee_id, year, total_days, used_days) VALUES (?, ?, ?, ?)", sample_vacations)
     
     conn.commit()
+    
+    # 4. 문서 전문 검색(FTS5) 인덱스 생성
+    if ensure_docs_fts(conn):
+        print("🔎 문서 전문 검색 인덱스 생성 완료")
+    
+    # 5. 데이터 버전 트리거 (도구 결과 캐시 무효화용)
+    ensure_table_versions(conn)
+    # DROP으로 트리거가 사라진 상태에서 다시 넣은 데이터는 버전에 반영되지 않았으므로 직접 올림
+    bump_table_versions(conn)
+    # 짧은 검색어용 bigram 인덱스는 올린 버전으로 재구축 (검색 경로에서는 재구축하지 않음)
+    sync_bigram_index(conn)
     conn.close()
     print("✅ MCP 데이터베이스 초기화 및 샘플 데이터 주입 완료!")
 
@@ -0,0 +1,168 @@
+"""
+log_sink.py - agent_logs 테이블 비동기 배치 기록 공용 모듈
+
+에이전트 서버(agent_proxy, agent_native, agent_native_loop)와 MCP 클라이언트는 요청 하나를 처리하면서
+여러 번 활동 로그를 남깁니다. 매번 연결을 열고 INSERT + COMMIT 하면 이벤트 루프가 디스크 I/O에 묶이므로,
+로그는 메모리 큐에 넣기만 하고 전용 스레드가 모아서 한 트랜잭션(executemany)으로 기록합니다.
+
+[큐가 가득 찬 경우 정책]
+- "drop":  새 로그를 버리고 dropped 카운터만 증가 (요청 경로를 절대 막지 않음, 기본값)
+- "block": block_timeout 초까지 빈 자리를 기다린 뒤에도 가득 차 있으면 버림
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+POLICY_DROP = "drop"
+POLICY_BLOCK = "block"
+
+# 종료 신호 (큐에 넣으면 남은 로그를 기록하고 스레드 종료)
+_STOP = object()
+
+LogRow = Tuple[str, str, str, Optional[str]]
+
+
+class AgentLogSink:
+    """agent_logs 테이블 배치 기록기 (스레드 안전, 이벤트 루프 불필요)"""
+
+    def __init__(
+        self,
+        db_path: Union[str, Path],
+        queue_maxsize: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        policy: str = POLICY_DROP,
+        block_timeout: float = 0.05
+    ):
+        if policy not in (POLICY_DROP, POLICY_BLOCK):
+            raise ValueError(f"지원하지 않는 정책: {policy}")
+        self.db_path = str(db_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+
+    def write(self, request_id: str, message: str, details: Optional[str] = None) -> bool:
+        """
+        로그 한 건을 큐에 넣습니다. DB에는 백그라운드 스레드가 기록합니다.
+
+        Returns:
+            bool: 큐에 들어갔으면 True, 정책에 따라 버려졌으면 False
+        """
+        self.start()
+        # 기록 시점이 아니라 발생 시점의 시각을 남김 (CURRENT_TIMESTAMP와 같은 UTC 형식)
+        row = (time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()), request_id, message, details)
+        try:
+            if self.policy == POLICY_BLOCK:
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            if self.stats["dropped"] % 1000 == 1:
+                logger.warning(f"⚠️ [LogSink] 로그 큐 포화로 로그 폐기 (누적 {self.stats['dropped']}건)")
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    def start(self) -> None:
+        """기록 스레드 시작 (첫 write 시 자동 호출)"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="agent-log-sink", daemon=True)
+                self._thread.start()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """남은 로그를 모두 기록하고 스레드를 종료합니다."""
+        if self._thread is None:
+            return
+        # 종료 신호는 정책과 무관하게 반드시 전달
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "queue_depth": self._queue.qsize(), "policy": self.policy}
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                batch, stop = self._next_batch()
+                if batch:
+                    self._flush(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            # WAL: 기록 중에도 다른 연결의 읽기를 막지 않음
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"⚠️ [LogSink] PRAGMA 설정 실패: {e}")
+        return conn
+
+    def _next_batch(self) -> Tuple[List[LogRow], bool]:
+        """첫 로그를 기다린 뒤 flush_interval 동안 batch_size까지 모읍니다."""
+        batch: List[LogRow] = []
+        item = self._queue.get()
+        if item is _STOP:
+            return batch, True
+        batch.append(item)
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _flush(self, conn: sqlite3.Connection, batch: List[LogRow]):
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO agent_logs (timestamp, request_id, message, details) VALUES (?, ?, ?, ?)",
+                    batch
+                )
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"⚠️ [LogSink] DB 로그 배치 저장 실패 ({len(batch)}건): {e}")
+
+
+def create_log_sink(db_path: Union[str, Path], sink_config: Optional[Dict[str, Any]] = None) -> AgentLogSink:
+    """설정(logging.db_sink)으로 AgentLogSink 생성"""
+    sink_config = sink_config or {}
+    return AgentLogSink(
+        db_path,
+        queue_maxsize=sink_config.get("queue_maxsize", 10000),
+        batch_size=sink_config.get("batch_size", 200),
+        flush_interval=sink_config.get("flush_interval", 0.5),
+        policy=sink_config.get("policy", POLICY_DROP),
+        block_timeout=sink_config.get("block_timeout", 0.05)
+    )
@@ -0,0 +1,67 @@
+"""
+table_versions.py - 테이블별 데이터 버전 카운터 공용 모듈
+
+테이블에 INSERT/UPDATE/DELETE가 일어날 때마다 트리거가 table_versions의 version을 1 올립니다.
+도구 결과 캐시(mcp_server/mcp_tools.py)는 캐시 키에 관련 테이블의 버전을 포함하므로,
+데이터가 바뀌면 이전 결과는 더 이상 적중하지 않습니다. (DB를 직접 수정해도 동일하게 동작)
+"""
+
+import sqlite3
+import logging
+from typing import Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLE = "table_versions"
+
+# 버전을 추적할 테이블 (mcp_data.db)
+TRACKED_TABLES = ("documents", "employees", "vacations")
+
+
+def ensure_table_versions(conn: sqlite3.Connection, tables: Iterable[str] = TRACKED_TABLES) -> None:
+    """
+    버전 테이블과 테이블별 변경 트리거를 생성합니다. (대상 테이블이 이미 있어야 함)
+
+    Args:
+        conn: 대상 테이블이 있는 DB 연결
+        tables: 버전을 추적할 테이블 이름 목록
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table in tables:
+        conn.execute(f"INSERT OR IGNORE INTO {VERSION_TABLE} (name, version) VALUES (?, 0)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            # 문장 단위가 아닌 행 단위 트리거이지만, 캐시 무효화에는 '바뀌었는지'만 중요함
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE {VERSION_TABLE} SET version = version + 1 WHERE name = '{table}';
+                END
+            """)
+    conn.commit()
+    logger.info(f"[TableVersions] 데이터 버전 트리거 준비 완료: {', '.join(tables)}")
+
+
+def bump_table_versions(conn: sqlite3.Connection, tables: Iterable[str] = TRACKED_TABLES) -> None:
+    """
+    테이블 버전을 강제로 1 올립니다.
+
+    테이블을 DROP하면 버전 트리거도 함께 삭제되므로, 다시 만들고 데이터를 넣는 동안에는 버전이 오르지 않습니다.
+    재초기화(init_mcp_db) 뒤에 호출해야 실행 중인 MCP 서버가 이전 데이터의 캐시 결과를 버립니다.
+    """
+    tables = list(tables)
+    conn.executemany(f"UPDATE {VERSION_TABLE} SET version = version + 1 WHERE name = ?", [(t,) for t in tables])
+    conn.commit()
+    logger.info(f"[TableVersions] 데이터 버전 갱신: {', '.join(tables)}")
+
+
+def get_table_versions(conn: sqlite3.Connection) -> Dict[str, int]:
+    """모든 추적 테이블의 현재 버전 (버전 테이블이 없으면 빈 dict)"""
+    try:
+        return dict(conn.execute(f"SELECT name, version FROM {VERSION_TABLE}").fetchall())
+    except sqlite3.OperationalError:
+        return {}
@@ -9,7 +9,9 @@ import json
 import logging
 import sys
 import uuid
+import time
 import asyncio
+from collections import deque
 from datetime import datetime
 from pathlib import Path
  # 현재 디렉토리 경로 추가
@@ -17,12 +19,16 @@ sys.path.append(str(Path(__file__).parent))
 from typing import Dict, Any, List, Optional, AsyncGenerator
 
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 
 # 로컬 모듈 임포트
-from mcp_tools import execute_tool, ensure_database
+from mcp_tools import execute_tool_async, ensure_database, close_connections, tool_result_cache
+# 공용 모듈(common/log_utils.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from log_utils import setup_logging, log_payload
 
 # 설정 경로
 CONFIG_PATH = Path(__file__).parent / "mcp_config" / "mcp_config.json"
@@ -40,11 +46,8 @@ def load_config():
 config = load_config()
 
 # 로깅 설정
-logging.basicConfig(
-    level=getattr(logging, config.get("logging", {}).get("level", "INFO")),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# 콘솔 출력은 QueueListener 스레드가 담당 (요청 경로에서 출력 I/O 제거)
+setup_logging(config.get("logging", {}))
 logger = logging.getLogger("mcp_hosts_sse")
 
 # ============================================================
@@ -52,16 +55,123 @@ logger = logging.getLogger("mcp_hosts_sse")
 # ============================================================
 # 🚀 MCP Engine (Singleton Background Task)
 # ============================================================
+# 같은 세션 안에서도 동시에 실행할 수 있는 메서드 (응답은 JSON-RPC id로 짝을 맞추므로 순서 무관)
+CONCURRENT_METHODS = ("tools/call",)
+
+
+class _SessionState:
+    """
+    세션별 대기열
+    - tools/call은 같은 세션의 다른 tools/call과 동시에 실행 (세션당 최대 max_concurrent개)
+    - 그 외 메서드(initialize, tools/list 등)는 순서 경계: 앞선 요청이 모두 끝난 뒤 단독 실행
+    - 대기열(backlog)에 요청이 있으면 새 요청도 그 뒤에 서므로 도착 순서를 추월하지 않음
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.backlog: deque = deque()  # 앞선 요청이 끝나기를 기다리는 요청
+        self.max_concurrent = max_concurrent
+        self.running = 0
+        self.exclusive = False  # 순서 경계 요청이 처리 중
+
+    def can_start(self, request_data: Dict[str, Any]) -> bool:
+        if self.exclusive:
+            return False
+        if request_data["payload"].get("method") in CONCURRENT_METHODS:
+            return self.running < self.max_concurrent
+        return self.running == 0
+
+    def start(self, request_data: Dict[str, Any]) -> None:
+        self.running += 1
+        if request_data["payload"].get("method") not in CONCURRENT_METHODS:
+            self.exclusive = True
+
+    def finish(self) -> None:
+        self.running -= 1
+        self.exclusive = False  # 경계 요청은 단독 실행이므로 끝나면 항상 해제
+
+
 class McpEngine:
-    def __init__(self):
-        self.input_queue = asyncio.Queue()
+    def __init__(
+        self,
+        num_workers: int = 4,
+        queue_maxsize: int = 100,
+        tool_threads: int = 8,
+        tool_timeout: Optional[float] = 30.0,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        session_concurrency: int = 4
+    ):
+        # 대기 중인 요청 수를 제한하여 과부하 시 /sse/message에서 429로 역압(backpressure)을 전달
+        self.queue_maxsize = queue_maxsize
+        # 바로 실행할 수 있는 요청만 들어가는 큐 (워커가 세션 순서를 기다리며 멈추지 않도록)
+        self.input_queue: asyncio.Queue = asyncio.Queue()
         self.sessions: Dict[str, asyncio.Queue] = {}
         self.is_running = False
+        self.num_workers = max(1, num_workers)
+        # 세션별 순서 보장: 앞선 요청이 처리 중이면 세션 대기열(backlog)에 두었다가 끝나면 이어서 투입
+        self.session_states: Dict[str, _SessionState] = {}
+        # 세션 하나에서 동시에 실행할 수 있는 tools/call 수 (한 세션이 워커를 모두 차지하지 않도록)
+        self.session_concurrency = max(1, session_concurrency)
+        self.worker_stats: Dict[int, Dict[str, Any]] = {}
+        # 동기 도구(sqlite 등)는 이벤트 루프 대신 전용 스레드 풀에서 실행
+        self.tool_executor = ThreadPoolExecutor(max_workers=tool_threads, thread_name_prefix="mcp-tool")
+        self.tool_timeout = tool_timeout
+        self.tool_timeouts = tool_timeouts or {}
 
     async def run(self):
-        """서버 시작 시 단 한 번 실행되는 메인 엔진 루프"""
+        """서버 시작 시 단 한 번 실행되며, 워커 풀을 띄우고 종료될 때까지 대기"""
         self.is_running = True
-        logger.info("⚙️ [Engine] MCP 엔진 루프 시작")
+        logger.info(f"⚙️ [Engine] MCP 엔진 시작 (워커 {self.num_workers}개, 큐 크기 {self.queue_maxsize})")
+        workers = [asyncio.create_task(self._worker(i)) for i in range(self.num_workers)]
+        await asyncio.gather(*workers)
+        logger.info("⚙️ [Engine] MCP 엔진 종료")
+
+    def submit(self, session_id: str, payload: Dict[str, Any]) -> None:
+        """
+        요청을 엔진에 넣습니다. (대기 중인 요청이 queue_maxsize 이상이면 asyncio.QueueFull)
+        await 없이 호출되므로 같은 세션의 요청은 도착 순서대로 세션 대기열에 들어갑니다.
+        """
+        if self.pending_count >= self.queue_maxsize:
+            raise asyncio.QueueFull
+        request_data = {"session_id": session_id, "payload": payload}
+        state = self.session_states.setdefault(session_id, _SessionState(self.session_concurrency))
+        if state.backlog or not state.can_start(request_data):
+            state.backlog.append(request_data)
+        else:
+            state.start(request_data)
+            self.input_queue.put_nowait(request_data)
+
+    def drop_session(self, session_id: str) -> None:
+        """연결이 끊긴 세션의 대기 요청 폐기 (처리 중인 요청은 끝까지 실행)"""
+        state = self.session_states.pop(session_id, None)
+        if state and state.backlog:
+            logger.info(f"⚙️ [Engine] 끊긴 세션의 대기 요청 {len(state.backlog)}건 폐기 (Session: {session_id})")
+
+    @property
+    def pending_count(self) -> int:
+        return self.input_queue.qsize() + sum(len(s.backlog) for s in self.session_states.values())
+
+    def _finish(self, session_id: str) -> None:
+        """요청 하나가 끝나면 같은 세션에서 이어서 실행할 수 있는 요청을 실행 큐로 옮김"""
+        state = self.session_states.get(session_id)
+        if state is None:
+            return  # 처리 중에 세션이 끊김
+        state.finish()
+        while state.backlog and state.can_start(state.backlog[0]):
+            request_data = state.backlog.popleft()
+            state.start(request_data)
+            self.input_queue.put_nowait(request_data)
+        if state.running == 0 and not state.backlog and session_id not in self.sessions:
+            self.session_states.pop(session_id, None)
+
+    async def _worker(self, worker_id: int):
+        """입력 큐를 소비하는 엔진 워커 루프"""
+        stats = self.worker_stats[worker_id] = {
+            "processed": 0,
+            "errors": 0,
+            "busy": False,
+            "current_method": None,
+            "total_seconds": 0.0
+        }
         
         while self.is_running:
             try:
@@ -70,37 +180,81 @@ class McpEngine:
                     request_data = await asyncio.wait_for(self.input_queue.get(), timeout=1.0)
                 except asyncio.TimeoutError:
                     continue
-                    
-                session_id = request_data.get("session_id")
-                payload = request_data.get("payload")
-                
-                method = payload.get("method")
-                request_id = payload.get("id")
-                
-                logger.info(f"⚙️ [Engine] 작업 처리 시작: {method} (Session: {session_id})")
-                
-                # 실제 도구 실행 또는 메서드 처리
-                result = await self.dispatch_method(method, payload.get("params", {}))
-                
-                response = {
-                    "jsonrpc": "2.0",
-                    "result": result,
-                    "id": request_id
-                }
                 
-                # 해당 세션의 출력 큐로 결과 전달
-                if session_id in self.sessions:
-                    await self.sessions[session_id].put(response)
-                    logger.info(f"⚙️ [Engine] 결과 전송 완료 (Session: {session_id})")
-                else:
-                    logger.warning(f"⚙️ [Engine] 세션을 찾을 수 없음: {session_id}")
-                
-                self.input_queue.task_done()
+                # 실행 큐에는 세션 순서상 바로 실행할 수 있는 요청만 있으므로 잠금 대기 없이 처리
+                try:
+                    await self._process(worker_id, stats, request_data)
+                finally:
+                    self.input_queue.task_done()
+                    self._finish(request_data.get("session_id"))
                 
             except Exception as e:
-                logger.error(f"⚙️ [Engine] 루프 에러: {e}")
+                stats["errors"] += 1
+                logger.error(f"⚙️ [Engine-{worker_id}] 루프 에러: {e}")
                 await asyncio.sleep(1)
 
+    async def _process(self, worker_id: int, stats: Dict[str, Any], request_data: Dict[str, Any]):
+        """단일 JSON-RPC 요청 처리 후 결과를 세션 출력 큐로 전달"""
+        session_id = request_data.get("session_id")
+        payload = request_data.get("payload")
+        
+        method = payload.get("method")
+        request_id = payload.get("id")
+        
+        logger.info(f"⚙️ [Engine-{worker_id}] 작업 처리 시작: {method} (Session: {session_id})")
+        stats["busy"] = True
+        stats["current_method"] = method
+        started = time.perf_counter()
+        try:
+            # 실제 도구 실행 또는 메서드 처리
+            result = await self.dispatch_method(method, payload.get("params", {}))
+        finally:
+            stats["busy"] = False
+            stats["current_method"] = None
+            stats["processed"] += 1
+            stats["total_seconds"] += time.perf_counter() - started
+        
+        response = {
+            "jsonrpc": "2.0",
+            "result": result,
+            "id": request_id
+        }
+        
+        # 해당 세션의 출력 큐로 결과 전달
+        if session_id in self.sessions:
+            await self.sessions[session_id].put(response)
+            logger.info(f"⚙️ [Engine-{worker_id}] 결과 전송 완료 (Session: {session_id})")
+        else:
+            logger.warning(f"⚙️ [Engine-{worker_id}] 세션을 찾을 수 없음: {session_id}")
+
+    async def broadcast_notification(self, method: str, params: Optional[Dict[str, Any]] = None):
+        """연결된 모든 세션에 JSON-RPC 알림(id 없음)을 전송합니다."""
+        notification = {"jsonrpc": "2.0", "method": method}
+        if params:
+            notification["params"] = params
+        for session_queue in list(self.sessions.values()):
+            await session_queue.put(notification)
+        logger.info(f"🔔 [Engine] 알림 전송: {method} ({len(self.sessions)}개 세션)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """엔진 큐 및 워커별 처리 지표"""
+        workers = []
+        for worker_id, stats in sorted(self.worker_stats.items()):
+            processed = stats["processed"]
+            workers.append({
+                "worker_id": worker_id,
+                **stats,
+                "avg_ms": round(stats["total_seconds"] / processed * 1000, 2) if processed else 0.0
+            })
+        return {
+            "running": self.is_running,
+            "queue_size": self.input_queue.qsize(),
+            "backlog_size": sum(len(s.backlog) for s in self.session_states.values()),
+            "queue_maxsize": self.queue_maxsize,
+            "sessions": len(self.sessions),
+            "workers": workers
+        }
+
     async def dispatch_method(self, method: str, params: Dict[str, Any]) -> Any:
         """비즈니스 로직 처리"""
         if method == "initialize":
@@ -117,22 +271,40 @@ class McpEngine:
         elif method == "tools/list":
             return {"tools": get_tool_definitions()}
         elif method == "tools/call":
-            raw_result = execute_tool(params.get("name"), params.get("arguments", {}))
+            tool_name = params.get("name")
+            meta: Dict[str, Any] = {}
+            raw_result = await execute_tool_async(
+                tool_name,
+                params.get("arguments", {}),
+                executor=self.tool_executor,
+                timeout=self.tool_timeouts.get(tool_name, self.tool_timeout),
+                meta=meta
+            )
             # [MCP 표준] 결과를 'content' 배열 내의 'text' 타입으로 포장합니다.
+            # 캐시 적중 여부는 _meta에 담아 클라이언트가 확인할 수 있게 합니다.
             return {
                 "content": [
                     {
                         "type": "text",
                         "text": json.dumps(raw_result, ensure_ascii=False, indent=2)
                     }
-                ]
+                ],
+                "_meta": meta
             }
         elif method == "notifications/initialized":
             return None # Notification은 결과가 필요 없음
         return {"error": "Method not found"}
 
 # 엔진 인스턴스 생성
-engine = McpEngine()
+engine_config = config.get("engine", {})
+engine = McpEngine(
+    num_workers=engine_config.get("workers", 4),
+    queue_maxsize=engine_config.get("queue_maxsize", 100),
+    tool_threads=engine_config.get("tool_threads", 8),
+    tool_timeout=engine_config.get("tool_timeout_seconds", 30.0),
+    tool_timeouts=engine_config.get("tool_timeouts", {}),
+    session_concurrency=engine_config.get("session_concurrency", 4)
+)
 
 # ============================================================
 # 📡 SSE Transport Layer
@@ -148,6 +320,8 @@ async def lifespan(app: FastAPI):
     # 종료 시 정리
     engine.is_running = False
     await task
+    engine.tool_executor.shutdown(wait=True, cancel_futures=True)
+    close_connections()
     logger.info("👋 MCP 서버 종료")
 
 app = FastAPI(
@@ -163,6 +337,22 @@ async def list_tools():
     """도구 목록 조회 (Discovery용)"""
     return {"tools": get_tool_definitions()}
 
+@app.post("/tools/notify")
+async def notify_tools_changed():
+    """도구 목록 변경을 연결된 클라이언트에 알림 (클라이언트는 도구 캐시를 무효화)"""
+    await engine.broadcast_notification("notifications/tools/list_changed")
+    return {"status": "notified", "sessions": len(engine.sessions)}
+
+@app.get("/engine/stats")
+async def engine_stats():
+    """엔진 큐 및 워커별 처리 지표 조회"""
+    return engine.get_stats()
+
+@app.get("/tools/cache/stats")
+async def tool_cache_stats():
+    """도구 결과 캐시 적중률 조회"""
+    return tool_result_cache.get_stats()
+
 @app.get("/sse")
 async def sse_connect(request: Request):
     """클라이언트의 SSE 연결 시도를 처리합니다."""
@@ -195,6 +385,7 @@ async def sse_connect(request: Request):
         finally:
             if session_id in engine.sessions:
                 del engine.sessions[session_id]
+            engine.drop_session(session_id)
             logger.info(f"📡 [SSE] 연결 종료 및 세션 정리: {session_id}")
 
     return StreamingResponse(
@@ -266,13 +457,18 @@ async def sse_message(request: Request):
         raise HTTPException(status_code=400, detail="Invalid JSON payload")
     
     logger.info(f"📨 [POST] 요청 수신: {payload.get('method')} (Session: {session_id})")
-    logger.debug(f"📨 [POST] 페이로드 상세: {json.dumps(payload, ensure_ascii=False)}")
+    log_payload(logger, logging.DEBUG, "📨 [POST] 페이로드 상세:", payload)
     
-    # 엔진 입력 큐에 작업 추가
-    await engine.input_queue.put({
-        "session_id": session_id,
-        "payload": payload
-    })
+    # 엔진에 작업 추가 (대기 요청이 가득 차면 대기하지 않고 즉시 429 반환)
+    try:
+        engine.submit(session_id, payload)
+    except asyncio.QueueFull:
+        logger.warning(f"📨 [POST] 엔진 큐 포화로 요청 거절 (Session: {session_id})")
+        raise HTTPException(
+            status_code=429,
+            detail="Engine queue is full",
+            headers={"Retry-After": str(engine_config.get("retry_after_seconds", 1))}
+        )
     
     return {"status": "accepted"}
 
@@ -284,7 +480,9 @@ def get_tool_definitions():
             "inputSchema": {
                 "type": "object",
                 "properties": {
-                    "query": {"type": "string", "description": "검색 키워드"}
+                    "query": {"type": "string", "description": "검색 키워드"},
+                    "limit": {"type": "integer", "description": "최대 결과 수 (기본: 10)"},
+                    "offset": {"type": "integer", "description": "건너뛸 결과 수 (기본: 0)"}
                 },
                 "required": ["query"]
             }
@@ -5,16 +5,29 @@ MCP 서버에서 호출 가능한 실제 도구(함수)들을 정의합니다.
 각 도구는 Void(MCP Client)를 통해 호출되어 실제 작업을 수행합니다.
 """
 
+import copy
 import json
 import sqlite3
+import asyncio
+import threading
+import time
+import inspect
+import functools
 import logging
+from collections import OrderedDict
 from pathlib import Path
 import sys
 
 # 현재 디렉토리 경로 추가
 sys.path.append(str(Path(__file__).parent))
+# 공용 DB 모듈(db/docs_search.py, db/table_versions.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "db"))
 from typing import Dict, Any, List, Optional
 from datetime import datetime, date
+from concurrent.futures import Executor
+
+from docs_search import ensure_docs_fts, sync_bigram_index, search_documents
+from table_versions import ensure_table_versions, get_table_versions
 
 logger = logging.getLogger(__name__)
 
@@ -34,14 +47,66 @@ config = load_config()
 # 데이터베이스 경로 (설정 파일 기반)
 DB_PATH = Path(__file__).parent / config["database"]["path"]
 
+# 스레드별 영속 연결 (도구 스레드 풀의 각 스레드가 자신의 연결을 재사용)
+_thread_local = threading.local()
+_connections: List[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    현재 스레드 전용 SQLite 연결을 반환합니다.
+    
+    스레드마다 처음 한 번만 연결을 열고 이후에는 재사용하므로, 호출마다 발생하던
+    connect 비용이 사라집니다. sqlite3 모듈의 statement 캐시(cached_statements)가
+    연결 단위로 유지되므로 같은 쿼리는 다시 컴파일되지 않습니다.
+    """
+    conn = getattr(_thread_local, "conn", None)
+    if conn is None:
+        db_cfg = config.get("database", {})
+        # 연결은 생성한 스레드에서만 사용하지만, 종료 시 메인 스레드에서 닫기 위해 check_same_thread=False
+        conn = sqlite3.connect(
+            DB_PATH,
+            check_same_thread=False,
+            cached_statements=db_cfg.get("cached_statements", 128)
+        )
+        conn.execute(f"PRAGMA mmap_size = {int(db_cfg.get('mmap_size', 268435456))}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        _thread_local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+        logger.debug(f"[Tools] 새 DB 연결 생성: {threading.current_thread().name}")
+    return conn
+
+
+def close_connections():
+    """열려 있는 모든 스레드별 연결을 닫습니다. (서버 종료 시 호출)"""
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"[Tools] DB 연결 종료 실패: {e}")
+        _connections.clear()
+    _thread_local.__dict__.clear()
+
 
 def ensure_database():
-    """데이터베이스 및 샘플 데이터 초기화"""
+    """
+    데이터베이스 및 샘플 데이터 초기화
+    
+    스키마 확인은 서버 시작 시(lifespan) 한 번만 수행하며, 도구 함수에서는 호출하지 않습니다.
+    """
     DB_PATH.parent.mkdir(exist_ok=True, parents=True)
     
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
+    # WAL 모드는 DB 파일에 영구 저장되므로 초기화 시 한 번만 설정
+    # (읽기 도구들이 쓰기 작업과 서로 막지 않고 동시에 실행될 수 있음)
+    journal_mode = config.get("database", {}).get("journal_mode", "WAL")
+    cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+    
     # 문서 테이블
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS documents (
@@ -111,6 +176,13 @@ def ensure_database():
         )
     
     conn.commit()
+    
+    # 문서 전문 검색 인덱스 (트리거로 documents와 자동 동기화)
+    ensure_docs_fts(conn)
+    # 테이블별 데이터 버전 트리거 (도구 결과 캐시 무효화용)
+    ensure_table_versions(conn)
+    # 짧은 검색어용 bigram 인덱스 (documents 버전이 바뀌었을 때만 재구축)
+    sync_bigram_index(conn)
     conn.close()
     logger.info(f"[Tools] 데이터베이스 초기화 완료: {DB_PATH}")
 
@@ -119,39 +191,22 @@ def ensure_database():
 # 도구 함수 정의
 # ============================================================
 
-def search_docs(query: str) -> Dict[str, Any]:
+def search_docs(query: str, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
     """
     회사 문서에서 정보를 검색합니다.
     
     Args:
         query: 검색할 키워드 또는 질문
+        limit: 최대 결과 수
+        offset: 건너뛸 결과 수 (페이지네이션)
         
     Returns:
-        Dict: 검색 결과
+        Dict: 검색 결과 (관련도 순, 하이라이트된 snippet 포함)
     """
-    logger.info(f"[Tools] search_docs 실행: query='{query}'")
-    
-    ensure_database()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    logger.info(f"[Tools] search_docs 실행: query='{query}', limit={limit}, offset={offset}")
     
-    # 키워드 검색 (제목 또는 내용에서)
-    cursor.execute("""
-        SELECT id, title, content, category 
-        FROM documents 
-        WHERE title LIKE ? OR content LIKE ?
-    """, (f"%{query}%", f"%{query}%"))
-    
-    results = []
-    for row in cursor.fetchall():
-        results.append({
-            "id": row[0],
-            "title": row[1],
-            "content": row[2],
-            "category": row[3]
-        })
-    
-    conn.close()
+    # FTS5(trigram) 인덱스 기반 BM25 검색 (짧은 검색어는 bigram 인덱스로 검색)
+    results = search_documents(get_connection(), query, limit=limit, offset=offset)
     
     logger.info(f"[Tools] search_docs 결과: {len(results)}건 발견")
     
@@ -159,6 +214,8 @@ def search_docs(query: str) -> Dict[str, Any]:
         "success": True,
         "query": query,
         "count": len(results),
+        "limit": limit,
+        "offset": offset,
         "results": results
     }
 
@@ -175,8 +232,7 @@ def get_employee_info(employee_id: str) -> Dict[str, Any]:
     """
     logger.info(f"[Tools] get_employee_info 실행: employee_id='{employee_id}'")
     
-    ensure_database()
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -186,7 +242,6 @@ def get_employee_info(employee_id: str) -> Dict[str, Any]:
     """, (employee_id,))
     
     row = cursor.fetchone()
-    conn.close()
     
     if row:
         # 근속 기간 계산
@@ -238,8 +293,7 @@ def calculate_vacation_days(
         
     logger.info(f"[Tools] calculate_vacation_days 실행: employee_id='{employee_id}', year={year}")
     
-    ensure_database()
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # 직원 정보 확인
@@ -247,7 +301,6 @@ def calculate_vacation_days(
     employee = cursor.fetchone()
     
     if not employee:
-        conn.close()
         logger.warning(f"[Tools] calculate_vacation_days: 직원을 찾을 수 없음")
         return {
             "success": False,
@@ -262,7 +315,6 @@ def calculate_vacation_days(
     """, (employee_id, year))
     
     vacation = cursor.fetchone()
-    conn.close()
     
     if vacation:
         total_days = vacation[0]
@@ -299,8 +351,7 @@ def get_all_employees() -> Dict[str, Any]:
     """
     logger.info(f"[Tools] get_all_employees 실행")
     
-    ensure_database()
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -309,7 +360,6 @@ def get_all_employees() -> Dict[str, Any]:
     """)
     
     rows = cursor.fetchall()
-    conn.close()
     
     employees = []
     for row in rows:
@@ -330,6 +380,9 @@ def get_all_employees() -> Dict[str, Any]:
 
 
 # 도구 레지스트리
+# 동기 함수와 async 함수(코루틴)를 모두 등록할 수 있습니다.
+# - 동기 도구: execute_tool_async에서 스레드 풀로 실행되어 이벤트 루프를 막지 않음
+# - async 도구: 이벤트 루프에서 직접 await (네트워크 I/O 등 네이티브 비동기 도구용)
 TOOL_REGISTRY: Dict[str, callable] = {
     "search_docs": search_docs,
     "get_employee_info": get_employee_info,
@@ -337,14 +390,158 @@ TOOL_REGISTRY: Dict[str, callable] = {
     "calculate_vacation_days": calculate_vacation_days,
 }
 
+# 도구별 결과 캐시 정책
+# - ttl: 결과 유지 시간(초)
+# - key_args: 캐시 키에 포함할 인자 (나머지 인자는 결과에 영향이 없는 것으로 간주)
+# - tables: 결과가 의존하는 테이블. 해당 테이블의 데이터 버전이 바뀌면 캐시가 적중하지 않음
+# - date_sensitive: 오늘 날짜에 따라 결과가 달라지는 도구 (근속 기간, 기본 연도 등)
+# 정책이 없거나 cacheable이 False인 도구는 항상 실행합니다.
+TOOL_CACHE_POLICIES: Dict[str, Dict[str, Any]] = {
+    "search_docs": {
+        "cacheable": True, "ttl": 300,
+        "key_args": ["query", "limit", "offset"], "tables": ["documents"]
+    },
+    "get_employee_info": {
+        "cacheable": True, "ttl": 300,
+        "key_args": ["employee_id"], "tables": ["employees"], "date_sensitive": True
+    },
+    "get_all_employees": {
+        "cacheable": True, "ttl": 300,
+        "key_args": [], "tables": ["employees"]
+    },
+    "calculate_vacation_days": {
+        "cacheable": True, "ttl": 120,
+        "key_args": ["employee_id", "year"], "tables": ["employees", "vacations"], "date_sensitive": True
+    },
+}
+
 
-def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+class ToolResultCache:
+    """
+    읽기 전용 도구 결과 LRU 캐시 (스레드 안전)
+
+    캐시 키 = 도구 이름 + key_args 값 + 의존 테이블의 데이터 버전 (+ 오늘 날짜)
+    데이터가 바뀌면 키가 달라지므로 별도의 삭제 없이 이전 결과는 적중하지 않고 LRU로 밀려납니다.
+    """
+
+    def __init__(self, max_entries: int = 512, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0}
+
+    def make_key(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        """캐시 대상이면 키를, 아니면 None을 반환"""
+        policy = TOOL_CACHE_POLICIES.get(tool_name)
+        if not self.enabled or not policy or not policy.get("cacheable"):
+            return None
+        versions = get_table_versions(get_connection())
+        material = {
+            "tool": tool_name,
+            "args": {k: arguments.get(k) for k in policy.get("key_args", [])},
+            "versions": {t: versions.get(t) for t in policy.get("tables", [])}
+        }
+        if policy.get("date_sensitive"):
+            material["date"] = date.today().isoformat()
+        return json.dumps(material, ensure_ascii=False, sort_keys=True)
+
+    def get(self, key: str) -> Optional[tuple]:
+        """(결과 사본, 저장 후 경과 초)를 반환하거나 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            stored_at, expires_at, result = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        return copy.deepcopy(result), time.monotonic() - stored_at
+
+    def put(self, tool_name: str, key: str, result: Dict[str, Any]) -> None:
+        """성공한 결과만 저장"""
+        if not isinstance(result, dict) or not result.get("success"):
+            return
+        now = time.monotonic()
+        ttl = TOOL_CACHE_POLICIES[tool_name].get("ttl", 60)
+        with self._lock:
+            self._entries[key] = (now, now + ttl, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+        }
+
+
+_cache_config = config.get("tool_cache", {})
+tool_result_cache = ToolResultCache(
+    max_entries=_cache_config.get("max_entries", 512),
+    enabled=_cache_config.get("enabled", True)
+)
+
+
+def _lookup_cache(tool_name: str, arguments: Dict[str, Any], meta: Optional[Dict[str, Any]]):
+    """캐시 조회. (캐시 키, 적중한 결과 또는 None)을 반환하고 meta에 캐시 상태를 기록"""
+    try:
+        key = tool_result_cache.make_key(tool_name, arguments)
+    except sqlite3.Error as e:
+        logger.warning(f"[Tools] 데이터 버전 조회 실패, 캐시 사용 안 함: {e}")
+        key = None
+    if key is None:
+        if meta is not None:
+            meta["cache"] = {"status": "bypass"}
+        return None, None
+
+    cached = tool_result_cache.get(key)
+    if cached is None:
+        if meta is not None:
+            meta["cache"] = {"status": "miss"}
+        return key, None
+
+    result, age = cached
+    logger.info(f"[Tools] 캐시 적중: {tool_name} ({age:.1f}초 전 결과)")
+    if meta is not None:
+        meta["cache"] = {"status": "hit", "age_seconds": round(age, 3)}
+    return key, result
+
+
+def _execute_with_cache(func, tool_name: str, arguments: Dict[str, Any], meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """동기 도구 실행 (스레드 풀에서 호출). 캐시 조회와 저장도 같은 스레드에서 수행"""
+    cache_key, cached = _lookup_cache(tool_name, arguments, meta)
+    if cached is not None:
+        return cached
+    result = func(**arguments)
+    if cache_key is not None:
+        tool_result_cache.put(tool_name, cache_key, result)
+    return result
+
+
+def execute_tool(tool_name: str, arguments: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
     """
     도구를 실행합니다.
     
     Args:
         tool_name: 실행할 도구 이름
         arguments: 도구에 전달할 인자
+        use_cache: False면 결과 캐시를 사용하지 않음
         
     Returns:
         Dict: 실행 결과
@@ -359,11 +556,92 @@ def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
             "error": f"알 수 없는 도구: {tool_name}"
         }
     
+    cache_key = None
+    if use_cache:
+        cache_key, cached = _lookup_cache(tool_name, arguments, None)
+        if cached is not None:
+            return cached
+    
+    try:
+        func = TOOL_REGISTRY[tool_name]
+        if inspect.iscoroutinefunction(func):
+            # CLI 등 이벤트 루프 밖에서 async 도구를 호출하는 경우
+            result = asyncio.run(func(**arguments))
+        else:
+            result = func(**arguments)
+        logger.info(f"[Tools] 도구 실행 완료: {tool_name}")
+        if cache_key is not None:
+            tool_result_cache.put(tool_name, cache_key, result)
+        return result
+        
+    except Exception as e:
+        logger.error(f"[Tools] 도구 실행 실패: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+async def execute_tool_async(
+    tool_name: str,
+    arguments: Dict[str, Any],
+    executor: Optional[Executor] = None,
+    timeout: Optional[float] = None,
+    meta: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    이벤트 루프를 막지 않고 도구를 실행합니다.
+    
+    Args:
+        tool_name: 실행할 도구 이름
+        arguments: 도구에 전달할 인자
+        executor: 동기 도구를 실행할 스레드 풀 (None이면 기본 executor)
+        timeout: 실행 제한 시간(초), None이면 무제한
+        meta: 전달하면 캐시 상태를 {"cache": {"status": "hit"|"miss"|"bypass", ...}} 형태로 기록
+        
+    Returns:
+        Dict: 실행 결과 (시간 초과 시 success=False)
+    """
+    logger.info(f"[Tools] 도구 비동기 실행 요청: {tool_name}")
+    logger.debug(f"[Tools] 인자: {json.dumps(arguments, ensure_ascii=False)}")
+    
+    if tool_name not in TOOL_REGISTRY:
+        logger.error(f"[Tools] 알 수 없는 도구: {tool_name}")
+        return {
+            "success": False,
+            "error": f"알 수 없는 도구: {tool_name}"
+        }
+    
+    func = TOOL_REGISTRY[tool_name]
+    loop = asyncio.get_running_loop()
     try:
-        result = TOOL_REGISTRY[tool_name](**arguments)
+        # 캐시 키에 필요한 데이터 버전 조회도 SQLite I/O이므로 이벤트 루프에서 하지 않음
+        if inspect.iscoroutinefunction(func):
+            cache_key, cached = await loop.run_in_executor(executor, _lookup_cache, tool_name, arguments, meta)
+            if cached is not None:
+                return cached
+            task = func(**arguments)
+        else:
+            # 동기 도구는 캐시 조회 → 실행 → 저장을 스레드 풀 호출 한 번으로 처리
+            cache_key = None
+            task = loop.run_in_executor(
+                executor, functools.partial(_execute_with_cache, func, tool_name, arguments, meta)
+            )
+        
+        # 시간 초과 시 대기 중인 Future를 취소합니다.
+        # (이미 스레드에서 실행 중인 동기 함수는 중단할 수 없으므로 결과만 버려집니다)
+        result = await asyncio.wait_for(task, timeout=timeout)
         logger.info(f"[Tools] 도구 실행 완료: {tool_name}")
+        if cache_key is not None:
+            tool_result_cache.put(tool_name, cache_key, result)
         return result
         
+    except asyncio.TimeoutError:
+        logger.error(f"[Tools] 도구 실행 시간 초과: {tool_name} ({timeout}초)")
+        return {
+            "success": False,
+            "error": f"도구 실행 시간 초과: {tool_name} ({timeout}초)"
+        }
     except Exception as e:
         logger.error(f"[Tools] 도구 실행 실패: {e}")
         return {
@@ -20,7 +20,7 @@ if str(current_dir) not in sys.path:
     sys.path.append(str(current_dir))
 
 try:
-    from mcp_tools import execute_tool, TOOL_REGISTRY
+    from mcp_tools import execute_tool, ensure_database, TOOL_REGISTRY
 except ImportError:
     # 만약 mcp_tools를 찾지 못하면, 상위 디렉토리(루트)에서 실행된 경우일 수 있음
     # 하지만 위에서 path를 추가했으므로 웬만하면 되어야 함.
@@ -50,6 +50,8 @@ def main():
         sys.exit(1)
 
     try:
+        # 서버 lifespan을 거치지 않으므로 스키마를 직접 준비
+        ensure_database()
         result = execute_tool(tool_name, args)
         # 결과 출력 (JSON으로 예쁘게)
         print(json.dumps(result, ensure_ascii=False, indent=2))
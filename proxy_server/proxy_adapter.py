@@ -14,14 +14,90 @@ import sys
 
 # 현재 디렉토리 경로 추가
 sys.path.append(str(Path(__file__).parent))
+# 공용 모듈(common/log_utils.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from log_utils import log_payload
 from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
+# 도구 호출만 있고 본문이 없을 때 쉘 명령어 앞에 붙일 문구
+TOOL_COMMANDS_PLACEHOLDER = "🛠️ 도구 실행을 준비했습니다:"
+
 # 프롬프트 설정 경로
 PROMPT_CONFIG_PATH = Path(__file__).parent / "proxy_config" / "prompt_config.json"
 
 
+class PromptHintCache:
+    """
+    prompt_config.json의 system_hint를 메모리에 캐시합니다.
+
+    - 파일 수정 시각(mtime)이 바뀔 때만 다시 읽으므로 재시작 없이 프롬프트를 바꿀 수 있습니다.
+    - {tool_names}를 채운 최종 힌트는 도구 이름 목록별로 메모이제이션합니다.
+    """
+
+    def __init__(self, path: Path, max_rendered: int = 128):
+        self.path = path
+        self.max_rendered = max_rendered
+        self._mtime: Optional[float] = None
+        self._template: Optional[str] = None
+        self._rendered: Dict[tuple, str] = {}
+        self.stats = {"loads": 0, "hits": 0, "misses": 0}
+
+    def get_hint(self, tool_names: List[str]) -> Optional[str]:
+        """
+        도구 이름 목록에 맞는 힌트 문자열을 반환합니다. 힌트가 비활성화되었거나 설정 파일이 없으면 None.
+        """
+        self._reload_if_changed()
+        if self._template is None:
+            return None
+
+        key = tuple(tool_names)
+        hint = self._rendered.get(key)
+        if hint is not None:
+            self.stats["hits"] += 1
+            return hint
+
+        self.stats["misses"] += 1
+        if len(self._rendered) >= self.max_rendered:
+            self._rendered.clear()
+        hint = self._template.replace("{tool_names}", ", ".join(tool_names))
+        self._rendered[key] = hint
+        return hint
+
+    def _reload_if_changed(self):
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            self._mtime, self._template = None, None
+            self._rendered.clear()
+            return
+        if mtime == self._mtime:
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                p_config = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            # 저장 도중의 깨진 JSON 등: 기존 힌트를 유지하고 다음 요청에서 다시 시도
+            logger.error(f"[Adapter] 프롬프트 설정 로드 중 에러 (기존 설정 유지): {e}")
+            return
+        hint_cfg = p_config.get("system_hint", {})
+        raw_hint = hint_cfg.get("content", "") if hint_cfg.get("enabled", False) else None
+        # 리스트 형식이면 개행문자로 합침, 문자열이면 그대로 사용
+        if isinstance(raw_hint, list):
+            raw_hint = "\n".join(raw_hint)
+
+        self._template = raw_hint
+        self._rendered.clear()
+        self._mtime = mtime
+        self.stats["loads"] += 1
+        logger.info(f"[Adapter] 프롬프트 설정 로드 (힌트 {'활성화' if raw_hint is not None else '비활성화'})")
+
+
+prompt_hint_cache = PromptHintCache(PROMPT_CONFIG_PATH)
+
+
 class OllamaAdapter:
     """Ollama API 규격 변환 어댑터"""
     
@@ -45,27 +121,16 @@ class OllamaAdapter:
             Dict: Ollama API 요청 형식
         """
         logger.info(f"[Adapter] OpenAI → Ollama(OpenAI) 변환 시작")
-        logger.debug(f"[Adapter] 원본 메시지: {json.dumps(messages, ensure_ascii=False, indent=2)}")
+        log_payload(logger, logging.DEBUG, "[Adapter] 원본 메시지:", messages)
         
         # [상세 코멘트: 설정 파일을 이용한 시스템 프롬프트 주입]
-        # 외부 prompt_config.json 파일을 로드하여 도구 사용 권장 힌트를 주입합니다.
+        # 외부 prompt_config.json 파일의 도구 사용 권장 힌트를 주입합니다. (mtime 기반 캐시)
         injected_messages = messages
-        if tools and PROMPT_CONFIG_PATH.exists():
+        if tools:
             try:
-                with open(PROMPT_CONFIG_PATH, "r", encoding="utf-8") as f:
-                    p_config = json.load(f)
-                
-                hint_cfg = p_config.get("system_hint", {})
-                if hint_cfg.get("enabled", False):
-                    tool_names = ", ".join([t.get('function', {}).get('name', 'tool') for t in tools])
-                    raw_hint = hint_cfg.get("content", "")
-                    
-                    # 리스트 형식이면 개행문자로 합침, 문자열이면 그대로 사용
-                    if isinstance(raw_hint, list):
-                        raw_hint = "\n".join(raw_hint)
-                        
-                    tool_hint = raw_hint.replace("{tool_names}", tool_names)
-                    
+                tool_names = [t.get('function', {}).get('name', 'tool') for t in tools]
+                tool_hint = prompt_hint_cache.get_hint(tool_names)
+                if tool_hint is not None:
                     # 새로운 메시지 리스트 생성 (기존 메시지 변경 방지)
                     new_messages = []
                     system_msg_found = False
@@ -96,12 +161,10 @@ class OllamaAdapter:
         # 도구가 있으면 추가
         if tools:
             ollama_request["tools"] = tools
-            # [상세 코멘트: 도구 추출을 위한 스트리밍 비활성화]
-            # Void IDE는 스트리밍 중에도 도구 호출이 텍스트로 오면 감지하지 못합니다.
-            # 8000번 프록시에서 텍스트 기반 도구 추출(Fallback)을 수행하려면 응답을 한 번에 다 받아야 하므로
-            # 도구 목록이 포함된 요청에서는 강제로 stream을 False로 설정합니다.
-            ollama_request["stream"] = False
-            logger.info(f"[Adapter] 도구 {len(tools)}개 포함됨 (텍스트 추출을 위해 스트리밍 비활성화)")
+            # [상세 코멘트: 도구 호출 추출과 스트리밍]
+            # 텍스트 기반 도구 추출(Fallback)은 스트리밍 중에도 StreamingToolCallExtractor가 점진적으로 수행하므로
+            # 도구 목록이 있어도 클라이언트가 요청한 stream 값을 그대로 유지합니다.
+            logger.info(f"[Adapter] 도구 {len(tools)}개 포함됨")
         
         logger.info(f"[Adapter] Ollama 요청 변환 완료")
         return ollama_request
@@ -121,8 +184,8 @@ class OllamaAdapter:
         """
         logger.info(f"[Adapter] Ollama → OpenAI 변환 시작")
         # [상세 코멘트: 원본 응답 확인]
-        # 모델이 실제로 보낸 '날것'의 응답을 확인하기 위해 로그 레벨을 INFO로 설정합니다.
-        logger.info(f"[Adapter] [RAW] Ollama 원본 응답: {json.dumps(ollama_response, ensure_ascii=False, indent=2)}")
+        # 모델이 실제로 보낸 '날것'의 응답은 DEBUG 레벨에서만 직렬화하여 남깁니다. (매 응답마다 직렬화 비용 방지)
+        log_payload(logger, logging.DEBUG, "[Adapter] [RAW] Ollama 원본 응답:", ollama_response)
         
         # [상세 코멘트: 응답 포맷 대응]
         # Ollama 네이티브 API는 'message'를 직접 반환하지만, 
@@ -194,20 +257,10 @@ class OllamaAdapter:
         if tool_calls:
             logger.info(f"[Adapter] 🔧 도구 호출을 쉘 명령어로 변환 (Plan B): {len(tool_calls)}건")
             
-            command_lines = []
-            for tool in tool_calls:
-                fn_name = tool["function"]["name"]
-                fn_args = tool["function"]["arguments"]
-                
-                # 인자 이스케이프 처리
-                escaped_args = fn_args.replace("'", "'\\''")
-                cmd = f"python mcp_server/mcp_tools_runner.py {fn_name} '{escaped_args}'"
-                command_lines.append(f"```bash\n{cmd}\n```")
-            
             # 본문에 쉘 명령어 추가
             # 이미 placeholder 텍스트가 있을 수 있으므로 체크
-            base_content = content if content else "🛠️ 도구 실행을 준비했습니다:"
-            openai_response["choices"][0]["message"]["content"] = base_content + "\n\n" + "\n".join(command_lines)
+            base_content = content if content else TOOL_COMMANDS_PLACEHOLDER
+            openai_response["choices"][0]["message"]["content"] = base_content + "\n\n" + OllamaAdapter.render_tool_commands(tool_calls)
             
             # 중요: 도구 호출 필드는 비웁니다. Void가 도구 호출 UI 대신 쉘 UI를 쓰도록 유도
             # openai_response["choices"][0]["message"]["tool_calls"] = tool_calls
@@ -219,6 +272,20 @@ class OllamaAdapter:
         logger.info(f"[Adapter] OpenAI 응답 변환 완료")
         return openai_response
 
+    @staticmethod
+    def render_tool_commands(tool_calls: List[Dict[str, Any]]) -> str:
+        """도구 호출 목록을 mcp_tools_runner.py 실행용 bash 코드 블록으로 변환 (Plan B)"""
+        command_lines = []
+        for tool in tool_calls:
+            fn_name = tool["function"]["name"]
+            fn_args = tool["function"]["arguments"]
+            
+            # 인자 이스케이프 처리
+            escaped_args = fn_args.replace("'", "'\\''")
+            cmd = f"python mcp_server/mcp_tools_runner.py {fn_name} '{escaped_args}'"
+            command_lines.append(f"```bash\n{cmd}\n```")
+        return "\n".join(command_lines)
+
     @staticmethod
     def _try_extract_json_tool_call(content: str) -> Optional[List[Dict[str, Any]]]:
         """
@@ -409,6 +476,187 @@ class OllamaAdapter:
         return tool_calls
 
 
+class StreamingToolCallExtractor:
+    """
+    [상세 코멘트: 스트리밍 응답의 점진적 도구 호출 추출]
+    비스트리밍 응답에서 하던 텍스트 기반 도구 추출(Fallback)을 스트리밍 청크 단위로 수행합니다.
+
+    - 일반 텍스트는 받는 즉시 그대로 흘려보냅니다.
+    - ```json 코드 블록이 시작되면 닫는 ``` 까지, 응답이 { 로 시작하면 끝까지 버퍼링합니다.
+      (청크 경계에 걸친 "```js" 같은 조각은 판단이 설 때까지 잠시 보류)
+    - 버퍼링한 JSON이 도구 호출이면 본문에서 제거하고, 아니면 원문 그대로 내보냅니다.
+    - 모델이 정식 tool_calls 델타를 보낸 경우에도 모아서 같은 방식으로 처리합니다.
+    - 응답이 끝나면 추출한 도구 호출을 mode에 따라 내보냅니다.
+      "plan_b": 비스트리밍 응답과 같은 mcp_tools_runner.py bash 코드 블록 (기본값)
+      "tool_calls": OpenAI 규격의 tool_calls 델타 청크 (finish_reason: tool_calls)
+    """
+
+    FENCE_OPEN = "```json"
+    FENCE_CLOSE = "```"
+
+    def __init__(self, mode: str = "plan_b"):
+        self.mode = mode
+        self.tool_calls: List[Dict[str, Any]] = []
+        self._header: Dict[str, Any] = {}
+        self._pending = ""           # 아직 내보낼지 판단하지 못한 텍스트
+        self._fence = None           # 버퍼링 중인 ```json 블록 (None이면 버퍼링 아님)
+        self._whole_json = False     # 응답 전체가 { 로 시작하여 끝까지 버퍼링 중
+        self._seen_text = False      # 공백이 아닌 텍스트를 받은 적이 있는지
+        self._emitted_text = False   # 본문을 내보낸 적이 있는지
+        self._native_calls: Dict[int, Dict[str, Any]] = {}
+        self._finish_reason = None
+
+    def feed(self, chunk: Dict[str, Any]) -> List[str]:
+        """
+        LLM 스트리밍 청크 하나를 처리하고 클라이언트로 보낼 SSE 문자열 목록을 반환합니다.
+        """
+        choices = chunk.get("choices", [])
+        if not choices:
+            return []
+        if not self._header:
+            self._header = {
+                "id": chunk.get("id", f"chatcmpl-{datetime.now().strftime('%Y%M%S%f')}"),
+                "object": "chat.completion.chunk",
+                "created": chunk.get("created"),
+                "model": chunk.get("model"),
+            }
+
+        choice = choices[0]
+        delta = dict(choice.get("delta") or {})
+        content = delta.pop("content", None) or ""
+        for tc in delta.pop("tool_calls", None) or []:
+            self._collect_native_call(tc)
+        if choice.get("finish_reason"):
+            # 마지막 청크는 finish()에서 도구 호출 결과와 함께 보냄
+            self._finish_reason = choice["finish_reason"]
+
+        out = []
+        text = self._consume(content)
+        if text or delta:
+            if text:
+                delta["content"] = text
+                self._emitted_text = True
+            out.append(self._make_chunk(delta, None))
+        return out
+
+    def finish(self) -> List[str]:
+        """스트림 종료 시 보류 중인 텍스트와 추출된 도구 호출, 종료 청크를 반환합니다."""
+        text = ""
+        if self._whole_json:
+            extracted = OllamaAdapter._try_extract_json_tool_call(self._pending)
+            if extracted:
+                self.tool_calls.extend(extracted)
+                logger.info(f"[Adapter] 💡 스트리밍 전체 텍스트에서 도구 호출 추출 완료")
+            else:
+                text = self._pending
+        else:
+            # 닫히지 않은 코드 블록이나 보류 중인 조각은 원문 그대로 내보냄
+            text = (self._fence or "") + self._pending
+        self._pending, self._fence = "", None
+
+        for idx in sorted(self._native_calls):
+            self.tool_calls.append(self._native_calls[idx])
+
+        out = []
+        if text:
+            self._emitted_text = True
+            out.append(self._make_chunk({"content": text}, None))
+
+        if not self.tool_calls:
+            out.append(self._make_chunk({}, self._finish_reason or "stop"))
+            return out
+
+        for idx, tc in enumerate(self.tool_calls):
+            tc["index"] = idx
+        if self.mode == "tool_calls":
+            out.append(self._make_chunk({"tool_calls": self.tool_calls}, None))
+            out.append(self._make_chunk({}, "tool_calls"))
+        else:
+            logger.info(f"[Adapter] 🔧 스트리밍 도구 호출을 쉘 명령어로 변환 (Plan B): {len(self.tool_calls)}건")
+            prefix = "\n\n" if self._emitted_text else TOOL_COMMANDS_PLACEHOLDER + "\n\n"
+            out.append(self._make_chunk({"content": prefix + OllamaAdapter.render_tool_commands(self.tool_calls)}, None))
+            out.append(self._make_chunk({}, "stop"))
+        return out
+
+    def _consume(self, content: str) -> str:
+        """새 텍스트를 받아 지금 내보내도 되는 부분만 반환합니다."""
+        if self._whole_json:
+            self._pending += content
+            return ""
+
+        self._pending += content
+        if not self._seen_text:
+            stripped = self._pending.lstrip()
+            if not stripped:
+                return ""
+            self._seen_text = True
+            if stripped.startswith("{"):
+                self._whole_json = True
+                return ""
+
+        released = []
+        while self._pending:
+            if self._fence is not None:
+                # 코드 블록 내부: 닫는 ``` 를 찾을 때까지 버퍼링
+                # (닫는 ``` 가 청크 경계에 걸칠 수 있으므로 버퍼 전체에서 찾음)
+                buffered = self._fence + self._pending
+                close = buffered.find(self.FENCE_CLOSE, len(self.FENCE_OPEN))
+                if close < 0:
+                    self._fence, self._pending = buffered, ""
+                    break
+                block = buffered[:close + len(self.FENCE_CLOSE)]
+                self._pending = buffered[close + len(self.FENCE_CLOSE):]
+                self._fence = None
+                extracted = OllamaAdapter._try_extract_json_tool_call(block)
+                if extracted:
+                    self.tool_calls.extend(extracted)
+                    logger.info(f"[Adapter] 💡 스트리밍 코드 블록에서 도구 호출 추출 완료")
+                else:
+                    released.append(block)
+                continue
+
+            start = self._pending.find(self.FENCE_OPEN)
+            if start >= 0:
+                released.append(self._pending[:start])
+                self._fence = self.FENCE_OPEN
+                self._pending = self._pending[start + len(self.FENCE_OPEN):]
+                continue
+
+            # 끝부분이 "```json"의 앞부분일 수 있으면 다음 청크까지 보류
+            hold = self._partial_fence_length(self._pending)
+            released.append(self._pending[:len(self._pending) - hold])
+            self._pending = self._pending[len(self._pending) - hold:]
+            break
+
+        return "".join(released)
+
+    def _partial_fence_length(self, text: str) -> int:
+        for n in range(min(len(self.FENCE_OPEN) - 1, len(text)), 0, -1):
+            if self.FENCE_OPEN.startswith(text[-n:]):
+                return n
+        return 0
+
+    def _collect_native_call(self, tc: Dict[str, Any]):
+        """정식 tool_calls 델타(인덱스별 조각)를 하나의 호출로 합칩니다."""
+        idx = tc.get("index", 0)
+        call = self._native_calls.setdefault(idx, {
+            "id": tc.get("id") or f"call_{idx}_{datetime.now().strftime('%M%S%f')}",
+            "type": "function",
+            "function": {"name": "", "arguments": ""}
+        })
+        func = tc.get("function") or {}
+        if func.get("name"):
+            call["function"]["name"] += func["name"]
+        if func.get("arguments"):
+            args = func["arguments"]
+            call["function"]["arguments"] += args if isinstance(args, str) else json.dumps(args, ensure_ascii=False)
+
+    def _make_chunk(self, delta: Dict[str, Any], finish_reason: Optional[str]) -> str:
+        chunk = dict(self._header)
+        chunk["choices"] = [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+
 class RequestValidator:
     """요청 유효성 검증 클래스"""
     
@@ -25,7 +25,12 @@ from contextlib import asynccontextmanager
 from pydantic import BaseModel
 
 # 로컬 모듈 임포트
-from proxy_adapter import OllamaAdapter, RequestValidator
+from proxy_adapter import OllamaAdapter, RequestValidator, StreamingToolCallExtractor
+# 공용 모듈(common/log_utils.py) 경로 추가
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from log_utils import setup_logging, log_payload
+from llm_gateway import create_llm_gateway
+from admission import setup_admission
 from inventory import get_inventory, ToolInventory
 
 # 설정 파일 로드
@@ -66,17 +71,19 @@ def load_config() -> Dict[str, Any]:
 config = load_config()
 
 # 로깅 설정
-logging.basicConfig(
-    level=getattr(logging, config["logging"]["level"]),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("proxy_server.log", encoding="utf-8")
-    ]
-)
+# 콘솔/파일 출력은 QueueListener 스레드가 담당 (요청 경로에서 디스크 I/O 제거)
+setup_logging(config["logging"], "proxy_server.log")
 logger = logging.getLogger("proxy_server")
 
 
+# ============================================================
+# 공유 LLM 게이트웨이 (프로세스 당 1개, 연결 풀 + 재시도 + 지표)
+# ============================================================
+# 요청마다 AsyncClient를 새로 열면 매번 TCP/TLS 연결을 다시 맺어야 하므로
+# 연결 풀을 유지하는 게이트웨이 하나를 모든 요청이 공유합니다.
+llm_gateway = create_llm_gateway(config)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """서버 시작 시 초기화 및 종료 시 정리"""
@@ -88,6 +95,8 @@ async def lifespan(app: FastAPI):
     logger.info(f"Database Path: {config.get('database', {}).get('path', 'Not Configured')}")
     logger.info("=" * 60)
     
+    logger.info(f"🔌 LLM 연결 풀 설정: {llm_gateway.get_stats()['limits']}")
+    
     # MCP 서버에서 도구 목록 가져오기
     inventory = get_inventory()
     try:
@@ -97,6 +106,7 @@ async def lifespan(app: FastAPI):
         logger.warning(f"⚠️ MCP 서버 연결 실패, 기본 도구 사용: {e}")
     
     yield
+    await llm_gateway.close()
     logger.info("👋 Proxy Server 종료")
 
 
@@ -108,6 +118,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 채팅 엔드포인트 입장 제어 (CORS보다 먼저 추가해야 거절 응답에도 CORS 헤더가 붙음, 비활성화면 None)
+admission = setup_admission(app, config.get("admission"), ["/v1/chat/completions"])
+
 # CORS 설정
 app.add_middleware(
     CORSMiddleware,
@@ -220,52 +233,63 @@ async def chat_completions(request: ChatRequest, raw_request: Request):
     
     logger.info(f"🔄 [REQ-{request_id}] LLM으로 요청 전송 중...")
     logger.debug(f"   URL: {config['llm']['base_url']}/chat/completions")
-    logger.debug(f"   요청: {json.dumps(ollama_request, ensure_ascii=False, indent=2)}")
+    log_payload(logger, logging.DEBUG, "   요청:", ollama_request)
     
     # Ollama API 호출
     try:
         if request.stream:
             async def stream_generator():
-                async with httpx.AsyncClient(timeout=config["llm"]["timeout"]) as client:
-                    llm_url = f"{config['llm']['base_url']}/chat/completions"
-                    headers = {}
-                    if config["llm"].get("api_key") and config["llm"]["api_key"] != "not-needed":
-                        headers["Authorization"] = f"Bearer {config['llm']['api_key']}"
-                        
-                    async with client.stream("POST", llm_url, json=ollama_request, headers=headers) as response:
-                        response.raise_for_status()
-                        async for line in response.aiter_lines():
-                            if not line:
-                                continue
-                            if line.startswith("data: "):
-                                data = line[6:]
-                                if data == "[DONE]":
-                                    break
-                                try:
-                                    chunk = json.loads(data)
-                                    converted_chunk = adapter.convert_chunk_from_ollama(chunk)
-                                    logger.debug(f"📡 [REQ-{request_id}] 스트리밍 청크 변환 완료")
+                # 도구가 포함된 요청은 텍스트 기반 도구 호출을 스트리밍 중에 점진적으로 추출
+                extractor = None
+                if tools:
+                    extractor = StreamingToolCallExtractor(
+                        mode=config.get("proxy", {}).get("stream_tool_call_mode", "plan_b")
+                    )
+                # 게이트웨이가 첫 줄을 받기 전의 연결 오류/5xx는 재시도
+                async for line in llm_gateway.stream_lines(ollama_request):
+                    if line.startswith("data: "):
+                        data = line[6:]
+                        if data == "[DONE]":
+                            break
+                        try:
+                            chunk = json.loads(data)
+                            if extractor:
+                                for converted_chunk in extractor.feed(chunk):
                                     yield converted_chunk
-                                except json.JSONDecodeError:
-                                    logger.error(f"❌ [REQ-{request_id}] 청크 파싱 실패: {data}")
-                                    continue
-                            else:
-                                logger.info(f"ℹ️ [REQ-{request_id}] 비-데이터 라인(Full JSON) 수신")
-                                try:
-                                    # Ollama가 stream: false로 응답하여 JSON 한 줄이 왔을 경우 처리
-                                    full_resp_raw = json.loads(line)
-                                    # 1. Ollama -> OpenAI Full Response 변환 (도구 추출 포함)
-                                    openai_full = adapter.convert_from_ollama_response(full_resp_raw)
-                                    # 2. OpenAI Full Response -> OpenAI Chunks 변환 (리스트 반환)
-                                    converted_chunks = adapter.convert_to_chunk_from_full_response(openai_full)
-                                    logger.info(f"📡 [REQ-{request_id}] 비-데이터 응답을 {len(converted_chunks)}개의 청크로 로 분할하여 전송합니다.")
-                                    for idx, chunk in enumerate(converted_chunks):
-                                        logger.debug(f"   청크[{idx}]: {chunk}")
-                                        yield chunk
-                                except Exception as e:
-                                    logger.error(f"❌ [REQ-{request_id}] 비-데이터 라인 처리 중 에러: {e}")
-                                    continue
+                                continue
+                            converted_chunk = adapter.convert_chunk_from_ollama(chunk)
+                            logger.debug(f"📡 [REQ-{request_id}] 스트리밍 청크 변환 완료")
+                            yield converted_chunk
+                        except json.JSONDecodeError:
+                            logger.error(f"❌ [REQ-{request_id}] 청크 파싱 실패: {data}")
+                            continue
+                    else:
+                        logger.info(f"ℹ️ [REQ-{request_id}] 비-데이터 라인(Full JSON) 수신")
+                        try:
+                            # Ollama가 stream: false로 응답하여 JSON 한 줄이 왔을 경우 처리
+                            full_resp_raw = json.loads(line)
+                            # 전체 응답은 아래에서 도구 추출까지 처리하므로 점진적 추출기는 사용하지 않음
+                            extractor = None
+                            # 1. Ollama -> OpenAI Full Response 변환 (도구 추출 포함)
+                            openai_full = adapter.convert_from_ollama_response(full_resp_raw)
+                            # 2. OpenAI Full Response -> OpenAI Chunks 변환 (리스트 반환)
+                            converted_chunks = adapter.convert_to_chunk_from_full_response(openai_full)
+                            logger.info(f"📡 [REQ-{request_id}] 비-데이터 응답을 {len(converted_chunks)}개의 청크로 로 분할하여 전송합니다.")
+                            for idx, chunk in enumerate(converted_chunks):
+                                logger.debug(f"   청크[{idx}]: {chunk}")
+                                yield chunk
+                        except Exception as e:
+                            logger.error(f"❌ [REQ-{request_id}] 비-데이터 라인 처리 중 에러: {e}")
+                            continue
                 
+                if extractor:
+                    for converted_chunk in extractor.finish():
+                        yield converted_chunk
+                    if extractor.tool_calls:
+                        logger.info(f"🔧 [REQ-{request_id}] LLM이 도구 호출 요청! (스트리밍, {len(extractor.tool_calls)}건)")
+                        for tc in extractor.tool_calls:
+                            func = tc.get("function", {})
+                            logger.info(f"   → {func.get('name')}: {func.get('arguments')}")
                 logger.debug(f"🏁 [REQ-{request_id}] 스트림 종료 신호 전송")
                 yield "data: [DONE]\n\n"
 
@@ -273,16 +297,7 @@ async def chat_completions(request: ChatRequest, raw_request: Request):
             return StreamingResponse(stream_generator(), media_type="text/event-stream")
 
         else:
-            async with httpx.AsyncClient(timeout=config["llm"]["timeout"]) as client:
-                llm_url = f"{config['llm']['base_url']}/chat/completions"
-                headers = {}
-                if config["llm"].get("api_key") and config["llm"]["api_key"] != "not-needed":
-                    headers["Authorization"] = f"Bearer {config['llm']['api_key']}"
-                    
-                response = await client.post(llm_url, json=ollama_request, headers=headers)
-                response.raise_for_status()
-                
-                ollama_response = response.json()
+            ollama_response = await llm_gateway.chat(ollama_request)
             
             # 응답 변환
             openai_response = adapter.convert_from_ollama_response(ollama_response)
@@ -327,6 +342,18 @@ async def chat_completions(request: ChatRequest, raw_request: Request):
         raise HTTPException(status_code=502, detail=f"LLM 연결 실패: {str(e)}")
 
 
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """입장 제어 지표 조회 (처리 중/대기 중 요청 수, 거절 건수, 대기 시간)"""
+    return admission.get_stats() if admission else {"enabled": False}
+
+
+@app.get("/pool/stats")
+async def pool_stats():
+    """LLM 연결 풀 상태 및 호출 지표(지연 시간, 토큰, 재시도) 조회"""
+    return llm_gateway.get_stats()
+
+
 @app.get("/tools")
 async def get_tools():
     """등록된 도구 목록 조회"""
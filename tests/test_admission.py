@@ -0,0 +1,157 @@
+"""
+test_admission.py - common/admission.py의 입장 제어 단위 테스트
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from admission import AdmissionController, AdmissionMiddleware, AdmissionRejected, released_admission
+
+PATH = "/v1/chat/completions"
+
+
+def make_scope(client_id=None, path=PATH):
+    headers = [(b"x-client-id", client_id.encode())] if client_id else []
+    return {"type": "http", "path": path, "method": "POST", "headers": headers, "client": ("127.0.0.1", 5000)}
+
+
+class Recorder:
+    """ASGI send 대체: 응답 상태 코드와 헤더를 기록"""
+
+    def __init__(self):
+        self.statuses = []
+        self.headers = []
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.statuses.append(message["status"])
+            self.headers.append(dict(message["headers"]))
+
+
+def blocking_app(gate: asyncio.Event):
+    async def app(scope, receive, send):
+        await gate.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    return app
+
+
+def test_per_client_limit_applies_only_with_client_id_header():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=10, max_per_client=1, max_queue=10, queue_timeout=0.05)
+        # 헤더 없는 요청(같은 IP)은 클라이언트별 한도 없이 전체 한도만 적용
+        for _ in range(3):
+            await controller.acquire(None)
+        assert controller.active == 3
+
+        await controller.acquire("void")
+        with pytest.raises(AdmissionRejected) as exc:
+            await controller.acquire("void")
+        assert exc.value.status_code == 429
+        await controller.acquire("other")  # 다른 클라이언트는 영향 없음
+        assert controller.stats["rejected_client_limit"] == 1
+
+        controller.release("void")
+        controller.release("other")
+        for _ in range(3):
+            controller.release(None)
+        assert controller.active == 0 and controller.get_stats()["clients"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_global_limit_queues_then_times_out_with_503():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        await controller.acquire(None)
+
+        waiter = asyncio.ensure_future(controller.acquire(None))
+        await asyncio.sleep(0)
+        assert controller.waiting == 1
+        # 대기열(1건)이 가득 차면 기다리지 않고 바로 503
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire(None)
+        assert full.value.status_code == 503 and controller.stats["rejected_queue_full"] == 1
+
+        with pytest.raises(AdmissionRejected) as timeout:
+            await waiter
+        assert timeout.value.status_code == 503 and controller.stats["rejected_queue_timeout"] == 1
+        assert controller.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_queued_request_is_admitted_when_slot_frees():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=1.0)
+        await controller.acquire(None)
+        waiter = asyncio.ensure_future(controller.acquire(None))
+        await asyncio.sleep(0.01)
+        controller.release(None)
+        await waiter
+        assert controller.active == 1 and controller.stats["admitted"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_middleware_rejects_with_retry_after_and_skips_other_paths():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=0.05, retry_after=7)
+        gate = asyncio.Event()
+        middleware = AdmissionMiddleware(blocking_app(gate), controller, [PATH])
+        recorder = Recorder()
+
+        first = asyncio.ensure_future(middleware(make_scope(), None, recorder))
+        await asyncio.sleep(0.01)
+        await middleware(make_scope(), None, recorder)
+        assert recorder.statuses == [503]
+        assert recorder.headers[0][b"retry-after"] == b"7"
+
+        # 대상이 아닌 경로는 자리와 관계없이 통과
+        gate.set()
+        await middleware(make_scope(path="/health"), None, recorder)
+        await first
+        assert recorder.statuses == [503, 200, 200]
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_released_admission_frees_slot_during_wait():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=0.05)
+        approval = asyncio.Event()
+
+        async def hitl_app(scope, receive, send):
+            async with released_admission():
+                await approval.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+
+        async def quick_app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+
+        recorder = Recorder()
+        waiting = asyncio.ensure_future(AdmissionMiddleware(hitl_app, controller, [PATH])(make_scope(), None, recorder))
+        await asyncio.sleep(0.01)
+        assert controller.active == 0
+        # 승인 대기 중에도 다른 요청은 자리를 얻음
+        await AdmissionMiddleware(quick_app, controller, [PATH])(make_scope(), None, recorder)
+
+        approval.set()
+        await waiting
+        assert recorder.statuses == [200, 200]
+        assert controller.active == 0 and controller._global._value == 1
+
+    asyncio.run(scenario())
+
+
+def test_released_admission_is_noop_outside_middleware():
+    async def scenario():
+        async with released_admission():
+            pass
+
+    asyncio.run(scenario())
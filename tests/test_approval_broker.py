@@ -0,0 +1,104 @@
+"""
+test_approval_broker.py - agent_native_loop/approval_broker.py의 승인 티켓 처리 단위 테스트
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent / "agent_native_loop"))
+from approval_broker import CHANNEL_HTTP, ApprovalBroker, create_approval_broker
+
+CALLS = [{"name": "search_documents", "arguments": {"query": "휴가"}},
+         {"name": "delete_document", "arguments": {"id": 1}}]
+
+
+def make_broker(**kwargs):
+    # 터미널 채널은 input()을 쓰므로 테스트에서는 HTTP 채널만 사용
+    return ApprovalBroker(channels=[CHANNEL_HTTP], **kwargs)
+
+
+async def wait_for_ticket(broker):
+    while not broker.list_pending():
+        await asyncio.sleep(0)
+    return broker.list_pending()[0]["ticket_id"]
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("y", [True, True, True]),
+    ("예", [True, True, True]),
+    ("N", [False, False, False]),
+    ("", [False, False, False]),
+    ("1,3", [True, False, True]),
+    (" 2 ", [False, True, False]),
+    ("4", None),
+    ("0,1", None),
+    ("maybe", None),
+    (",", None),
+])
+def test_parse_answer(answer, expected):
+    assert ApprovalBroker._parse_answer(answer, 3) == expected
+
+
+def test_resolve_first_decision_wins_and_single_decision_applies_to_all():
+    async def scenario():
+        broker = make_broker()
+        pending = asyncio.ensure_future(broker.request_approval("req1", 1, CALLS))
+        ticket_id = await wait_for_ticket(broker)
+
+        assert broker.resolve(ticket_id, [True], "http")
+        assert not broker.resolve(ticket_id, [False], "ws")  # 이미 처리된 티켓
+        assert await pending == [True, True]
+        assert broker.pending_count == 0 and not broker.resolve(ticket_id, [True], "http")
+        assert broker.get_stats()["by_channel"] == {"http": 1}
+
+    asyncio.run(scenario())
+
+
+def test_resolve_rejects_mismatched_decision_count():
+    async def scenario():
+        broker = make_broker()
+        pending = asyncio.ensure_future(broker.request_approval("req1", 1, CALLS))
+        ticket_id = await wait_for_ticket(broker)
+        with pytest.raises(ValueError):
+            broker.resolve(ticket_id, [True, False, True], "http")
+        broker.resolve(ticket_id, [False, True], "http")
+        assert await pending == [False, True]
+
+    asyncio.run(scenario())
+
+
+def test_timeout_applies_timeout_decision():
+    async def scenario():
+        broker = make_broker(timeout=0.01, timeout_decision=True)
+        assert await broker.request_approval("req1", 1, CALLS) == [True, True]
+        assert broker.stats["timeouts"] == 1 and broker.pending_count == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_request_rejects_and_publishes_events():
+    async def scenario():
+        broker = make_broker()
+        events = broker.subscribe()
+        pending = asyncio.ensure_future(broker.request_approval("req1", 1, CALLS))
+        await wait_for_ticket(broker)
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+
+        created, decided = events.get_nowait(), events.get_nowait()
+        assert created["event"] == "ticket_created"
+        assert decided["event"] == "ticket_decided" and decided["decisions"] == [False, False]
+        assert decided["ticket"]["decided_by"] == "cancelled"
+        assert broker.list_pending() == []
+
+    asyncio.run(scenario())
+
+
+def test_create_from_config():
+    broker = create_approval_broker({"channels": ["http"], "timeout_seconds": 5, "timeout_decision": "approve"})
+    assert broker.channels == {"http"} and broker.timeout == 5 and broker.timeout_decision is True
+    assert create_approval_broker(None).timeout_decision is False
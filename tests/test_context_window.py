@@ -0,0 +1,102 @@
+"""
+test_context_window.py - common/context_window.py의 ContextWindow 단위 테스트
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from context_window import ContextWindow
+
+
+def tool_turn(call_id, name, result_chars):
+    return [
+        {"role": "assistant", "content": "", "tool_calls": [
+            {"id": call_id, "type": "function", "function": {"name": name, "arguments": "{}"}}
+        ]},
+        {"role": "tool", "tool_call_id": call_id, "content": "x" * result_chars},
+    ]
+
+
+def assert_pairs_intact(messages):
+    """모든 tool 메시지 앞에 같은 id의 tool_calls를 가진 assistant 메시지가 있어야 함"""
+    open_ids = set()
+    for message in messages:
+        if message.get("tool_calls"):
+            open_ids = {call["id"] for call in message["tool_calls"]}
+        elif message.get("role") == "tool":
+            assert message["tool_call_id"] in open_ids
+        else:
+            open_ids = set()
+
+
+def test_within_budget_is_unchanged():
+    window = ContextWindow(max_context_tokens=1000, reserve_output_tokens=100)
+    messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}]
+    assert window.fit(messages) == messages
+
+
+def test_large_tool_result_is_truncated_without_touching_original():
+    window = ContextWindow(max_context_tokens=100000, max_tool_result_tokens=50)
+    messages = [{"role": "user", "content": "q"}] + tool_turn("c1", "get_all_employees", 4000)
+    fitted = window.fit(messages)
+    assert "생략" in fitted[2]["content"]
+    assert window.message_tokens(fitted[2]) < 100
+    assert messages[2]["content"] == "x" * 4000
+
+
+def test_old_tool_results_are_elided_before_dropping_turns():
+    window = ContextWindow(max_context_tokens=500, reserve_output_tokens=0, max_tool_result_tokens=10000,
+                           keep_recent_tool_results=1)
+    messages = [{"role": "user", "content": "q"}]
+    messages += tool_turn("c1", "search_docs", 1200)
+    messages += tool_turn("c2", "get_employee_info", 1200)
+    fitted = window.fit(messages)
+    assert len(fitted) == len(messages)
+    assert fitted[2]["content"].startswith("[이전 도구 결과 생략: search_docs")
+    assert fitted[2]["tool_call_id"] == "c1"
+    assert fitted[4]["content"] == messages[4]["content"]
+
+
+def test_dropping_old_turns_keeps_tool_call_pairs_together():
+    window = ContextWindow(max_context_tokens=300, reserve_output_tokens=0, max_tool_result_tokens=10000,
+                           keep_recent_tool_results=1, summarize_dropped=True)
+    messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": "첫 질문 " * 20}]
+    for idx in range(4):
+        messages += tool_turn(f"c{idx}", f"tool{idx}", 200)
+    messages += [{"role": "assistant", "content": "답변"}, {"role": "user", "content": "마지막 질문"}]
+    messages += tool_turn("cur", "search_docs", 100)
+
+    fitted = window.fit(messages)
+    assert fitted[0] == messages[0]
+    assert fitted[1]["role"] == "system" and "이전 대화 요약" in fitted[1]["content"]
+    # 현재 턴(마지막 user 이후)은 그대로 유지
+    assert fitted[-3:] == messages[-3:]
+    assert_pairs_intact(fitted)
+    assert window.stats["dropped_messages"] > 0
+
+
+def test_assistant_with_parallel_tool_calls_is_dropped_with_all_results():
+    window = ContextWindow(max_context_tokens=40, reserve_output_tokens=0, keep_recent_tool_results=0,
+                           summarize_dropped=False)
+    messages = [
+        {"role": "assistant", "content": "", "tool_calls": [
+            {"id": "a", "type": "function", "function": {"name": "t", "arguments": "{}"}},
+            {"id": "b", "type": "function", "function": {"name": "t", "arguments": "{}"}},
+        ]},
+        {"role": "tool", "tool_call_id": "a", "content": "y" * 300},
+        {"role": "tool", "tool_call_id": "b", "content": "y" * 300},
+        {"role": "user", "content": "질문"},
+    ]
+    fitted = window.fit(messages)
+    assert fitted == [messages[-1]]
+
+
+def test_tool_definitions_count_against_budget():
+    window = ContextWindow(max_context_tokens=200, reserve_output_tokens=0, summarize_dropped=False)
+    tools = [{"type": "function", "function": {"name": "t", "description": "d" * 600}}]
+    messages = [{"role": "user", "content": "old " * 40}, {"role": "assistant", "content": "a"},
+                {"role": "user", "content": "new"}]
+    assert window.fit(messages) == messages
+    # 도구 정의만큼 예산이 줄어 가장 오래된 메시지부터 제거됨
+    assert window.fit(messages, tools) == messages[1:]
@@ -0,0 +1,97 @@
+"""
+test_docs_search.py - db/docs_search.py의 검색 경로(trigram / bigram / LIKE) 단위 테스트
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent / "db"))
+from docs_search import (
+    BIGRAM_TABLE, _to_bigrams, ensure_docs_fts, search_documents, sync_bigram_index
+)
+from table_versions import ensure_table_versions
+
+DOCS = [
+    ("유급휴가 규정", "연차 유급휴가는 입사 1년 후 15일이 부여됩니다.", "인사"),
+    ("보안 수칙", "사내 보안 정책: 비밀번호는 90일마다 변경합니다.", "보안"),
+    ("출장 안내", "출장비 정산은 귀국 후 7일 이내에 신청합니다.", "총무"),
+]
+
+
+def make_conn(with_fts: bool = True):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            category TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO documents (title, content, category) VALUES (?, ?, ?)", DOCS)
+    conn.commit()
+    if with_fts and not ensure_docs_fts(conn):
+        pytest.skip("SQLite FTS5(trigram) 미지원")
+    ensure_table_versions(conn, ("documents",))
+    return conn
+
+
+def count_rows(conn, table):
+    return conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+
+def test_to_bigrams_splits_each_word():
+    assert _to_bigrams("유급휴가") == "유급 급휴 휴가 가"
+    assert _to_bigrams("A 보안_정책") == "a 보안 안 정책 책"
+    assert _to_bigrams(None) == ""
+
+
+def test_long_terms_use_trigram_with_highlight():
+    conn = make_conn()
+    results = search_documents(conn, "유급휴가")
+    assert [r["id"] for r in results] == [1]
+    assert "**" in results[0]["snippet"] and results[0]["score"] > 0
+
+
+def test_short_terms_use_bigram_index_when_synced():
+    conn = make_conn()
+    assert sync_bigram_index(conn)
+    # "휴가"는 "유급휴가" 안의 부분 문자열, 여러 검색어는 OR
+    assert [r["id"] for r in search_documents(conn, "휴가")] == [1]
+    assert {r["id"] for r in search_documents(conn, "휴가 보안")} == {1, 2}
+    assert [r["id"] for r in search_documents(conn, "출")] == [3]
+
+
+def test_stale_bigram_index_falls_back_to_like_without_writing():
+    conn = make_conn()
+    assert sync_bigram_index(conn)
+    conn.execute("INSERT INTO documents (title, content, category) VALUES ('휴가 신청', '휴가 신청서 양식', '인사')")
+    conn.commit()
+
+    indexed = count_rows(conn, BIGRAM_TABLE)
+    # 재구축 전이지만 LIKE로 새 문서도 찾음, 검색은 인덱스를 건드리지 않음
+    assert {r["id"] for r in search_documents(conn, "휴가")} == {1, 4}
+    assert count_rows(conn, BIGRAM_TABLE) == indexed
+
+    assert sync_bigram_index(conn)
+    assert count_rows(conn, BIGRAM_TABLE) == indexed + 1
+
+
+def test_like_search_without_fts_orders_by_score_then_id():
+    conn = make_conn(with_fts=False)
+    results = search_documents(conn, "보안")
+    assert [r["id"] for r in results] == [2]
+    assert results[0]["score"] == 3.0  # 제목 1회 × 2 + 본문 1회
+
+    assert [r["id"] for r in search_documents(conn, "합니다")] == [2, 3]
+    assert search_documents(conn, "   ") == []
+
+
+def test_pagination_with_limit_and_offset():
+    conn = make_conn(with_fts=False)
+    page1 = search_documents(conn, "후", limit=1)
+    page2 = search_documents(conn, "후", limit=1, offset=1)
+    assert [r["id"] for r in page1 + page2] == [1, 3]
@@ -0,0 +1,54 @@
+"""
+test_pending_cursor.py - agent_loop_api 승인 요청 목록 커서 인코딩 단위 테스트
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent / "agent_loop_api"))
+from agent_loop_api_pagination import encode_cursor, decode_cursor
+
+
+def test_round_trip():
+    cursor = encode_cursor("2026-01-15 09:30:00", "req_20260115093000_1")
+    assert decode_cursor(cursor) == ("2026-01-15 09:30:00", "req_20260115093000_1")
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor("2026-01-15 09:30:00", "요청?/+&=" * 5)
+    assert all(ch.isalnum() or ch in "-_=" for ch in cursor)
+    assert decode_cursor(cursor)[1] == "요청?/+&=" * 5
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", encode_cursor("only", "x")[:-4], "WzFd", "eyJhIjogMX0="])
+def test_invalid_cursor_raises_value_error(cursor):
+    # "WzFd" = [1] (값 1개), "eyJhIjogMX0=" = {"a": 1} (배열 아님)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_keyset_pages_cover_all_rows_once():
+    """라우트와 같은 (created_at, request_id) > (?, ?) 조건으로 페이지를 넘기면 누락/중복이 없어야 함"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE pending_requests (request_id TEXT PRIMARY KEY, status TEXT, created_at TEXT)")
+    # 같은 created_at이 여러 개여도 request_id로 순서가 정해짐
+    rows = [(f"req_{idx:02d}", "pending", f"2026-01-15 09:00:0{idx // 4}") for idx in range(10)]
+    conn.executemany("INSERT INTO pending_requests VALUES (?, ?, ?)", rows)
+
+    seen, cursor = [], None
+    while True:
+        sql = "SELECT request_id, created_at FROM pending_requests WHERE status = 'pending'"
+        params = []
+        if cursor:
+            sql += " AND (created_at, request_id) > (?, ?)"
+            params.extend(decode_cursor(cursor))
+        page = conn.execute(sql + " ORDER BY created_at, request_id LIMIT 4", params).fetchall()
+        seen.extend(rid for rid, _ in page)
+        if len(page) < 4:
+            break
+        cursor = encode_cursor(page[-1][1], page[-1][0])
+
+    assert seen == [rid for rid, _, _ in rows]
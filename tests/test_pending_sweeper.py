@@ -0,0 +1,117 @@
+"""
+test_pending_sweeper.py - agent_loop_api의 PendingSweeper(승인 대기 만료/정리) 단위 테스트
+"""
+
+import asyncio
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pydantic")  # agent_loop_api_models 의존성
+
+sys.path.append(str(Path(__file__).parent.parent / "agent_loop_api"))
+from agent_loop_api_sweeper import PendingSweeper
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "pending.db"
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE pending_requests (
+            request_id TEXT PRIMARY KEY,
+            tool_calls TEXT,
+            messages TEXT,
+            status TEXT DEFAULT 'pending',
+            result TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            tool_names TEXT
+        )
+    """)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def insert(db_path, request_id, status, age_seconds=0):
+    """created_at은 UTC(CURRENT_TIMESTAMP 형식), updated_at은 로컬 isoformat으로 기록 (서버와 동일)"""
+    created_at = (datetime.now(timezone.utc) - timedelta(seconds=age_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+    updated_at = (datetime.now() - timedelta(seconds=age_seconds)).isoformat()
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "INSERT INTO pending_requests (request_id, status, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        (request_id, status, created_at, updated_at)
+    )
+    conn.commit()
+    conn.close()
+
+
+def statuses(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = dict(conn.execute("SELECT request_id, status FROM pending_requests").fetchall())
+    conn.close()
+    return rows
+
+
+def test_stale_pending_is_expired_and_evicted_from_memory(db_path):
+    insert(db_path, "old", "pending", age_seconds=600)
+    insert(db_path, "new", "pending", age_seconds=10)
+    memory = {"old": {}, "new": {}}
+    sweeper = PendingSweeper(db_path, memory, timeout=300)
+
+    result = asyncio.run(sweeper.sweep())
+
+    assert result["expired"] == 1 and result["evicted"] == 1
+    assert statuses(db_path) == {"old": "expired", "new": "pending"}
+    assert list(memory) == ["new"]
+
+
+def test_auto_expire_off_leaves_pending_rows(db_path):
+    insert(db_path, "old", "pending", age_seconds=600)
+    sweeper = PendingSweeper(db_path, {}, timeout=300, auto_expire=False)
+    asyncio.run(sweeper.sweep())
+    assert statuses(db_path) == {"old": "pending"}
+
+
+def test_purge_removes_only_terminal_rows_past_retention(db_path):
+    for status in ("completed", "rejected", "expired", "failed"):
+        insert(db_path, f"old-{status}", status, age_seconds=7200)
+        insert(db_path, f"new-{status}", status, age_seconds=10)
+    insert(db_path, "old-pending", "pending", age_seconds=7200)
+    insert(db_path, "old-approved", "approved", age_seconds=7200)
+    sweeper = PendingSweeper(db_path, {}, timeout=10 ** 6, auto_expire=False, processing_timeout=10 ** 6,
+                             retention=3600)
+
+    result = asyncio.run(sweeper.sweep())
+
+    assert result["deleted"] == 4
+    remaining = statuses(db_path)
+    assert {rid for rid in remaining if rid.startswith("old-")} == {"old-pending", "old-approved"}
+    assert all(f"new-{status}" in remaining for status in ("completed", "rejected", "expired", "failed"))
+
+
+def test_purge_caps_finished_rows_keeping_newest(db_path):
+    for idx in range(5):
+        insert(db_path, f"done{idx}", "completed", age_seconds=100 - idx)
+    insert(db_path, "busy", "approved", age_seconds=200)
+    sweeper = PendingSweeper(db_path, {}, auto_expire=False, processing_timeout=10 ** 6, max_finished_rows=2)
+
+    asyncio.run(sweeper.sweep())
+
+    assert set(statuses(db_path)) == {"done3", "done4", "busy"}
+
+
+def test_stuck_approved_rows_are_failed(db_path):
+    insert(db_path, "stuck", "approved", age_seconds=1200)
+    insert(db_path, "running", "approved", age_seconds=5)
+    sweeper = PendingSweeper(db_path, {}, auto_expire=False, processing_timeout=600)
+
+    result = asyncio.run(sweeper.sweep())
+
+    assert result["failed"] == 1
+    assert statuses(db_path) == {"stuck": "failed", "running": "approved"}
+    assert sweeper.get_stats()["failed_stuck"] == 1
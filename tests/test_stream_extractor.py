@@ -0,0 +1,104 @@
+"""
+test_stream_extractor.py - proxy_server의 StreamingToolCallExtractor 단위 테스트
+
+코드 블록(```json)이 청크 경계에 걸친 경우와 닫히지 않은 경우의 처리를 확인합니다.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "proxy_server"))
+from proxy_adapter import StreamingToolCallExtractor
+
+TOOL_JSON = '{"name": "search_docs", "arguments": {"query": "휴가"}}'
+
+
+def make_chunk(content=None, tool_calls=None, finish_reason=None):
+    delta = {}
+    if content is not None:
+        delta["content"] = content
+    if tool_calls is not None:
+        delta["tool_calls"] = tool_calls
+    return {"id": "c1", "created": 0, "model": "m", "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+
+def run(pieces, mode="tool_calls", tool_calls=None):
+    """청크를 차례로 넣고 (즉시 전달된 텍스트, 종료 시 전달된 텍스트, 추출기)를 반환"""
+    extractor = StreamingToolCallExtractor(mode=mode)
+    streamed = []
+    for piece in pieces:
+        streamed.extend(extractor.feed(make_chunk(piece)))
+    if tool_calls:
+        streamed.extend(extractor.feed(make_chunk(tool_calls=tool_calls)))
+    return text_of(streamed), extractor.finish(), extractor
+
+
+def text_of(sse_lines):
+    return "".join(
+        json.loads(line[len("data: "):])["choices"][0]["delta"].get("content", "")
+        for line in sse_lines
+    )
+
+
+def test_plain_text_streams_immediately():
+    streamed, finished, extractor = run(["안녕", "하세요"])
+    assert streamed == "안녕하세요"
+    assert extractor.tool_calls == []
+    assert json.loads(finished[-1][len("data: "):])["choices"][0]["finish_reason"] == "stop"
+
+
+def test_fence_split_across_chunks_is_extracted():
+    streamed, finished, extractor = run(["검색합니다. ``", "`js", "on\n" + TOOL_JSON[:20], TOOL_JSON[20:] + "\n``", "`"])
+    assert streamed == "검색합니다. "
+    assert [tc["function"]["name"] for tc in extractor.tool_calls] == ["search_docs"]
+    assert json.loads(extractor.tool_calls[0]["function"]["arguments"]) == {"query": "휴가"}
+    assert "```" not in text_of(finished)
+    assert json.loads(finished[-1][len("data: "):])["choices"][0]["finish_reason"] == "tool_calls"
+
+
+def test_partial_fence_prefix_is_released_when_not_a_fence():
+    streamed, finished, extractor = run(["코드는 `", "x` 입니다"])
+    assert streamed + text_of(finished) == "코드는 `x` 입니다"
+    assert extractor.tool_calls == []
+
+
+def test_non_tool_json_block_is_released_as_text():
+    block = '```json\n{"a": 1}\n```'
+    streamed, finished, extractor = run(["예시: ", block[:9], block[9:], " 끝"])
+    assert streamed + text_of(finished) == "예시: " + block + " 끝"
+    assert extractor.tool_calls == []
+
+
+def test_unclosed_fence_is_released_at_finish():
+    streamed, finished, extractor = run(["앞 ", "```json\n{\"name\": "])
+    assert streamed == "앞 "
+    assert text_of(finished) == "```json\n{\"name\": "
+    assert extractor.tool_calls == []
+
+
+def test_whole_json_response_is_buffered_and_extracted():
+    streamed, finished, extractor = run(["  ", TOOL_JSON[:10], TOOL_JSON[10:]])
+    assert streamed == ""
+    assert [tc["function"]["name"] for tc in extractor.tool_calls] == ["search_docs"]
+
+
+def test_native_tool_call_fragments_are_joined():
+    fragments = [
+        {"index": 0, "id": "call_a", "function": {"name": "get_employee_info", "arguments": '{"employee_'}},
+        {"index": 0, "function": {"arguments": 'id": "EMP001"}'}},
+    ]
+    extractor = StreamingToolCallExtractor(mode="tool_calls")
+    for fragment in fragments:
+        extractor.feed(make_chunk(tool_calls=[fragment]))
+    extractor.finish()
+    assert len(extractor.tool_calls) == 1
+    assert extractor.tool_calls[0]["id"] == "call_a"
+    assert json.loads(extractor.tool_calls[0]["function"]["arguments"]) == {"employee_id": "EMP001"}
+
+
+def test_plan_b_mode_renders_commands_after_streamed_text():
+    streamed, finished, extractor = run(["조회합니다.\n```json\n" + TOOL_JSON + "\n```"], mode="plan_b")
+    assert streamed == "조회합니다.\n"
+    assert "search_docs" in text_of(finished)
+    assert json.loads(finished[-1][len("data: "):])["choices"][0]["finish_reason"] == "stop"
@@ -0,0 +1,56 @@
+"""
+test_table_versions.py - db/table_versions.py의 버전 트리거 단위 테스트
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "db"))
+from table_versions import bump_table_versions, ensure_table_versions, get_table_versions
+
+
+def make_conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE documents (id INTEGER PRIMARY KEY, title TEXT)")
+    conn.execute("CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT)")
+    ensure_table_versions(conn, ("documents", "employees"))
+    return conn
+
+
+def test_versions_missing_table_returns_empty():
+    assert get_table_versions(sqlite3.connect(":memory:")) == {}
+
+
+def test_writes_bump_only_the_changed_table():
+    conn = make_conn()
+    assert get_table_versions(conn) == {"documents": 0, "employees": 0}
+
+    conn.execute("INSERT INTO documents (title) VALUES ('a')")
+    conn.execute("UPDATE documents SET title = 'b'")
+    conn.execute("DELETE FROM documents")
+    assert get_table_versions(conn) == {"documents": 3, "employees": 0}
+
+
+def test_ensure_is_idempotent_and_keeps_versions():
+    conn = make_conn()
+    conn.execute("INSERT INTO employees (name) VALUES ('kim')")
+    ensure_table_versions(conn, ("documents", "employees"))
+    conn.execute("INSERT INTO employees (name) VALUES ('lee')")
+    # 트리거가 중복 생성되지 않아 쓰기 1건당 1만 오름
+    assert get_table_versions(conn)["employees"] == 2
+
+
+def test_bump_after_recreate_changes_version():
+    conn = make_conn()
+    conn.execute("INSERT INTO documents (title) VALUES ('a')")
+    before = get_table_versions(conn)["documents"]
+
+    # 재초기화: DROP 시 트리거도 삭제되므로 재삽입만으로는 버전이 오르지 않음
+    conn.execute("DROP TABLE documents")
+    conn.execute("CREATE TABLE documents (id INTEGER PRIMARY KEY, title TEXT)")
+    conn.execute("INSERT INTO documents (title) VALUES ('a')")
+    assert get_table_versions(conn)["documents"] == before
+
+    bump_table_versions(conn, ("documents",))
+    assert get_table_versions(conn) == {"documents": before + 1, "employees": 0}
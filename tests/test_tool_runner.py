@@ -0,0 +1,82 @@
+"""
+test_tool_runner.py - common/tool_runner.py의 동시 도구 실행 단위 테스트
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "common"))
+from tool_runner import iter_concurrent_tool_calls, run_concurrent_tool_calls, tool_error_message
+
+
+def call_id(call):
+    return call["id"]
+
+
+def tool_message(call):
+    return {"role": "tool", "tool_call_id": call["id"], "content": json.dumps({"success": True})}
+
+
+def test_results_keep_call_order_even_when_finished_out_of_order():
+    async def run_one(call):
+        await asyncio.sleep(call["delay"])
+        return tool_message(call)
+
+    calls = [{"id": "a", "delay": 0.03}, {"id": "b", "delay": 0.0}, {"id": "c", "delay": 0.01}]
+    messages = asyncio.run(run_concurrent_tool_calls(calls, run_one, call_id))
+    assert [m["tool_call_id"] for m in messages] == ["a", "b", "c"]
+
+
+def test_failing_call_becomes_error_message_without_stopping_others():
+    async def run_one(call):
+        if call["id"] == "bad":
+            raise ValueError("잘못된 인자")
+        return tool_message(call)
+
+    calls = [{"id": "ok1"}, {"id": "bad"}, {"id": "ok2"}]
+    messages = asyncio.run(run_concurrent_tool_calls(calls, run_one, call_id))
+    assert messages[1] == tool_error_message("bad", ValueError("잘못된 인자"))
+    assert json.loads(messages[1]["content"]) == {"success": False, "error": "ValueError: 잘못된 인자"}
+    assert json.loads(messages[0]["content"])["success"] and json.loads(messages[2]["content"])["success"]
+
+
+def test_concurrency_is_capped_by_max_parallel():
+    running = 0
+    peak = 0
+
+    async def run_one(call):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return tool_message(call)
+
+    calls = [{"id": str(i)} for i in range(7)]
+    messages = asyncio.run(run_concurrent_tool_calls(calls, run_one, call_id, max_parallel=2))
+    assert len(messages) == 7 and peak == 2
+
+
+def test_iter_yields_in_completion_order_and_cancels_rest_on_early_exit():
+    cancelled = []
+
+    async def run_one(call):
+        try:
+            await asyncio.sleep(call["delay"])
+        except asyncio.CancelledError:
+            cancelled.append(call["id"])
+            raise
+        return tool_message(call)
+
+    async def scenario():
+        calls = [{"id": "slow", "delay": 1.0}, {"id": "fast", "delay": 0.0}]
+        agen = iter_concurrent_tool_calls(calls, run_one, call_id)
+        idx, message = await agen.__anext__()
+        assert (idx, message["tool_call_id"]) == (1, "fast")
+        await agen.aclose()  # 소비자가 중간에 멈춤
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert cancelled == ["slow"]